@@ -1,839 +1,6270 @@
-# AIVA - AI Voice Assistant
-# Complete GitHub-Ready Project Structure
-
-import os
-import re
-import time
-import datetime
-import webbrowser
-import pyautogui
-import keyboard
-import pyttsx3
-import pyjokes
-import speech_recognition as sr
-import urllib.parse
-import win32com.client
-import json
-import logging
-import threading
-import subprocess
-import psutil
-import requests
-from pathlib import Path
-import sqlite3
-from typing import Dict, List, Optional, Tuple
-import configparser
-
-# ===== Configuration Management =====
-class AIVAConfig:
-    def __init__(self):
-        self.config_file = "config/aiva_config.ini"
-        self.config = configparser.ConfigParser()
-        self.load_config()
-    
-    def load_config(self):
-        """Load configuration from file or create default"""
-        if os.path.exists(self.config_file):
-            self.config.read(self.config_file)
-        else:
-            self.create_default_config()
-    
-    def create_default_config(self):
-        """Create default configuration file"""
-        os.makedirs("config", exist_ok=True)
-        
-        self.config['VOICE'] = {
-            'rate': '150',
-            'volume': '0.9',
-            'voice_index': '0'
-        }
-        
-        self.config['SPEECH_RECOGNITION'] = {
-            'timeout': '5',
-            'phrase_time_limit': '7',
-            'ambient_duration': '0.5'
-        }
-        
-        self.config['APPLICATIONS'] = {
-            'chrome_path': 'C:/Program Files/Google/Chrome/Application/chrome.exe',
-            'excel_auto_open': 'false',
-            'browser_delay': '3'
-        }
-        
-        self.config['EMAIL'] = {
-            'default_domain': 'gmail.com',
-            'auto_send': 'true',
-            'send_delay': '5'
-        }
-        
-        self.config['LOGGING'] = {
-            'level': 'INFO',
-            'file': 'logs/aiva.log',
-            'max_size': '10485760'
-        }
-        
-        with open(self.config_file, 'w') as f:
-            self.config.write(f)
-    
-    def get(self, section, key, fallback=None):
-        """Get configuration value"""
-        return self.config.get(section, key, fallback=fallback)
-    
-    def getint(self, section, key, fallback=0):
-        """Get integer configuration value"""
-        return self.config.getint(section, key, fallback=fallback)
-    
-    def getboolean(self, section, key, fallback=False):
-        """Get boolean configuration value"""
-        return self.config.getboolean(section, key, fallback=fallback)
-
-# ===== Logging Setup =====
-class AIVALogger:
-    def __init__(self, config: AIVAConfig):
-        self.config = config
-        self.setup_logging()
-    
-    def setup_logging(self):
-        """Setup logging configuration"""
-        os.makedirs("logs", exist_ok=True)
-        
-        log_level = getattr(logging, self.config.get('LOGGING', 'level', 'INFO'))
-        log_file = self.config.get('LOGGING', 'file', 'logs/aiva.log')
-        
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
-        
-        self.logger = logging.getLogger('AIVA')
-    
-    def info(self, message):
-        self.logger.info(message)
-    
-    def error(self, message):
-        self.logger.error(message)
-    
-    def warning(self, message):
-        self.logger.warning(message)
-    
-    def debug(self, message):
-        self.logger.debug(message)
-
-# ===== Database Manager =====
-class AIVADatabase:
-    def __init__(self):
-        self.db_path = "data/aiva.db"
-        os.makedirs("data", exist_ok=True)
-        self.init_database()
-    
-    def init_database(self):
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Commands history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS command_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                command TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                success BOOLEAN DEFAULT TRUE,
-                response TEXT
-            )
-        ''')
-        
-        # User preferences table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Email templates table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS email_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                subject TEXT,
-                body TEXT,
-                created DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def log_command(self, command: str, success: bool = True, response: str = ""):
-        """Log command to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO command_history (command, success, response) VALUES (?, ?, ?)",
-            (command, success, response)
-        )
-        conn.commit()
-        conn.close()
-    
-    def get_command_history(self, limit: int = 50) -> List[Dict]:
-        """Get command history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT command, timestamp, success, response FROM command_history ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
-        )
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                "command": row[0],
-                "timestamp": row[1],
-                "success": bool(row[2]),
-                "response": row[3]
-            }
-            for row in results
-        ]
-    
-    def save_email_template(self, name: str, subject: str, body: str):
-        """Save email template"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO email_templates (name, subject, body) VALUES (?, ?, ?)",
-            (name, subject, body)
-        )
-        conn.commit()
-        conn.close()
-    
-    def get_email_template(self, name: str) -> Optional[Dict]:
-        """Get email template by name"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT subject, body FROM email_templates WHERE name = ?",
-            (name,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return {"subject": result[0], "body": result[1]}
-        return None
-
-# ===== Web Search Integration =====
-class WebSearchManager:
-    def __init__(self, logger: AIVALogger):
-        self.logger = logger
-    
-    def search_web(self, query: str, num_results: int = 5) -> List[Dict]:
-        """Search web using multiple search engines"""
-        try:
-            # This would integrate with search APIs in production
-            # For now, we'll simulate with Google search
-            search_url = f"https://www.google.com/search?q={urllib.parse.quote(query)}"
-            webbrowser.open(search_url)
-            
-            return [{"title": f"Search results for: {query}", "url": search_url}]
-        except Exception as e:
-            self.logger.error(f"Web search error: {e}")
-            return []
-    
-    def get_weather(self, location: str = "current") -> Dict:
-        """Get weather information"""
-        try:
-            # This would integrate with weather APIs in production
-            weather_url = f"https://www.google.com/search?q=weather+{location}"
-            webbrowser.open(weather_url)
-            return {"status": "opened", "location": location}
-        except Exception as e:
-            self.logger.error(f"Weather fetch error: {e}")
-            return {"status": "error", "message": str(e)}
-
-# ===== System Monitor =====
-class SystemMonitor:
-    def __init__(self, logger: AIVALogger):
-        self.logger = logger
-    
-    def get_system_info(self) -> Dict:
-        """Get system information"""
-        try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            return {
-                "cpu_usage": cpu_percent,
-                "memory_usage": memory.percent,
-                "memory_available": memory.available // (1024**3),  # GB
-                "disk_usage": disk.percent,
-                "disk_free": disk.free // (1024**3)  # GB
-            }
-        except Exception as e:
-            self.logger.error(f"System info error: {e}")
-            return {}
-    
-    def get_running_processes(self, limit: int = 10) -> List[Dict]:
-        """Get top running processes"""
-        try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    processes.append(proc.info)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            # Sort by CPU usage
-            processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
-            return processes[:limit]
-        except Exception as e:
-            self.logger.error(f"Process list error: {e}")
-            return []
-
-# ===== Enhanced Excel Manager =====
-class ExcelManager:
-    def __init__(self, logger: AIVALogger):
-        self.logger = logger
-        self.excel = None
-        self.workbook = None
-        self.worksheet = None
-        self.is_initialized = False
-    
-    def initialize(self):
-        """Initialize Excel application"""
-        try:
-            if not self.is_initialized:
-                self.logger.info("Initializing Excel...")
-                self.excel = win32com.client.Dispatch("Excel.Application")
-                self.excel.Visible = True
-                self.workbook = self.excel.Workbooks.Add()
-                self.worksheet = self.workbook.ActiveSheet
-                self.is_initialized = True
-                self.logger.info("Excel initialized successfully")
-            return True
-        except Exception as e:
-            self.logger.error(f"Excel initialization error: {e}")
-            return False
-    
-    def create_chart(self, data_range: str, chart_type: str = "Column"):
-        """Create chart from data range"""
-        try:
-            if not self.is_initialized:
-                return False
-            
-            chart = self.worksheet.Shapes.AddChart2().Chart
-            chart.SetSourceData(self.worksheet.Range(data_range))
-            chart.ChartType = getattr(win32com.client.constants, f"xl{chart_type}")
-            
-            self.logger.info(f"Created {chart_type} chart for range {data_range}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Chart creation error: {e}")
-            return False
-    
-    def apply_conditional_formatting(self, range_addr: str, condition: str, format_type: str):
-        """Apply conditional formatting to range"""
-        try:
-            if not self.is_initialized:
-                return False
-            
-            range_obj = self.worksheet.Range(range_addr)
-            # Add conditional formatting logic here
-            self.logger.info(f"Applied conditional formatting to {range_addr}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Conditional formatting error: {e}")
-            return False
-    
-    def save_workbook(self, filename: str = None):
-        """Save current workbook"""
-        try:
-            if not self.is_initialized:
-                return False
-            
-            if filename:
-                self.workbook.SaveAs(filename)
-            else:
-                self.workbook.Save()
-            
-            self.logger.info(f"Workbook saved: {filename or 'default'}")
-            return True
-        except Exception as e:
-            self.logger.error(f"Save workbook error: {e}")
-            return False
-    
-    def close(self):
-        """Close Excel application"""
-        try:
-            if self.is_initialized:
-                self.workbook.Close()
-                self.excel.Quit()
-                self.is_initialized = False
-                self.logger.info("Excel closed")
-        except Exception as e:
-            self.logger.error(f"Excel close error: {e}")
-
-# ===== Enhanced Email Manager =====
-class EmailManager:
-    def __init__(self, config: AIVAConfig, logger: AIVALogger, database: AIVADatabase):
-        self.config = config
-        self.logger = logger
-        self.database = database
-        self.common_domains = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com"]
-    
-    def parse_email_command(self, command: str) -> Optional[Tuple[str, str, str]]:
-        """Enhanced email command parsing"""
-        command = command.lower()
-        
-        # Check for template usage
-        template_match = re.search(r"send email using template (\w+)", command)
-        if template_match:
-            template_name = template_match.group(1)
-            template = self.database.get_email_template(template_name)
-            if template:
-                # Extract recipient
-                recipient_match = re.search(r"to (.+?)(?:\s|$)", command)
-                if recipient_match:
-                    recipient = recipient_match.group(1).strip()
-                    return (recipient, template["subject"], template["body"])
-        
-        # Regular email parsing (existing logic)
-        patterns = [
-            r"send (?:a |an )?(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+?)(?:saying|with message|body) (.+)",
-            r"send (?:a |an )?(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+)",
-            r"(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+)"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, command)
-            if match:
-                if len(match.groups()) == 3:
-                    return (match.group(1).strip(), match.group(2).strip(), match.group(3).strip())
-                else:
-                    return (match.group(1).strip(), match.group(2).strip(), self.generate_email_body(match.group(2)))
-        
-        return None
-    
-    def process_email_address(self, recipient: str) -> str:
-        """Enhanced email address processing"""
-        recipient = recipient.strip()
-        
-        # Handle voice recognition replacements
-        replacements = {
-            " at ": "@",
-            " dot ": ".",
-            "gmail": "gmail.com",
-            "yahoo": "yahoo.com",
-            "outlook": "outlook.com",
-            "hotmail": "hotmail.com"
-        }
-        
-        for old, new in replacements.items():
-            recipient = recipient.replace(old, new)
-        
-        # Validate and format email
-        if "@" in recipient and "." in recipient.split("@")[1]:
-            parts = recipient.split("@")
-            username = parts[0].replace(" ", "")
-            return f"{username}@{parts[1]}"
-        
-        # Default domain handling
-        if "@" not in recipient:
-            username = recipient.replace(" ", "").lower()
-            default_domain = self.config.get('EMAIL', 'default_domain', 'gmail.com')
-            return f"{username}@{default_domain}"
-        
-        return recipient
-    
-    def generate_email_body(self, subject: str) -> str:
-        """Generate contextual email body"""
-        subject_lower = subject.lower()
-        
-        templates = {
-            "meeting": """Dear Recipient,
-
-I hope this email finds you well. I am writing to discuss the {subject}.
-
-I would appreciate the opportunity to meet and discuss this matter further. Please let me know your availability.
-
-Best regards,
-AIVA User""",
-            
-            "sick": """Dear Sir/Madam,
-
-I am writing to inform you that I will be unable to attend work today due to illness. I expect to return once I have recovered.
-
-I will monitor my email and respond to urgent matters as my health permits.
-
-Thank you for your understanding.
-
-Best regards,
-AIVA User""",
-            
-            "follow_up": """Dear Recipient,
-
-I hope you are doing well. I wanted to follow up on our previous discussion regarding {subject}.
-
-Please let me know if you need any additional information or if there are any updates.
-
-Looking forward to your response.
-
-Best regards,
-AIVA User"""
-        }
-        
-        # Select appropriate template
-        if any(word in subject_lower for word in ["sick", "illness", "health", "leave"]):
-            return templates["sick"]
-        elif any(word in subject_lower for word in ["meeting", "appointment", "discussion"]):
-            return templates["meeting"].format(subject=subject)
-        elif any(word in subject_lower for word in ["follow", "update", "check"]):
-            return templates["follow_up"].format(subject=subject)
-        else:
-            return f"""Dear Recipient,
-
-I hope this email finds you well. I am writing regarding {subject}.
-
-Please let me know if you need any additional information.
-
-Best regards,
-AIVA User"""
-    
-    def open_gmail_compose(self, recipient: str, subject: str, body: str = None) -> bool:
-        """Open Gmail compose with enhanced features"""
-        try:
-            formatted_recipient = self.process_email_address(recipient)
-            self.logger.info(f"Composing email to: {formatted_recipient}")
-            
-            base_url = "https://mail.google.com/mail/?view=cm&fs=1"
-            base_url += f"&to={urllib.parse.quote(formatted_recipient)}"
-            base_url += f"&su={urllib.parse.quote(subject)}"
-            
-            if not body:
-                body = self.generate_email_body(subject)
-            
-            base_url += f"&body={urllib.parse.quote(body)}"
-            
-            webbrowser.open(base_url)
-            time.sleep(self.config.getint('EMAIL', 'send_delay', 5))
-            
-            return True
-        except Exception as e:
-            self.logger.error(f"Gmail compose error: {e}")
-            return False
-    
-    def auto_send_email(self) -> bool:
-        """Automatically send email using keyboard shortcuts"""
-        try:
-            if not self.config.getboolean('EMAIL', 'auto_send', True):
-                return False
-            
-            # Focus browser and send
-            pyautogui.click(500, 500)
-            time.sleep(1)
-            pyautogui.hotkey('ctrl', 'enter')
-            time.sleep(2)
-            
-            self.logger.info("Email sent automatically")
-            return True
-        except Exception as e:
-            self.logger.error(f"Auto send error: {e}")
-            return False
-
-# ===== Voice Manager =====
-class VoiceManager:
-    def __init__(self, config: AIVAConfig, logger: AIVALogger):
-        self.config = config
-        self.logger = logger
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        self.tts_engine = pyttsx3.init()
-        self.setup_voice()
-        self.is_listening = False
-        self.wake_words = ["aiva", "hey aiva", "ok aiva"]
-    
-    def setup_voice(self):
-        """Setup text-to-speech configuration"""
-        try:
-            voices = self.tts_engine.getProperty('voices')
-            voice_index = self.config.getint('VOICE', 'voice_index', 0)
-            
-            if voices and len(voices) > voice_index:
-                self.tts_engine.setProperty('voice', voices[voice_index].id)
-            
-            rate = self.config.getint('VOICE', 'rate', 150)
-            volume = float(self.config.get('VOICE', 'volume', '0.9'))
-            
-            self.tts_engine.setProperty('rate', rate)
-            self.tts_engine.setProperty('volume', volume)
-            
-            self.logger.info("Voice engine configured")
-        except Exception as e:
-            self.logger.error(f"Voice setup error: {e}")
-    
-    def speak(self, text: str, interrupt: bool = False):
-        """Enhanced text-to-speech with interruption support"""
-        try:
-            if interrupt:
-                self.tts_engine.stop()
-            
-            print(f"AIVA: {text}")
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
-            
-            self.logger.debug(f"Spoke: {text}")
-        except Exception as e:
-            self.logger.error(f"Speech error: {e}")
-    
-    def listen(self, timeout: int = None, wake_word_mode: bool = False) -> str:
-        """Enhanced speech recognition with wake word support"""
-        if timeout is None:
-            timeout = self.config.getint('SPEECH_RECOGNITION', 'timeout', 5)
-        
-        try:
-            with self.microphone as source:
-                if not wake_word_mode:
-                    print("🎤 Listening...")
-                
-                self.recognizer.adjust_for_ambient_noise(
-                    source, 
-                    duration=self.config.getint('SPEECH_RECOGNITION', 'ambient_duration', 0.5)
-                )
-                
-                phrase_time_limit = self.config.getint('SPEECH_RECOGNITION', 'phrase_time_limit', 7)
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
-                
-                command = self.recognizer.recognize_google(audio).lower()
-                
-                if not wake_word_mode:
-                    print(f"You: {command}")
-                    self.logger.debug(f"Heard: {command}")
-                
-                # Check for wake words if in wake word mode
-                if wake_word_mode:
-                    return command if any(wake_word in command for wake_word in self.wake_words) else ""
-                
-                return command
-                
-        except sr.WaitTimeoutError:
-            return ""
-        except sr.UnknownValueError:
-            if not wake_word_mode:
-                self.logger.debug("Could not understand audio")
-            return ""
-        except sr.RequestError as e:
-            self.logger.error(f"Speech recognition error: {e}")
-            if not wake_word_mode:
-                self.speak("My speech service is having issues.")
-            return ""
-    
-    def continuous_listen(self, callback):
-        """Continuous listening with wake word detection"""
-        self.is_listening = True
-        self.logger.info("Started continuous listening mode")
-        
-        while self.is_listening:
-            try:
-                wake_word = self.listen(timeout=1, wake_word_mode=True)
-                if wake_word and any(word in wake_word for word in self.wake_words):
-                    self.speak("Yes, how can I help?")
-                    command = self.listen()
-                    if command:
-                        callback(command)
-                
-                time.sleep(0.1)  # Small delay to prevent excessive CPU usage
-            except KeyboardInterrupt:
-                self.stop_listening()
-                break
-            except Exception as e:
-                self.logger.error(f"Continuous listen error: {e}")
-                time.sleep(1)
-    
-    def stop_listening(self):
-        """Stop continuous listening"""
-        self.is_listening = False
-        self.logger.info("Stopped continuous listening")
-
-# ===== Main AIVA Class =====
-class AIVA:
-    def __init__(self):
-        # Initialize components
-        self.config = AIVAConfig()
-        self.logger = AIVALogger(self.config)
-        self.database = AIVADatabase()
-        self.voice_manager = VoiceManager(self.config, self.logger)
-        self.excel_manager = ExcelManager(self.logger)
-        self.email_manager = EmailManager(self.config, self.logger, self.database)
-        self.web_search = WebSearchManager(self.logger)
-        self.system_monitor = SystemMonitor(self.logger)
-        
-        # Application state
-        self.is_running = False
-        self.conversation_mode = False
-        
-        self.logger.info("AIVA initialized successfully")
-    
-    def start(self):
-        """Start AIVA assistant"""
-        self.is_running = True
-        self.voice_manager.speak("Hello! I am AIVA, your Advanced AI Voice Assistant. How can I help you today?")
-        
-        try:
-            # Check if continuous mode is requested
-            self.voice_manager.speak("Would you like to enable continuous listening mode? Say yes or no.")
-            response = self.voice_manager.listen()
-            
-            if "yes" in response:
-                self.voice_manager.speak("Continuous mode enabled. Just say 'Hey AIVA' to get my attention.")
-                self.continuous_mode()
-            else:
-                self.command_mode()
-                
-        except KeyboardInterrupt:
-            self.shutdown()
-    
-    def continuous_mode(self):
-        """Run in continuous listening mode"""
-        self.voice_manager.continuous_listen(self.process_command)
-    
-    def command_mode(self):
-        """Run in traditional command mode"""
-        while self.is_running:
-            try:
-                command = self.voice_manager.listen()
-                if command:
-                    if any(word in command for word in ["exit", "stop", "goodbye", "quit"]):
-                        self.shutdown()
-                        break
-                    self.process_command(command)
-            except KeyboardInterrupt:
-                self.shutdown()
-                break
-    
-    def process_command(self, command: str):
-        """Enhanced command processing with comprehensive features"""
-        self.logger.info(f"Processing command: {command}")
-        
-        try:
-            success = True
-            response = ""
-            
-            # Excel commands
-            if self.is_excel_command(command):
-                success = self.handle_excel_command(command)
-                response = "Excel command executed"
-            
-            # Email commands
-            elif self.is_email_command(command):
-                success = self.handle_email_command(command)
-                response = "Email command executed"
-            
-            # System commands
-            elif self.is_system_command(command):
-                success = self.handle_system_command(command)
-                response = "System command executed"
-            
-            # Web/Search commands
-            elif self.is_web_command(command):
-                success = self.handle_web_command(command)
-                response = "Web command executed"
-            
-            # Utility commands
-            elif self.is_utility_command(command):
-                success = self.handle_utility_command(command)
-                response = "Utility command executed"
-            
-            # Information commands
-            elif self.is_info_command(command):
-                success = self.handle_info_command(command)
-                response = "Information command executed"
-            
-            # Media commands
-            elif self.is_media_command(command):
-                success = self.handle_media_command(command)
-                response = "Media command executed"
-            
-            # Smart home commands (placeholder for future integration)
-            elif self.is_smart_home_command(command):
-                success = self.handle_smart_home_command(command)
-                response = "Smart home command executed"
-            
-            else:
-                self.voice_manager.speak("I'm sorry, I don't understand that command. You can ask me about my capabilities by saying 'what can you do'.")
-                success = False
-                response = "Command not recognized"
-            
-            # Log command to database
-            self.database.log_command(command, success, response)
-            
-        except Exception as e:
-            self.logger.error(f"Command processing error: {e}")
-            self.voice_manager.speak("I encountered an error processing that command.")
-            self.database.log_command(command, False, str(e))
-    
-    # Command category checkers
-    def is_excel_command(self, command: str) -> bool:
-        excel_keywords = [
-            "excel", "spreadsheet", "cell", "column", "row", "formula",
-            "sheet", "workbook", "chart", "graph", "pivot", "table"
-        ]
-        return any(keyword in command.lower() for keyword in excel_keywords)
-    
-    def is_email_command(self, command: str) -> bool:
-        email_keywords = ["email", "mail", "send", "compose", "gmail", "inbox"]
-        return any(keyword in command.lower() for keyword in email_keywords)
-    
-    def is_system_command(self, command: str) -> bool:
-        system_keywords = [
-            "shutdown", "restart", "sleep", "lock", "system info",
-            "task manager", "processes", "cpu", "memory", "disk"
-        ]
-        return any(keyword in command.lower() for keyword in system_keywords)
-    
-    def is_web_command(self, command: str) -> bool:
-        web_keywords = [
-            "search", "google", "youtube", "browse", "website",
-            "chrome", "firefox", "browser", "tab", "bookmark"
-        ]
-        return any(keyword in command.lower() for keyword in web_keywords)
-    
-    def is_utility_command(self, command: str) -> bool:
-        utility_keywords = [
-            "time", "date", "weather", "calendar", "reminder",
-            "note", "calculate", "convert", "translate"
-        ]
-        return any(keyword in command.lower() for keyword in utility_keywords)
-    
-    def is_info_command(self, command: str) -> bool:
-        info_keywords = [
-            "who are you", "what can you do", "help", "commands",
-            "version", "about", "capabilities"
-        ]
-        return any(keyword in command.lower() for keyword in info_keywords)
-    
-    def is_media_command(self, command: str) -> bool:
-        media_keywords = [
-            "play", "pause", "stop", "music", "video", "volume",
-            "spotify", "netflix", "youtube music"
-        ]
-        return any(keyword in command.lower() for keyword in media_keywords)
-    
-    def is_smart_home_command(self, command: str) -> bool:
-        smart_keywords = [
-            "lights", "temperature", "thermostat", "door", "lock",
-            "security", "camera", "smart home"
-        ]
-        return any(keyword in command.lower() for keyword in smart_keywords)
-    
-    # Command handlers (implementations)
-    def handle_excel_command(self, command: str) -> bool:
-        """Handle Excel-related commands"""
-        try:
-            if not self.excel_manager.initialize():
-                self.voice_manager.speak("I couldn't open Excel. Please
+# AIVA - AI Voice Assistant
+# Complete GitHub-Ready Project Structure
+
+import time
+_IMPORT_START = time.perf_counter()
+
+import os
+import re
+import sys
+import math
+import datetime
+import webbrowser
+import speech_recognition as sr
+import urllib.parse
+import json
+import logging
+import logging.handlers
+import threading
+import subprocess
+import importlib
+import importlib.util
+import contextlib
+import shutil
+from pathlib import Path
+from types import MappingProxyType
+import sqlite3
+import queue
+import atexit
+import difflib
+import hashlib
+import heapq
+import array
+import wave
+import collections
+import functools
+import itertools
+import operator
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+import configparser
+
+try:
+    import numpy as np
+except ImportError:  # Optional: only the local wake word detector and intent classifier need it
+    np = None
+
+# Heavy optional modules (win32com, xlsxwriter, pyautogui, psutil, pyttsx3)
+# are imported on first use through lazy_import()
+
+# ===== Startup Profiling =====
+class StartupProfiler:
+    """Import and initialization times per component during startup"""
+    
+    def __init__(self, started: float = None):
+        self.started = time.perf_counter() if started is None else started
+        self.timings: List[Tuple[str, str, float]] = []
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def measure(self, name: str, phase: str = "init"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, phase, time.perf_counter() - start)
+    
+    def record(self, name: str, phase: str, seconds: float):
+        with self._lock:
+            self.timings.append((phase, name, seconds))
+    
+    def mark(self, name: str) -> float:
+        """Record a milestone (seconds since start), keeping the first occurrence"""
+        with self._lock:
+            return self.marks.setdefault(name, time.perf_counter() - self.started)
+    
+    def report(self) -> str:
+        with self._lock:
+            timings = list(self.timings)
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        lines = ["Startup profile:"]
+        for phase, name, seconds in timings:
+            lines.append(f"  {phase:<7} {name:<24} {seconds * 1000:8.1f} ms")
+        for name, seconds in marks:
+            lines.append(f"  {'mark':<7} {name:<24} {seconds * 1000:8.1f} ms after start")
+        return "\n".join(lines)
+
+startup_profiler = StartupProfiler(_IMPORT_START)
+startup_profiler.record("aiva (module imports)", "import", time.perf_counter() - _IMPORT_START)
+
+def lazy_import(module_name: str):
+    """Import a module on first use, timing the import in the startup profile"""
+    module = sys.modules.get(module_name)
+    if module is None:
+        with startup_profiler.measure(module_name, "import"):
+            module = importlib.import_module(module_name)
+    return module
+
+def warm_up(name: str, factory) -> concurrent.futures.Future:
+    """Run a slow initializer on a background thread; result() waits for it"""
+    future = concurrent.futures.Future()
+    
+    def build():
+        try:
+            with startup_profiler.measure(name):
+                future.set_result(factory())
+        except Exception as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=build, name=f"Warmup-{name}", daemon=True).start()
+    return future
+
+# ===== Metrics and Tracing =====
+class LatencyHistogram:
+    """HDR-style latency histogram with log-linear buckets.
+    
+    Values are kept in microseconds with 32 sub-buckets per power of two,
+    so percentiles are within about 3% of the recorded values while memory
+    grows only with the range of values seen, not their number.
+    """
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF = SUB_BUCKETS >> 1
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def bucket(cls, value_us: int) -> int:
+        if value_us < cls.SUB_BUCKETS:
+            return value_us
+        shift = value_us.bit_length() - cls.SUB_BUCKET_BITS
+        return shift * cls.HALF + (value_us >> shift)
+    
+    @classmethod
+    def bucket_range(cls, index: int) -> Tuple[int, int]:
+        """Lowest and highest microsecond value counted in a bucket"""
+        if index < cls.SUB_BUCKETS:
+            return index, index
+        shift = (index - cls.HALF) // cls.HALF
+        low = (index - shift * cls.HALF) << shift
+        return low, low + (1 << shift) - 1
+    
+    def record(self, seconds: float):
+        value_us = max(0, int(seconds * 1000000))
+        index = self.bucket(value_us)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total_us += value_us
+            if self.min_us is None or value_us < self.min_us:
+                self.min_us = value_us
+            if value_us > self.max_us:
+                self.max_us = value_us
+    
+    def percentile(self, fraction: float) -> float:
+        """Value in seconds below which the given fraction of samples fall"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(fraction * self.count))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(self.bucket_range(index)[1], self.max_us) / 1000000
+            return self.max_us / 1000000
+    
+    def count_at_or_below(self, seconds: float) -> int:
+        limit = seconds * 1000000
+        with self._lock:
+            return sum(count for index, count in self.counts.items() if self.bucket_range(index)[1] <= limit)
+    
+    @property
+    def mean(self) -> float:
+        return self.total_us / self.count / 1000000 if self.count else 0.0
+    
+    @property
+    def max(self) -> float:
+        return self.max_us / 1000000
+    
+    def copy(self) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        with self._lock:
+            histogram.counts = dict(self.counts)
+            histogram.count = self.count
+            histogram.total_us = self.total_us
+            histogram.min_us = self.min_us
+            histogram.max_us = self.max_us
+        return histogram
+    
+    def merge(self, other: "LatencyHistogram"):
+        other = other.copy()
+        with self._lock:
+            for index, count in other.counts.items():
+                self.counts[index] = self.counts.get(index, 0) + count
+            self.count += other.count
+            self.total_us += other.total_us
+            if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+                self.min_us = other.min_us
+            self.max_us = max(self.max_us, other.max_us)
+    
+    def since(self, earlier: "LatencyHistogram") -> "LatencyHistogram":
+        """Samples recorded after an earlier copy of this histogram"""
+        current = self.copy()
+        delta = LatencyHistogram()
+        for index, count in current.counts.items():
+            count -= earlier.counts.get(index, 0)
+            if count > 0:
+                delta.counts[index] = count
+        delta.count = current.count - earlier.count
+        delta.total_us = current.total_us - earlier.total_us
+        if delta.counts:
+            # Exact extremes are only known for the whole histogram
+            delta.min_us = max(self.bucket_range(min(delta.counts))[0], current.min_us or 0)
+            delta.max_us = min(self.bucket_range(max(delta.counts))[1], current.max_us)
+        return delta
+    
+    def to_row(self) -> Tuple[int, int, Optional[int], int, str]:
+        with self._lock:
+            return self.count, self.total_us, self.min_us, self.max_us, json.dumps(self.counts)
+    
+    @classmethod
+    def from_row(cls, count: int, total_us: int, min_us: Optional[int], max_us: int,
+                 buckets: str) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(index): value for index, value in json.loads(buckets).items()}
+        histogram.count = count
+        histogram.total_us = total_us
+        histogram.min_us = min_us
+        histogram.max_us = max_us
+        return histogram
+
+class Tracer:
+    """Latency histograms per stage of the voice-to-action path.
+    
+    Stages are timed with span() or the traced() decorator. Recording
+    costs a couple of microseconds, so tracing stays on in production;
+    drain() hands out what was recorded since the last call for the
+    metrics table.
+    """
+    PROMETHEUS_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._drained: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+    
+    def record(self, name: str, seconds: float):
+        if self.enabled:
+            self.histogram(name).record(seconds)
+    
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Time the enclosed block as stage name (errors included)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.histogram(name).record(time.perf_counter() - start)
+    
+    def traced(self, name: str):
+        """Decorator timing every call of a function as stage name"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.histogram(name).record(time.perf_counter() - start)
+            return wrapper
+        return decorate
+    
+    def snapshot(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            names = sorted(self.histograms)
+        return {name: self.histograms[name].copy() for name in names}
+    
+    def drain(self) -> Dict[str, LatencyHistogram]:
+        """Samples per stage recorded since the previous drain"""
+        deltas = {}
+        for name, current in self.snapshot().items():
+            delta = current.since(self._drained.get(name, LatencyHistogram()))
+            self._drained[name] = current
+            if delta.count:
+                deltas[name] = delta
+        return deltas
+    
+    def undrain(self, deltas: Dict[str, LatencyHistogram]):
+        """Put back samples from a drain that could not be saved"""
+        for name, delta in deltas.items():
+            earlier = self._drained[name].since(delta)
+            self._drained[name] = earlier
+    
+    @staticmethod
+    def report(histograms: Dict[str, LatencyHistogram]) -> str:
+        lines = [f"{'stage':<32} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, histogram in sorted(histograms.items()):
+            lines.append(
+                f"{name:<32} {histogram.count:>8,} {histogram.percentile(0.50) * 1000:>9.2f} "
+                f"{histogram.percentile(0.95) * 1000:>9.2f} {histogram.percentile(0.99) * 1000:>9.2f} "
+                f"{histogram.max * 1000:>9.2f}"
+            )
+        return "\n".join(lines)
+    
+    @classmethod
+    def prometheus(cls, histograms: Dict[str, LatencyHistogram], metric: str = "aiva_stage_latency_seconds") -> str:
+        """Prometheus text exposition format, one histogram series per stage"""
+        lines = [f"# HELP {metric} Latency of each stage of the voice-to-action path",
+                 f"# TYPE {metric} histogram"]
+        for name, histogram in sorted(histograms.items()):
+            for bound in cls.PROMETHEUS_BUCKETS:
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} '
+                             f'{histogram.count_at_or_below(bound)}')
+            lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.total_us / 1000000}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+tracer = Tracer()
+
+
+def spoken_duration(seconds: float) -> str:
+    """A duration as read out, keeping sub-millisecond stages distinguishable"""
+    if seconds >= 1:
+        return f"{seconds:.1f} seconds"
+    if seconds >= 0.01:
+        return f"{seconds * 1000:.0f} milliseconds"
+    if seconds >= 0.001:
+        return f"{seconds * 1000:.1f} milliseconds"
+    return f"{seconds * 1e6:.0f} microseconds"
+
+# ===== Command Keyword Tables =====
+# Keywords per command category. A category matches when any of its
+# keywords occurs as a substring of the (lowercased) command.
+COMMAND_KEYWORDS: Dict[str, List[str]] = {
+    "excel": [
+        "excel", "spreadsheet", "cell", "column", "row", "formula",
+        "sheet", "workbook", "chart", "graph", "pivot", "table"
+    ],
+    "email": ["email", "mail", "send", "compose", "gmail", "inbox"],
+    "system": [
+        "shutdown", "restart", "sleep", "lock", "system info",
+        "task manager", "processes", "cpu", "memory", "disk"
+    ],
+    "web": [
+        "search", "google", "youtube", "browse", "website",
+        "chrome", "firefox", "browser", "tab", "bookmark"
+    ],
+    "utility": [
+        "time", "date", "weather", "calendar", "reminder",
+        "note", "calculate", "convert", "translate"
+    ],
+    "info": [
+        "who are you", "what can you do", "help", "commands",
+        "version", "about", "capabilities"
+    ],
+    "media": [
+        "play", "pause", "stop", "music", "video", "volume",
+        "spotify", "netflix", "youtube music"
+    ],
+    "smart_home": [
+        "lights", "temperature", "thermostat", "door", "lock",
+        "security", "camera", "smart home"
+    ],
+    "performance": ["performance report", "performance stats", "latency report"],
+    "control": ["cancel that", "cancel the last command", "cancel everything", "cancel all commands", "never mind"]
+}
+
+# Example utterances per category for the intent classifier, which ranks
+# categories when no keyword or several keywords match
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "excel": [
+        "open excel", "create a new spreadsheet", "write sales data in cell a1",
+        "fill column b with january february march", "sum formula in cell c10 for c1 to c9",
+        "create a chart from a1 to c10", "make a pivot table of the sales", "format the header row in bold",
+        "add a new worksheet", "rename the sheet to budget", "average of column d",
+        "highlight cells above 100 in red", "insert a row above row five", "save the workbook"
+    ],
+    "email": [
+        "send an email to john", "compose a message to the team about the project update",
+        "email my boss that i will be late", "write a mail to sarah", "send mail using template meeting",
+        "check my inbox", "reply to the last message", "draft an email to hr",
+        "forward this to mark", "send the report to my manager", "mail the invoice to the client",
+        "let anna know by email that the meeting moved", "open gmail",
+        "email the budget spreadsheet to finance", "send the updated workbook to john",
+        "share the report with my manager by mail"
+    ],
+    "system": [
+        "show system information", "what is the cpu usage", "how much memory is used",
+        "how much disk space is left", "lock my computer", "shutdown in 5 minutes", "restart the pc",
+        "put the computer to sleep", "reboot the computer", "power off", "open task manager",
+        "which processes use the most memory", "what programs are running", "kill the frozen app",
+        "how hot is the processor", "log me off"
+    ],
+    "web": [
+        "search for python tutorials", "google the nearest pharmacy", "open youtube",
+        "open a new tab", "close this tab", "go to wikipedia", "browse to github",
+        "bookmark this page", "look up the population of canada", "find recipes for lasagna online",
+        "open the website of the bbc", "refresh the page", "scroll down"
+    ],
+    "utility": [
+        "what time is it", "what's the date today", "what's the weather like", "will it rain tomorrow",
+        "set a reminder for 3 pm", "remind me to call mom", "take a note", "add milk to my notes",
+        "calculate 15 percent of 80", "what is 12 times 7", "convert 5 miles to kilometers",
+        "translate where is the station to french", "how many days until christmas", "set a timer for ten minutes",
+        "what's on my calendar"
+    ],
+    "info": [
+        "who are you", "what can you do", "help", "list your commands", "what version are you",
+        "tell me about yourself", "what are your capabilities", "how do i use you", "what are you able to do",
+        "introduce yourself"
+    ],
+    "media": [
+        "play some music", "pause", "stop the music", "next song", "skip this track",
+        "play the previous song", "turn up the volume", "turn the volume down", "make it louder",
+        "mute the sound", "play jazz on spotify", "resume playback", "shuffle my playlist",
+        "watch something on netflix", "play the video"
+    ],
+    "smart_home": [
+        "turn on the lights", "switch off the kitchen lights", "dim the bedroom lights",
+        "set the thermostat to 21 degrees", "make it warmer in here", "is the front door locked",
+        "lock the front door", "show the security camera", "arm the alarm", "open the garage",
+        "turn on the heating", "is the back door closed"
+    ],
+    "performance": [
+        "performance report", "show performance stats", "latency report", "how fast are you responding",
+        "which stage is slowest", "how long do commands take"
+    ],
+    "control": [
+        "cancel that", "cancel the last command", "cancel everything", "cancel all commands",
+        "never mind", "forget it", "stop that command", "abort"
+    ]
+}
+
+# Order in which categories win when a command matches several of them
+DEFAULT_ROUTING_PRIORITY = [
+    "control", "performance", "excel", "email", "system", "web", "utility", "info", "media", "smart_home"
+]
+
+# ===== Configuration Management =====
+# Written to a new configuration file; snapshots fall back to these for missing keys
+CONFIG_DEFAULTS = {
+    'VOICE': {
+        'rate': '150',
+        'volume': '0.9',
+        'voice_index': '0',
+        'barge_in': 'true',
+        'barge_in_ratio': '3.0',
+        'barge_in_duration': '0.3',
+        'cache_enabled': 'true',
+        'cache_dir': 'data/tts_cache',
+        'cache_max_mb': '20'
+    },
+    'SPEECH_RECOGNITION': {
+        'timeout': '5',
+        'phrase_time_limit': '7',
+        'ambient_duration': '0.5',
+        'energy_ratio': '1.5',
+        'noise_damping': '0.15',
+        'min_energy_threshold': '50',
+        'noise_window': '2.0',
+        'recognizer_workers': '2',
+        'audio_buffer_seconds': '10',
+        'phrase_queue_size': '4',
+        'overflow_policy': 'drop_oldest',
+        'wake_word_engine': 'transcript',
+        'wake_word_templates': 'templates/wake_words',
+        'wake_word_threshold': '0.73'
+    },
+    'APPLICATIONS': {
+        'chrome_path': 'C:/Program Files/Google/Chrome/Application/chrome.exe',
+        'excel_auto_open': 'false',
+        'excel_backend': 'auto',
+        'excel_output_dir': 'exports',
+        'browser_delay': '3'
+    },
+    'EMAIL': {
+        'default_domain': 'gmail.com',
+        'auto_send': 'true',
+        'send_delay': '5'
+    },
+    'RECOGNIZER': {
+        'backends': 'google, vosk',
+        'timeout': '5',
+        'race_width': '1',
+        'failure_threshold': '3',
+        'reset_timeout': '30',
+        'language': 'en-US',
+        'vosk_model': 'models/vosk'
+    },
+    'ROUTING': {
+        'priority': ', '.join(DEFAULT_ROUTING_PRIORITY),
+        'classifier': 'true',
+        'min_confidence': '0.4',
+        'margin': '0.05'
+    },
+    'UTTERANCE_CACHE': {
+        'enabled': 'true',
+        'size': '256',
+        'ttl': '300',
+        'dedup_window_ms': '1000',
+        'uncached': 'email, system',
+        'repeatable': 'media'
+    },
+    'DATABASE': {
+        'path': 'data/aiva.db',
+        'flush_interval': '0.5',
+        'batch_size': '500',
+        'template_check_interval': '1.0'
+    },
+    'STARTUP': {
+        'warm_up': 'database, voice, system',
+        'listening_target_ms': '300'
+    },
+    'SYSTEM_MONITOR': {
+        'sample_interval': '2',
+        'history_minutes': '60',
+        'process_interval': '10',
+        'disk_path': '/'
+    },
+    'SCHEDULER': {
+        'workers': '4',
+        'limits': 'excel:1, email:1, system:2, web:2',
+        'default_limit': '1',
+        'timeout': '60',
+        'timeouts': 'email:120'
+    },
+    'METRICS': {
+        'enabled': 'true',
+        'flush_interval': '60',
+        'prometheus_file': ''
+    },
+    'LOGGING': {
+        'level': 'INFO',
+        'file': 'logs/aiva.log',
+        'max_size': '10485760',
+        'backup_count': '5',
+        'format': 'text',
+        'console': 'true'
+    },
+    'CONFIG': {
+        'watch_interval': '2'
+    },
+    'PLUGINS': {
+        'directory': 'plugins'
+    }
+}
+
+
+class Setting:
+    """Type and allowed values of one configuration key"""
+    __slots__ = ("kind", "low", "high", "choices", "item")
+    
+    def __init__(self, kind: str = "str", low: float = None, high: float = None, choices: Tuple = None,
+                 item: "Setting" = None):
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.choices = choices
+        # Type of each value of a mapping
+        self.item = item
+    
+    def parse(self, raw: str):
+        """Convert a raw string, raising ValueError when it is not allowed"""
+        raw = raw.strip()
+        if self.kind == "bool":
+            value = configparser.ConfigParser.BOOLEAN_STATES.get(raw.lower())
+            if value is None:
+                raise ValueError(f"expected true or false, got {raw!r}")
+            return value
+        if self.kind == "list":
+            return tuple(item.strip() for item in raw.split(',') if item.strip())
+        if self.kind == "mapping":
+            pairs = (item.partition(':') for item in raw.split(','))
+            parse = self.item.parse if self.item else str.strip
+            return MappingProxyType({name.strip(): parse(value) for name, _, value in pairs if value.strip()})
+        if self.kind in ("int", "float"):
+            value = int(raw) if self.kind == "int" else float(raw)
+            if (self.low is not None and value < self.low) or (self.high is not None and value > self.high):
+                raise ValueError(f"{value} is outside {self.low if self.low is not None else '-inf'}.."
+                                 f"{self.high if self.high is not None else 'inf'}")
+            return value
+        if self.choices:
+            for choice in self.choices:
+                if raw.lower() == choice.lower():
+                    return choice
+            raise ValueError(f"expected one of {', '.join(self.choices)}, got {raw!r}")
+        return raw
+
+
+# Keys not listed here are kept as strings
+CONFIG_SCHEMA = {
+    'VOICE': {
+        'rate': Setting("int", low=1),
+        'volume': Setting("float", 0.0, 1.0),
+        'voice_index': Setting("int", low=0),
+        'barge_in': Setting("bool"),
+        'barge_in_ratio': Setting("float", low=0.0),
+        'barge_in_duration': Setting("float", low=0.0),
+        'cache_enabled': Setting("bool"),
+        'cache_max_mb': Setting("float", low=0.0)
+    },
+    'SPEECH_RECOGNITION': {
+        'timeout': Setting("float", low=0.0),
+        'phrase_time_limit': Setting("float", low=0.0),
+        'ambient_duration': Setting("float", low=0.0),
+        'energy_ratio': Setting("float", low=1.0),
+        'noise_damping': Setting("float", 0.0, 1.0),
+        'min_energy_threshold': Setting("float", low=0.0),
+        'noise_window': Setting("float", low=0.0),
+        'recognizer_workers': Setting("int", low=1),
+        'audio_buffer_seconds': Setting("float", low=0.0),
+        'phrase_queue_size': Setting("int", low=1),
+        'overflow_policy': Setting(choices=("drop_oldest", "block")),
+        'wake_word_engine': Setting(choices=("transcript", "template")),
+        'wake_word_threshold': Setting("float", 0.0, 1.0)
+    },
+    'APPLICATIONS': {
+        'excel_auto_open': Setting("bool"),
+        'excel_backend': Setting(choices=("auto", "com", "xlsx")),
+        'browser_delay': Setting("float", low=0.0)
+    },
+    'EMAIL': {
+        'auto_send': Setting("bool"),
+        'send_delay': Setting("float", low=0.0)
+    },
+    'RECOGNIZER': {
+        'backends': Setting("list"),
+        'timeout': Setting("float", low=0.0),
+        'race_width': Setting("int", low=1),
+        'failure_threshold': Setting("int", low=1),
+        'reset_timeout': Setting("float", low=0.0)
+    },
+    'ROUTING': {
+        'priority': Setting("list"),
+        'classifier': Setting("bool"),
+        'min_confidence': Setting("float", 0.0, 1.0),
+        'margin': Setting("float", 0.0, 1.0)
+    },
+    'UTTERANCE_CACHE': {
+        'enabled': Setting("bool"),
+        'size': Setting("int", low=0),
+        'ttl': Setting("float", low=0.0),
+        'dedup_window_ms': Setting("float", low=0.0),
+        'uncached': Setting("list"),
+        'repeatable': Setting("list")
+    },
+    'DATABASE': {
+        'flush_interval': Setting("float", low=0.0),
+        'batch_size': Setting("int", low=1),
+        'template_check_interval': Setting("float", low=0.0)
+    },
+    'STARTUP': {
+        'warm_up': Setting("list"),
+        'listening_target_ms': Setting("float", low=0.0)
+    },
+    'SYSTEM_MONITOR': {
+        'sample_interval': Setting("float", low=0.1),
+        'history_minutes': Setting("float", low=0.0),
+        'process_interval': Setting("float", low=0.1)
+    },
+    'SCHEDULER': {
+        'workers': Setting("int", low=1),
+        'limits': Setting("mapping", item=Setting("int", low=1)),
+        'default_limit': Setting("int", low=1),
+        'timeout': Setting("float", low=0.0),
+        'timeouts': Setting("mapping", item=Setting("float", low=0.0))
+    },
+    'METRICS': {
+        'enabled': Setting("bool"),
+        'flush_interval': Setting("float", low=1.0)
+    },
+    'LOGGING': {
+        'level': Setting(choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")),
+        'max_size': Setting("int", low=0),
+        'backup_count': Setting("int", low=0),
+        'format': Setting(choices=("text", "json")),
+        'console': Setting("bool")
+    },
+    'CONFIG': {
+        'watch_interval': Setting("float", low=0.0)
+    }
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _config_section_type(section: str, keys: Tuple[str, ...]):
+    # One read-only record type per section layout, reused across reloads
+    return collections.namedtuple(section.title().replace('_', ''), keys, rename=True)
+
+
+def config_snapshot(parser: configparser.ConfigParser) -> Tuple[object, List[str]]:
+    """Typed, read-only view of a parsed configuration.
+    
+    Returns the snapshot and a list of problems; a value that is missing or
+    invalid takes its default. Sections and keys are attributes, e.g.
+    snapshot.SPEECH_RECOGNITION.timeout is a float.
+    """
+    errors = []
+    sections = {}
+    for section in list(CONFIG_DEFAULTS) + [name for name in parser.sections()
+                                            if name not in CONFIG_DEFAULTS and name.isidentifier()]:
+        defaults = CONFIG_DEFAULTS.get(section, {})
+        schema = CONFIG_SCHEMA.get(section, {})
+        raw = dict(defaults)
+        if parser.has_section(section):
+            raw.update((key, parser.get(section, key, raw=True)) for key in parser.options(section))
+        
+        values = {}
+        for key, text in raw.items():
+            if not key.isidentifier():
+                # Still readable through AIVAConfig.get()
+                continue
+            setting = schema.get(key, Setting())
+            try:
+                values[key] = setting.parse(text)
+            except ValueError as e:
+                errors.append(f"{section}/{key}: {e}")
+                if key in defaults:
+                    values[key] = setting.parse(defaults[key])
+        sections[section] = _config_section_type(section, tuple(values))(**values)
+    
+    return _config_section_type("ConfigSnapshot", tuple(sections))(**sections), errors
+
+
+class AIVAConfig:
+    """Configuration file plus a typed snapshot of it.
+    
+    Hot paths read `settings`, which is replaced as a whole (never modified)
+    when the file changes, so a reader always sees one consistent version.
+    get()/getint() and friends read the same parsed file for code that
+    still looks values up by name.
+    """
+    
+    def __init__(self, config_file: str = "config/aiva_config.ini"):
+        self.config_file = config_file
+        self.config = configparser.ConfigParser()
+        self.settings = None
+        # Problems found by the last load, e.g. values out of range
+        self.errors: List[str] = []
+        self.reloads = 0
+        self._overrides: Dict[Tuple[str, str], str] = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.load_config()
+    
+    def load_config(self):
+        """Load configuration from file or create default"""
+        if os.path.exists(self.config_file):
+            self._mtime = self._file_mtime()
+            self.config.read(self.config_file)
+        else:
+            self.create_default_config()
+        self.settings, self.errors = config_snapshot(self.config)
+    
+    def create_default_config(self):
+        """Create default configuration file"""
+        os.makedirs(os.path.dirname(self.config_file) or ".", exist_ok=True)
+        
+        self.config.read_dict(CONFIG_DEFAULTS)
+        
+        with open(self.config_file, 'w') as f:
+            self.config.write(f)
+        self._mtime = self._file_mtime()
+    
+    def _file_mtime(self):
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def subscribe(self, callback):
+        """Call callback(settings, previous) after each reload that changes the settings"""
+        self._subscribers.append(callback)
+    
+    def reload(self) -> bool:
+        """Re-read the file and swap in a new snapshot.
+        
+        An invalid file is rejected as a whole: the current settings stay
+        in effect and the problems are left in errors.
+        """
+        with self._lock:
+            self._mtime = self._file_mtime()
+            parser = configparser.ConfigParser()
+            try:
+                parser.read(self.config_file)
+            except configparser.Error as e:
+                self.errors = [f"{self.config_file}: {e}"]
+                return False
+            for (section, key), value in self._overrides.items():
+                if not parser.has_section(section):
+                    parser.add_section(section)
+                parser.set(section, key, value)
+            
+            settings, errors = config_snapshot(parser)
+            if errors:
+                self.errors = errors
+                return False
+            previous = self.settings
+            self.config, self.settings, self.errors = parser, settings, []
+            self.reloads += 1
+        
+        if settings != previous:
+            for callback in list(self._subscribers):
+                try:
+                    callback(settings, previous)
+                except Exception as e:
+                    self.errors.append(f"{getattr(callback, '__qualname__', callback)}: {e}")
+        return True
+    
+    def watch(self, logger: "AIVALogger" = None, interval: float = None):
+        """Poll the file for changes on a background thread"""
+        interval = self.settings.CONFIG.watch_interval if interval is None else interval
+        if self._watcher is not None or interval <= 0:
+            return
+        
+        def run():
+            while not self._stop.wait(interval):
+                if self._file_mtime() == self._mtime:
+                    continue
+                applied = self.reload()
+                if logger is None:
+                    continue
+                if applied:
+                    logger.info(f"Configuration reloaded from {self.config_file}")
+                else:
+                    logger.error("Configuration not reloaded, keeping previous settings")
+                for error in self.errors:
+                    logger.error(f"Configuration error: {error}")
+        
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="ConfigWatcher", daemon=True)
+        self._watcher.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+    
+    def get(self, section, key, fallback=None):
+        """Get configuration value"""
+        return self.config.get(section, key, fallback=fallback)
+    
+    def set(self, section, key, value):
+        """Override a configuration value for this run (not saved, kept across reloads)"""
+        with self._lock:
+            self._overrides[(section, key)] = str(value)
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            self.config.set(section, key, str(value))
+            self.settings, self.errors = config_snapshot(self.config)
+    
+    def getint(self, section, key, fallback=0):
+        """Get integer configuration value"""
+        return self.config.getint(section, key, fallback=fallback)
+    
+    def getfloat(self, section, key, fallback=0.0):
+        """Get float configuration value"""
+        return self.config.getfloat(section, key, fallback=fallback)
+    
+    def getboolean(self, section, key, fallback=False):
+        """Get boolean configuration value"""
+        return self.config.getboolean(section, key, fallback=fallback)
+    
+    def getlist(self, section, key, fallback=None):
+        """Get comma separated configuration value as a list"""
+        value = self.config.get(section, key, fallback=None)
+        if value is None:
+            return list(fallback or [])
+        return [item.strip() for item in value.split(',') if item.strip()]
+    
+    def getmapping(self, section, key, fallback=None):
+        """Get a comma separated list of name:value pairs as a dict"""
+        mapping = dict(fallback or {})
+        for item in self.getlist(section, key):
+            name, _, value = item.partition(':')
+            if value:
+                mapping[name.strip()] = value.strip()
+        return mapping
+
+# ===== Logging Setup =====
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                    .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that only merges the message arguments on the calling thread.
+    
+    The stock prepare() runs the full formatter (timestamps, tracebacks)
+    before enqueueing; here that is left to the listener's handlers.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve arguments now, while the objects they refer to are unchanged
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class AIVALogger:
+    """Logging through a queue, so callers never wait on disk or console I/O.
+    
+    Records are put on a queue by a QueueHandler on the root logger, and a
+    QueueListener thread writes them to a size-rotated log file (text or
+    JSON lines) and the console. Messages may use %-style arguments,
+    which are only formatted when the level is enabled; hot paths can
+    also check debug_enabled before building an f-string.
+    """
+    TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    # The listener of the most recent AIVALogger, replaced on setup
+    _listener: Optional[logging.handlers.QueueListener] = None
+    _queue_handler: Optional[logging.handlers.QueueHandler] = None
+    _exit_hook = False
+    
+    def __init__(self, config: AIVAConfig):
+        self.config = config
+        self.setup_logging()
+        config.subscribe(self._on_config_change)
+    
+    def _on_config_change(self, settings, previous):
+        """Rebuild the handlers when the LOGGING section of a reloaded file changed"""
+        if settings.LOGGING != previous.LOGGING:
+            self.setup_logging()
+    
+    def setup_logging(self):
+        """Setup logging configuration"""
+        settings = self.config.settings.LOGGING
+        os.makedirs(os.path.dirname(settings.file) or ".", exist_ok=True)
+        
+        file_handler = logging.handlers.RotatingFileHandler(
+            settings.file,
+            maxBytes=settings.max_size,
+            backupCount=settings.backup_count,
+            encoding='utf-8',
+            delay=True
+        )
+        if settings.format == 'json':
+            file_handler.setFormatter(JsonLogFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(self.TEXT_FORMAT))
+        handlers = [file_handler]
+        if settings.console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(self.TEXT_FORMAT))
+            handlers.append(console_handler)
+        
+        root = logging.getLogger()
+        if not AIVALogger._exit_hook:
+            # Registered before the components' own exit hooks, so it runs after them
+            atexit.register(AIVALogger.stop)
+            AIVALogger._exit_hook = True
+        AIVALogger.stop()
+        queue_handler = LogQueueHandler(queue.SimpleQueue())
+        root.addHandler(queue_handler)
+        root.setLevel(settings.level)
+        listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        AIVALogger._listener, AIVALogger._queue_handler = listener, queue_handler
+        
+        self.logger = logging.getLogger('AIVA')
+    
+    @classmethod
+    def stop(cls):
+        """Write out queued records and detach the queue handler"""
+        if cls._listener is not None:
+            logging.getLogger().removeHandler(cls._queue_handler)
+            cls._listener.stop()
+            for handler in cls._listener.handlers:
+                handler.close()
+            cls._listener = cls._queue_handler = None
+    
+    @property
+    def debug_enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+    
+    def info(self, message, *args):
+        self.logger.info(message, *args)
+    
+    def error(self, message, *args):
+        self.logger.error(message, *args)
+    
+    def warning(self, message, *args):
+        self.logger.warning(message, *args)
+    
+    def debug(self, message, *args):
+        self.logger.debug(message, *args)
+
+# ===== Database Manager =====
+class EmailTemplate:
+    """A saved email template, split once into literal text and {variable} fields.
+    
+    render() fills {recipient}, {subject} and any other given variables;
+    unknown placeholders and stray braces are left as written.
+    """
+    FIELD = re.compile(r"\{(\w+)\}")
+    
+    def __init__(self, name: str, subject: str, body: str):
+        self.name = name
+        self.subject = subject or ""
+        self.body = body or ""
+        self._subject_parts = self._compile(self.subject)
+        self._body_parts = self._compile(self.body)
+    
+    @classmethod
+    def _compile(cls, text: str) -> tuple:
+        # Alternating literal text and field names: literal, field, literal, ...
+        return tuple(cls.FIELD.split(text))
+    
+    @staticmethod
+    def _fill(parts: tuple, variables: Dict[str, str]) -> str:
+        if len(parts) == 1:
+            return parts[0]
+        filled = list(parts)
+        for index in range(1, len(filled), 2):
+            name = filled[index]
+            filled[index] = str(variables[name]) if name in variables else f"{{{name}}}"
+        return "".join(filled)
+    
+    def render(self, recipient: str = "", **variables) -> Dict[str, str]:
+        """Subject and body with variables filled; the body sees the rendered subject as {subject}"""
+        variables["recipient"] = recipient
+        subject = self._fill(self._subject_parts, variables)
+        variables.setdefault("subject", subject)
+        return {"subject": subject, "body": self._fill(self._body_parts, variables)}
+    
+    def as_dict(self) -> Dict[str, str]:
+        return {"subject": self.subject, "body": self.body}
+
+
+class EmailTemplateCache:
+    """Every email template, held in memory in front of the email_templates table.
+    
+    The table is loaded once up front. Writes through AIVADatabase
+    invalidate the cache. Commits from other connections or processes are
+    noticed through PRAGMA data_version, which changes only when another
+    connection commits; it is polled at most every check_interval seconds
+    so lookups in between never touch SQLite.
+    """
+    
+    def __init__(self, database: "AIVADatabase", check_interval: float = 1.0):
+        self.database = database
+        self.check_interval = check_interval
+        self.templates: Dict[str, EmailTemplate] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._version = None
+        self._stale = True
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+    
+    def invalidate(self):
+        self._stale = True
+    
+    def _refresh(self):
+        """Reload if invalidated or, when a check is due, if another connection committed"""
+        now = time.monotonic()
+        if not self._stale and now < self._next_check:
+            return
+        with self._lock:
+            if self._stale or self._data_version() != self._version:
+                self.reload()
+            self._next_check = now + self.check_interval
+    
+    def _data_version(self) -> int:
+        with self.database._lock:
+            return self.database._conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def reload(self):
+        with self.database._lock:
+            version = self._data_version()
+            rows = self.database._conn.execute("SELECT name, subject, body FROM email_templates").fetchall()
+        self.templates = {name: EmailTemplate(name, subject, body) for name, subject, body in rows}
+        self._version = version
+        self._stale = False
+        self.reloads += 1
+    
+    def get(self, name: str) -> Optional[EmailTemplate]:
+        self._refresh()
+        template = self.templates.get(name)
+        if template is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return template
+    
+    def names(self) -> List[str]:
+        self._refresh()
+        return list(self.templates)
+    
+    def stats(self) -> Dict[str, int]:
+        return {"templates": len(self.templates), "hits": self.hits, "misses": self.misses,
+                "reloads": self.reloads}
+    
+    def prometheus(self, metric: str = "aiva_email_template_cache") -> str:
+        """Counters in Prometheus text exposition format"""
+        return (f"# HELP {metric}_lookups_total Email template lookups by result\n"
+                f"# TYPE {metric}_lookups_total counter\n"
+                f'{metric}_lookups_total{{result="hit"}} {self.hits}\n'
+                f'{metric}_lookups_total{{result="miss"}} {self.misses}\n'
+                f"# HELP {metric}_reloads_total Times the template table was (re)loaded\n"
+                f"# TYPE {metric}_reloads_total counter\n"
+                f"{metric}_reloads_total {self.reloads}\n")
+
+
+class AIVADatabase:
+    # Applied to the long-lived connection; WAL lets readers run alongside
+    # the writer and NORMAL sync only fsyncs at checkpoints
+    PRAGMAS = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-8000",
+        "PRAGMA busy_timeout=5000"
+    ]
+    
+    # Versioned schema migrations applied on top of the base tables created
+    # by init_database. The applied version is kept in PRAGMA user_version.
+    MIGRATIONS = [
+        (1, "Add command category", [
+            "ALTER TABLE command_history ADD COLUMN category TEXT",
+            """UPDATE command_history SET category = CASE response
+                WHEN 'Excel command executed' THEN 'excel'
+                WHEN 'Email command executed' THEN 'email'
+                WHEN 'System command executed' THEN 'system'
+                WHEN 'Web command executed' THEN 'web'
+                WHEN 'Utility command executed' THEN 'utility'
+                WHEN 'Information command executed' THEN 'info'
+                WHEN 'Media command executed' THEN 'media'
+                WHEN 'Smart home command executed' THEN 'smart_home'
+            END"""
+        ]),
+        (2, "Index command history", [
+            "CREATE INDEX IF NOT EXISTS idx_command_history_timestamp ON command_history (timestamp, id)",
+            "CREATE INDEX IF NOT EXISTS idx_command_history_success ON command_history (success)",
+            "CREATE INDEX IF NOT EXISTS idx_command_history_category ON command_history (category, success)",
+            "CREATE INDEX IF NOT EXISTS idx_command_history_command ON command_history (command)"
+        ]),
+        (3, "Full-text search over history and templates", [
+            """CREATE VIRTUAL TABLE IF NOT EXISTS command_history_fts USING fts5(
+                command, response, content='command_history', content_rowid='id', prefix='2 3 4 5 6'
+            )""",
+            """CREATE TRIGGER IF NOT EXISTS command_history_fts_insert AFTER INSERT ON command_history BEGIN
+                INSERT INTO command_history_fts (rowid, command, response) VALUES (new.id, new.command, new.response);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS command_history_fts_delete AFTER DELETE ON command_history BEGIN
+                INSERT INTO command_history_fts (command_history_fts, rowid, command, response)
+                VALUES ('delete', old.id, old.command, old.response);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS command_history_fts_update AFTER UPDATE ON command_history BEGIN
+                INSERT INTO command_history_fts (command_history_fts, rowid, command, response)
+                VALUES ('delete', old.id, old.command, old.response);
+                INSERT INTO command_history_fts (rowid, command, response) VALUES (new.id, new.command, new.response);
+            END""",
+            "INSERT INTO command_history_fts (command_history_fts) VALUES ('rebuild')",
+            """CREATE VIRTUAL TABLE IF NOT EXISTS email_templates_fts USING fts5(
+                name, subject, body, content='email_templates', content_rowid='id', prefix='2 3'
+            )""",
+            """CREATE TRIGGER IF NOT EXISTS email_templates_fts_insert AFTER INSERT ON email_templates BEGIN
+                INSERT INTO email_templates_fts (rowid, name, subject, body)
+                VALUES (new.id, new.name, new.subject, new.body);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS email_templates_fts_delete AFTER DELETE ON email_templates BEGIN
+                INSERT INTO email_templates_fts (email_templates_fts, rowid, name, subject, body)
+                VALUES ('delete', old.id, old.name, old.subject, old.body);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS email_templates_fts_update AFTER UPDATE ON email_templates BEGIN
+                INSERT INTO email_templates_fts (email_templates_fts, rowid, name, subject, body)
+                VALUES ('delete', old.id, old.name, old.subject, old.body);
+                INSERT INTO email_templates_fts (rowid, name, subject, body)
+                VALUES (new.id, new.name, new.subject, new.body);
+            END""",
+            "INSERT INTO email_templates_fts (email_templates_fts) VALUES ('rebuild')"
+        ]),
+        (4, "Latency metrics", [
+            """CREATE TABLE IF NOT EXISTS metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recorded_at DATETIME NOT NULL,
+                name TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                sum_us INTEGER NOT NULL,
+                min_us INTEGER,
+                max_us INTEGER NOT NULL,
+                buckets TEXT NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics (name, recorded_at)",
+            "CREATE INDEX IF NOT EXISTS idx_metrics_recorded_at ON metrics (recorded_at)"
+        ]),
+        (5, "Utterance cache counters", [
+            """CREATE TABLE IF NOT EXISTS utterance_cache_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recorded_at DATETIME NOT NULL,
+                category TEXT NOT NULL,
+                hits INTEGER NOT NULL,
+                misses INTEGER NOT NULL,
+                bypassed INTEGER NOT NULL,
+                duplicates INTEGER NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_utterance_cache_stats_recorded_at ON utterance_cache_stats (recorded_at)"
+        ])
+    ]
+    
+    # Queued by flush() to make the writer commit without waiting out flush_interval
+    _FLUSH = object()
+    
+    def __init__(self, db_path: str = "data/aiva.db", flush_interval: float = 0.5, batch_size: int = 500,
+                 template_check_interval: float = 1.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            self._conn.execute(pragma)
+        self.init_database()
+        self.templates = EmailTemplateCache(self, template_check_interval)
+        
+        # Write-behind queue for command logging
+        self._log_queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="AIVADatabaseWriter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def init_database(self):
+        """Initialize SQLite database"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            
+            # Commands history table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS command_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    command TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    success BOOLEAN DEFAULT TRUE,
+                    response TEXT
+                )
+            ''')
+            
+            # User preferences table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_preferences (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Email templates table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS email_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    subject TEXT,
+                    body TEXT,
+                    created DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            self._conn.commit()
+        
+        self.migrate()
+    
+    def schema_version(self) -> int:
+        """Return the applied schema migration version"""
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def migrate(self):
+        """Apply pending schema migrations in place, one transaction each"""
+        with self._lock:
+            current = self.schema_version()
+            for version, description, statements in self.MIGRATIONS:
+                if version <= current:
+                    continue
+                try:
+                    self._conn.execute("BEGIN")
+                    for statement in statements:
+                        self._conn.execute(statement)
+                    self._conn.execute(f"PRAGMA user_version = {int(version)}")
+                    self._conn.commit()
+                except sqlite3.Error:
+                    self._conn.rollback()
+                    raise
+                logging.getLogger('AIVA').info(f"Applied database migration {version}: {description}")
+    
+    def _writer_loop(self):
+        """Flush queued command logs in batched transactions"""
+        while True:
+            item = self._log_queue.get()
+            if item is None:
+                self._log_queue.task_done()
+                return
+            
+            markers = int(item is self._FLUSH)
+            batch = [] if markers else [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # A flush() marker commits what has been gathered so far right away
+            while len(batch) < self.batch_size and item is not self._FLUSH:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._log_queue.get(timeout=remaining) if remaining > 0 else self._log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if item is self._FLUSH:
+                    markers += 1
+                else:
+                    batch.append(item)
+            
+            try:
+                if batch:
+                    with self._lock, tracer.span("db.write_batch"):
+                        self._conn.executemany(
+                            "INSERT INTO command_history (command, success, response, timestamp, category) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            batch
+                        )
+                        self._conn.commit()
+            except sqlite3.Error as e:
+                logging.getLogger('AIVA').error(f"Command log flush error: {e}")
+            finally:
+                for _ in range(len(batch) + markers + stop):
+                    self._log_queue.task_done()
+            
+            if stop:
+                return
+    
+    @tracer.traced("db.log_command")
+    def log_command(self, command: str, success: bool = True, response: str = "", category: str = None):
+        """Queue command for logging to database"""
+        if self._closed:
+            return
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._log_queue.put((command, success, response, timestamp, category))
+    
+    def flush(self):
+        """Block until all queued command logs are written.
+        
+        Wakes the writer so the pending batch commits now instead of
+        waiting out flush_interval.
+        """
+        if self._writer.is_alive() and self._log_queue.unfinished_tasks:
+            self._log_queue.put(self._FLUSH)
+            self._log_queue.join()
+    
+    def close(self):
+        """Flush pending writes and close the connection"""
+        if self._closed:
+            return
+        self._closed = True
+        self._log_queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._conn.close()
+    
+    @staticmethod
+    def _history_row(row) -> Dict:
+        return {
+            "command": row[0],
+            "timestamp": row[1],
+            "success": bool(row[2]),
+            "response": row[3],
+            "category": row[4]
+        }
+    
+    def get_command_history(self, limit: int = 50) -> List[Dict]:
+        """Get command history"""
+        return self.get_command_history_page(limit)[0]
+    
+    @tracer.traced("db.get_command_history_page")
+    def get_command_history_page(self, limit: int = 50, cursor: Tuple[str, int] = None,
+                                 success: bool = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """Get one page of command history, newest first.
+        
+        Pass the returned cursor back in to fetch the next page. The cursor is
+        None once the last page has been returned.
+        """
+        self.flush()
+        
+        conditions = []
+        params: List = []
+        if cursor is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+        if success is not None:
+            conditions.append("success = ?")
+            params.append(success)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT command, timestamp, success, response, category, id FROM command_history "
+                f"{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        
+        next_cursor = (results[-1][1], results[-1][5]) if len(results) == limit else None
+        return [self._history_row(row) for row in results], next_cursor
+    
+    @tracer.traced("db.get_success_rate_by_category")
+    def get_success_rate_by_category(self) -> List[Dict]:
+        """Command count and success rate per command category"""
+        self.flush()
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT COALESCE(category, 'unknown'), COUNT(*), SUM(success) FROM command_history "
+                "GROUP BY category ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        
+        return [
+            {
+                "category": row[0],
+                "total": row[1],
+                "succeeded": row[2] or 0,
+                "success_rate": (row[2] or 0) / row[1]
+            }
+            for row in results
+        ]
+    
+    @tracer.traced("db.get_top_commands")
+    def get_top_commands(self, limit: int = 10) -> List[Dict]:
+        """Most frequently issued commands"""
+        self.flush()
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT command, COUNT(*) AS uses FROM command_history "
+                "GROUP BY command ORDER BY uses DESC, command LIMIT ?",
+                (limit,)
+            ).fetchall()
+        
+        return [{"command": row[0], "count": row[1]} for row in results]
+    
+    @tracer.traced("db.get_commands_per_hour")
+    def get_commands_per_hour(self, since: str = None) -> List[Dict]:
+        """Command counts bucketed by hour, optionally from a timestamp onwards"""
+        self.flush()
+        where = "WHERE timestamp >= ?" if since else ""
+        params = (since,) if since else ()
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT strftime('%Y-%m-%d %H:00', timestamp) AS hour, COUNT(*) FROM command_history "
+                f"{where} GROUP BY hour ORDER BY hour",
+                params
+            ).fetchall()
+        
+        return [{"hour": row[0], "count": row[1]} for row in results]
+    
+    @tracer.traced("db.save_email_template")
+    def save_email_template(self, name: str, subject: str, body: str):
+        """Save email template"""
+        # Upsert rather than INSERT OR REPLACE: REPLACE deletes the old row
+        # without firing delete triggers, which would desync the FTS index
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO email_templates (name, subject, body) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET subject = excluded.subject, body = excluded.body",
+                (name, subject, body)
+            )
+            self._conn.commit()
+            # Our own commits do not change PRAGMA data_version
+            self.templates.invalidate()
+    
+    @tracer.traced("db.get_email_template")
+    def get_email_template(self, name: str) -> Optional[Dict]:
+        """Get email template by name"""
+        template = self.templates.get(name)
+        return template.as_dict() if template else None
+    
+    @tracer.traced("db.render_email_template")
+    def render_email_template(self, name: str, recipient: str = "", **variables) -> Optional[Dict]:
+        """Template subject and body with {recipient}, {subject} and other variables filled in"""
+        template = self.templates.get(name)
+        return template.render(recipient, **variables) if template else None
+    
+    # Longest prefix length with its own FTS index on command_history_fts
+    HISTORY_PREFIX_MAX = 6
+    
+    @staticmethod
+    def _fts_query(text: str, prefix: bool = True, prefix_max: int = None) -> Optional[str]:
+        """Turn free text into an FTS5 query, prefix-matching the last word.
+        
+        Longer last words are cut to prefix_max characters so the query is
+        served from a prefix index instead of merging every matching term:
+        on 300k rows "spreadshe" takes 0.07 ms cut and 3.2 ms uncut. The
+        cost is looser matches; "budgeted" also finds "budget" and
+        "budgets". Only the last, possibly half-heard word is cut.
+        """
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return None
+        if prefix and prefix_max:
+            words[-1] = words[-1][:prefix_max]
+        terms = [f'"{word}"' for word in words]
+        if prefix:
+            terms[-1] += "*"
+        return " ".join(terms)
+    
+    @tracer.traced("db.search_command_history")
+    def search_command_history(self, text: str, limit: int = 20, prefix: bool = True,
+                               rank: str = "recent") -> List[Dict]:
+        """Full-text search over logged commands and responses.
+        
+        With prefix enabled the last word also matches longer words, so a
+        partially heard "spread" finds "spreadsheet". Results are ranked
+        newest first by default, which stops at the first `limit` matches;
+        rank="relevance" orders by bm25 but has to score every match.
+        """
+        query = self._fts_query(text, prefix, self.HISTORY_PREFIX_MAX)
+        if query is None:
+            return []
+        
+        if rank == "relevance":
+            matches = ("SELECT rowid, rank AS score FROM command_history_fts "
+                       "WHERE command_history_fts MATCH ? ORDER BY rank LIMIT ?")
+        else:
+            matches = ("SELECT rowid, -rowid AS score FROM command_history_fts "
+                       "WHERE command_history_fts MATCH ? ORDER BY rowid DESC LIMIT ?")
+        
+        self.flush()
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT h.command, h.timestamp, h.success, h.response, h.category "
+                f"FROM ({matches}) AS m JOIN command_history h ON h.id = m.rowid ORDER BY m.score",
+                (query, limit)
+            ).fetchall()
+        
+        return [self._history_row(row) for row in results]
+    
+    @tracer.traced("db.search_email_templates")
+    def search_email_templates(self, text: str, limit: int = 5, prefix: bool = True) -> List[Dict]:
+        """Ranked full-text search over template names, subjects and bodies"""
+        query = self._fts_query(text, prefix)
+        if query is None:
+            return []
+        
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT t.name, t.subject, t.body "
+                "FROM email_templates_fts JOIN email_templates t ON t.id = email_templates_fts.rowid "
+                "WHERE email_templates_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        
+        return [{"name": row[0], "subject": row[1], "body": row[2]} for row in results]
+    
+    @tracer.traced("db.suggest_email_template")
+    def suggest_email_template(self, name: str) -> Optional[str]:
+        """Closest existing template name for a misheard one ("did you mean")"""
+        with self._lock:
+            # Template names are prefix matched first, e.g. "meet" -> "meeting"
+            query = self._fts_query(name)
+            if query is not None:
+                result = self._conn.execute(
+                    "SELECT t.name FROM email_templates_fts JOIN email_templates t ON t.id = email_templates_fts.rowid "
+                    "WHERE email_templates_fts MATCH ? ORDER BY rank LIMIT 1",
+                    (f"name : ({query})",)
+                ).fetchone()
+                if result:
+                    return result[0]
+        
+        names = self.templates.names()
+        matches = difflib.get_close_matches(name.lower(), names, n=1, cutoff=0.6)
+        return matches[0] if matches else None
+    
+    def save_metrics(self, histograms: Dict[str, LatencyHistogram]):
+        """Store one interval of stage latency histograms"""
+        if not histograms:
+            return
+        recorded_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO metrics (recorded_at, name, count, sum_us, min_us, max_us, buckets) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(recorded_at, name, *histogram.to_row()) for name, histogram in histograms.items()]
+            )
+            self._conn.commit()
+    
+    def get_metrics(self, since: str = None) -> Dict[str, LatencyHistogram]:
+        """Stage latency histograms merged over all intervals since a UTC timestamp"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, count, sum_us, min_us, max_us, buckets FROM metrics "
+                "WHERE recorded_at >= ? ORDER BY id",
+                (since or "",)
+            ).fetchall()
+        
+        histograms: Dict[str, LatencyHistogram] = {}
+        for name, *row in rows:
+            histograms.setdefault(name, LatencyHistogram()).merge(LatencyHistogram.from_row(*row))
+        return histograms
+    
+    def save_utterance_cache_stats(self, counts: Dict[str, Tuple[int, ...]]):
+        """Store one interval of utterance cache counters per category"""
+        if not counts:
+            return
+        recorded_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO utterance_cache_stats (recorded_at, category, hits, misses, bypassed, duplicates) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(recorded_at, category, *values) for category, values in counts.items()]
+            )
+            self._conn.commit()
+    
+    @tracer.traced("db.get_utterance_cache_stats")
+    def get_utterance_cache_stats(self, since: str = None) -> List[Dict]:
+        """Utterance cache hit rate and suppressed duplicates per category since a UTC timestamp"""
+        with self._lock:
+            results = self._conn.execute(
+                "SELECT category, SUM(hits), SUM(misses), SUM(bypassed), SUM(duplicates) "
+                "FROM utterance_cache_stats WHERE recorded_at >= ? "
+                "GROUP BY category ORDER BY SUM(hits) + SUM(misses) + SUM(bypassed) DESC, category",
+                (since or "",)
+            ).fetchall()
+        
+        return [
+            {
+                "category": row[0],
+                "hits": row[1],
+                "misses": row[2],
+                "bypassed": row[3],
+                "duplicates": row[4],
+                "hit_rate": row[1] / (row[1] + row[2]) if row[1] + row[2] else None
+            }
+            for row in results
+        ]
+
+# ===== Web Search Integration =====
+class WebSearchManager:
+    def __init__(self, logger: AIVALogger):
+        self.logger = logger
+    
+    def search_web(self, query: str, num_results: int = 5) -> List[Dict]:
+        """Search web using multiple search engines"""
+        try:
+            # This would integrate with search APIs in production
+            # For now, we'll simulate with Google search
+            search_url = f"https://www.google.com/search?q={urllib.parse.quote(query)}"
+            webbrowser.open(search_url)
+            
+            return [{"title": f"Search results for: {query}", "url": search_url}]
+        except Exception as e:
+            self.logger.error(f"Web search error: {e}")
+            return []
+    
+    def get_weather(self, location: str = "current") -> Dict:
+        """Get weather information"""
+        try:
+            # This would integrate with weather APIs in production
+            weather_url = f"https://www.google.com/search?q=weather+{location}"
+            webbrowser.open(weather_url)
+            return {"status": "opened", "location": location}
+        except Exception as e:
+            self.logger.error(f"Weather fetch error: {e}")
+            return {"status": "error", "message": str(e)}
+
+# ===== System Monitor =====
+class MetricsRingBuffer:
+    """Fixed-size ring of samples stored column-wise in typed arrays.
+    
+    Memory is allocated once; appending overwrites the oldest sample and
+    windowed queries walk back from the newest one without copying.
+    """
+    
+    def __init__(self, capacity: int, fields: List[str]):
+        self.capacity = max(1, capacity)
+        self.fields = list(fields)
+        self.timestamps = array.array('d', bytes(8 * self.capacity))
+        self.columns = {field: array.array('d', bytes(8 * self.capacity)) for field in self.fields}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def append(self, timestamp: float, values: Dict[str, float]):
+        with self._lock:
+            index = self._next
+            self.timestamps[index] = timestamp
+            for field in self.fields:
+                self.columns[field][index] = values.get(field, 0.0)
+            self._next = (index + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+    
+    def latest(self) -> Optional[Dict[str, float]]:
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._next - 1) % self.capacity
+            sample = {field: self.columns[field][index] for field in self.fields}
+            sample["timestamp"] = self.timestamps[index]
+            return sample
+    
+    def _window_ranges(self, cutoff: float) -> List[Tuple[int, int]]:
+        """Index ranges holding samples at or after cutoff, oldest first (lock held)"""
+        oldest = (self._next - self._count) % self.capacity
+        # Binary search over the samples in age order; timestamps only increase
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[(oldest + middle) % self.capacity] < cutoff:
+                low = middle + 1
+            else:
+                high = middle
+        start = (oldest + low) % self.capacity
+        if low == self._count:
+            return []
+        if start < self._next:
+            return [(start, self._next)]
+        return [(start, self.capacity), (0, self._next)]
+    
+    def window(self, field: str, seconds: float, now: float = None) -> List[float]:
+        """Values of field sampled within the last seconds, oldest first"""
+        cutoff = (time.time() if now is None else now) - seconds
+        column = self.columns[field]
+        with self._lock:
+            values = []
+            for start, end in self._window_ranges(cutoff):
+                values.extend(column[start:end])
+        return values
+    
+    def aggregate(self, field: str, seconds: float) -> Optional[Dict[str, float]]:
+        """Mean, min and max of field over the last seconds"""
+        cutoff = time.time() - seconds
+        column = self.columns[field]
+        with self._lock:
+            parts = [column[start:end] for start, end in self._window_ranges(cutoff)]
+        count = sum(len(part) for part in parts)
+        if not count:
+            return None
+        return {
+            "mean": sum(sum(part) for part in parts) / count,
+            "min": min(min(part) for part in parts),
+            "max": max(max(part) for part in parts),
+            "samples": count
+        }
+
+class ProcessTracker:
+    """Per-process CPU, memory and IO usage tracked between samples.
+    
+    Each refresh carries the previous sample's entry for a PID forward, so
+    CPU and IO are deltas since then (a reused PID is detected by its
+    create time) and names and users are only looked up for processes
+    that appeared. Processes missing from a sample have exited and are
+    simply not carried over. Top-N queries use heapq instead of sorting
+    every process.
+    """
+    # Entries are lists: [pid, create_time, cpu_seconds, io_bytes, cpu_percent, rss, io_rate, name, username]
+    CPU_PERCENT, RSS, IO_RATE, NAME, USER = 4, 5, 6, 7, 8
+    SORT_KEYS = {"cpu": operator.itemgetter(CPU_PERCENT), "memory": operator.itemgetter(RSS),
+                 "io": operator.itemgetter(IO_RATE)}
+    
+    def __init__(self, describe=None):
+        # describe(handle) -> (name, username), called once per new process
+        self.describe = describe or self._describe_psutil
+        self.processes: Dict[int, list] = {}
+        self.total_memory = 0.0
+        self.updated_at: Optional[float] = None
+        self.stats = {"updates": 0, "new": 0, "exited": 0}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.processes)
+    
+    def update(self, records, now: float = None, total_memory: float = None):
+        """Apply one sample of (pid, create_time, cpu_seconds, rss, io_bytes, handle) records"""
+        now = time.monotonic() if now is None else now
+        wall = time.time()
+        with self._lock:
+            elapsed = now - self.updated_at if self.updated_at is not None else 0.0
+            if total_memory:
+                self.total_memory = total_memory
+            cpu_scale = 100 / elapsed if elapsed > 0 else 0.0
+            io_scale = 1 / elapsed if elapsed > 0 else 0.0
+            previous = self.processes
+            current = {}
+            new = 0
+            
+            for pid, create_time, cpu_seconds, rss, io_bytes, handle in records:
+                entry = previous.get(pid)
+                if entry is None or entry[1] != create_time:
+                    # New, or the PID was reused; no previous sample yet, so
+                    # use the average over the process lifetime
+                    lifetime = wall - create_time
+                    name, username = self.describe(handle)
+                    current[pid] = [pid, create_time, cpu_seconds, io_bytes,
+                                    cpu_seconds / lifetime * 100 if lifetime > 0 else 0.0, rss, 0.0, name, username]
+                    new += 1
+                    continue
+                cpu_delta = cpu_seconds - entry[2]
+                io_delta = io_bytes - entry[3]
+                entry[2:7] = (cpu_seconds, io_bytes, cpu_delta * cpu_scale if cpu_delta > 0 else 0.0, rss,
+                              io_delta * io_scale if io_delta > 0 else 0.0)
+                current[pid] = entry
+            
+            self.processes = current
+            self.stats["new"] += new
+            self.stats["exited"] += len(previous) - (len(current) - new)
+            self.stats["updates"] += 1
+            self.updated_at = now
+    
+    def top(self, limit: int = 10, by: str = "cpu", name: str = None, user: str = None) -> List[Dict]:
+        """Top processes by cpu, memory or io, optionally filtered by name substring or user"""
+        key = self.SORT_KEYS[by]
+        with self._lock:
+            entries = self.processes.values()
+            if name:
+                name = name.lower()
+                entries = [entry for entry in entries if name in entry[self.NAME].lower()]
+            if user:
+                entries = [entry for entry in entries if entry[self.USER] == user]
+            return [self._record(entry) for entry in heapq.nlargest(limit, entries, key=key)]
+    
+    def _record(self, entry: list) -> Dict:
+        return {
+            "pid": entry[0],
+            "name": entry[self.NAME],
+            "username": entry[self.USER],
+            "cpu_percent": entry[self.CPU_PERCENT],
+            "memory_percent": entry[self.RSS] / self.total_memory * 100 if self.total_memory else 0.0,
+            "rss": int(entry[self.RSS]),
+            "io_rate": entry[self.IO_RATE]
+        }
+    
+    @staticmethod
+    def _describe_psutil(process) -> Tuple[str, Optional[str]]:
+        psutil = lazy_import("psutil")
+        try:
+            name = process.name()
+        except psutil.Error:
+            name = ""
+        try:
+            username = process.username()
+        except psutil.Error:
+            username = None
+        return name, username
+    
+    @staticmethod
+    def psutil_records():
+        """Sample records for update() from one pass over the live process table"""
+        psutil = lazy_import("psutil")
+        attrs = ["create_time", "cpu_times", "memory_info"]
+        if hasattr(psutil.Process, "io_counters"):
+            attrs.append("io_counters")
+        # process_iter reads the attributes in one oneshot() per process and
+        # skips processes that exit while listed; inaccessible values are None
+        for process in psutil.process_iter(attrs, ad_value=None):
+            info = process.info
+            cpu, memory = info["cpu_times"], info["memory_info"]
+            if cpu is None or memory is None or info["create_time"] is None:
+                continue
+            io = info.get("io_counters")
+            io_bytes = io.read_bytes + io.write_bytes if io is not None else 0
+            yield process.pid, info["create_time"], cpu.user + cpu.system, memory.rss, io_bytes, process
+    
+    def refresh(self):
+        """Update from the live process table"""
+        psutil = lazy_import("psutil")
+        # Read everything first so queries are only blocked while the sample is applied
+        records = list(self.psutil_records())
+        self.update(records, total_memory=psutil.virtual_memory().total)
+
+class SystemSampler:
+    """Background thread sampling CPU, memory, disk and processes.
+    
+    System-wide stats go into a MetricsRingBuffer every interval; the
+    ProcessTracker is refreshed every process_interval since walking every
+    process is the expensive part. CPU usage is always measured between
+    two samples, so it never blocks and never reads an unprimed zero.
+    """
+    FIELDS = ["cpu_percent", "memory_percent", "memory_available", "disk_percent", "disk_free"]
+    
+    def __init__(self, logger: AIVALogger, interval: float = 2.0, history_seconds: float = 3600,
+                 process_interval: float = 10.0, disk_path: str = '/'):
+        self.logger = logger
+        self.interval = interval
+        self.process_interval = process_interval
+        self.disk_path = disk_path
+        self.samples = MetricsRingBuffer(int(history_seconds / interval) + 1, self.FIELDS)
+        self.tracker = ProcessTracker()
+        self.stats = {"samples": 0, "process_samples": 0, "sample_seconds": 0.0, "process_seconds": 0.0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is None:
+            psutil = lazy_import("psutil")
+            # Prime the counters that report usage since the previous call
+            psutil.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._run, name="SystemSampler", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def sample(self, cpu_interval: float = None):
+        """Record one system-wide sample.
+        
+        CPU usage is since the previous sample, or measured over
+        cpu_interval seconds (blocking) when given.
+        """
+        psutil = lazy_import("psutil")
+        cpu_percent = psutil.cpu_percent(interval=cpu_interval)
+        start = time.thread_time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        self.samples.append(time.time(), {
+            "cpu_percent": cpu_percent,
+            "memory_percent": memory.percent,
+            "memory_available": memory.available,
+            "disk_percent": disk.percent,
+            "disk_free": disk.free
+        })
+        self.stats["samples"] += 1
+        self.stats["sample_seconds"] += time.thread_time() - start
+    
+    def sample_processes(self):
+        """Refresh the process tracker (usage since the previous refresh)"""
+        start = time.thread_time()
+        self.tracker.refresh()
+        self.stats["process_samples"] += 1
+        self.stats["process_seconds"] += time.thread_time() - start
+    
+    def _run(self):
+        next_processes = 0.0
+        while True:
+            try:
+                self.sample()
+                if self.process_interval > 0 and time.monotonic() >= next_processes:
+                    self.sample_processes()
+                    next_processes = time.monotonic() + self.process_interval
+            except Exception as e:
+                self.logger.error(f"System sampling error: {e}")
+            if self._stop.wait(self.interval):
+                return
+    
+    def overhead(self) -> Dict:
+        """CPU time the sampler spends per sample and as a share of one core"""
+        samples = self.stats["samples"] or 1
+        process_samples = self.stats["process_samples"] or 1
+        per_sample = self.stats["sample_seconds"] / samples
+        per_process_sample = self.stats["process_seconds"] / process_samples
+        share = per_sample / self.interval
+        if self.process_interval > 0:
+            share += per_process_sample / self.process_interval
+        return {
+            "sample_ms": per_sample * 1000,
+            "process_sample_ms": per_process_sample * 1000,
+            "cpu_share": share
+        }
+
+class SystemMonitor:
+    def __init__(self, logger: AIVALogger, sampler: SystemSampler = None):
+        self.logger = logger
+        self.sampler = sampler or SystemSampler(logger)
+        self.sampler.start()
+    
+    def get_system_info(self) -> Dict:
+        """Get system information from the latest background sample"""
+        try:
+            sample = self.sampler.samples.latest()
+            if sample is None:
+                # First query right after startup: measure CPU briefly instead
+                self.sampler.sample(cpu_interval=0.1)
+                sample = self.sampler.samples.latest()
+            
+            return {
+                "cpu_usage": sample["cpu_percent"],
+                "memory_usage": sample["memory_percent"],
+                "memory_available": int(sample["memory_available"]) // (1024**3),  # GB
+                "disk_usage": sample["disk_percent"],
+                "disk_free": int(sample["disk_free"]) // (1024**3),  # GB
+                "sampled_at": sample["timestamp"]
+            }
+        except Exception as e:
+            self.logger.error(f"System info error: {e}")
+            return {}
+    
+    def get_usage_over(self, seconds: float = 300) -> Dict:
+        """Mean, min and max CPU, memory and disk usage over the last seconds"""
+        return {
+            field: self.sampler.samples.aggregate(field, seconds)
+            for field in ("cpu_percent", "memory_percent", "disk_percent")
+        }
+    
+    def get_average_cpu(self, seconds: float = 300) -> Optional[float]:
+        aggregate = self.sampler.samples.aggregate("cpu_percent", seconds)
+        return aggregate["mean"] if aggregate else None
+    
+    def get_running_processes(self, limit: int = 10, by: str = "cpu", name: str = None,
+                              user: str = None) -> List[Dict]:
+        """Get top running processes by cpu, memory or io from the latest process sample"""
+        try:
+            if self.sampler.tracker.updated_at is None:
+                self.sampler.sample_processes()
+            return self.sampler.tracker.top(limit, by=by, name=name, user=user)
+        except Exception as e:
+            self.logger.error(f"Process list error: {e}")
+            return []
+
+# ===== Enhanced Excel Manager =====
+CELL_ADDRESS = re.compile(r'^\$?([A-Za-z]{1,3})\$?(\d+)$')
+
+
+@functools.lru_cache(maxsize=4096)
+def column_letters(column: int) -> str:
+    """1 -> 'A', 27 -> 'AA'"""
+    letters = ""
+    while column > 0:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def parse_cell(address: str) -> Tuple[int, int]:
+    """'B3' -> (3, 2); absolute markers are ignored"""
+    match = CELL_ADDRESS.match(address.strip())
+    if not match:
+        raise ValueError(f"Invalid cell address: {address}")
+    column = 0
+    for letter in match.group(1).upper():
+        column = column * 26 + ord(letter) - 64
+    return int(match.group(2)), column
+
+
+def parse_range(address: str) -> Tuple[int, int, int, int]:
+    """'A1:C4' -> (first row, first column, last row, last column)"""
+    first, _, last = address.partition(":")
+    top, left = parse_cell(first)
+    bottom, right = parse_cell(last) if last else (top, left)
+    return min(top, bottom), min(left, right), max(top, bottom), max(left, right)
+
+
+def range_address(top: int, left: int, rows: int, columns: int) -> str:
+    first = f"{column_letters(left)}{top}"
+    if rows == 1 and columns == 1:
+        return first
+    return f"{first}:{column_letters(left + columns - 1)}{top + rows - 1}"
+
+
+def to_block(values) -> Tuple[tuple, ...]:
+    """Normalize a scalar, a row or a list of rows into a rectangular tuple of tuples"""
+    if not isinstance(values, (list, tuple)):
+        return ((values,),)
+    if not values:
+        raise ValueError("Cannot write an empty block")
+    if not all(isinstance(row, (list, tuple)) for row in values):
+        values = [values]
+    width = max(len(row) for row in values)
+    return tuple(tuple(row) + (None,) * (width - len(row)) for row in values)
+
+
+def from_block(value) -> List[list]:
+    """Range.Value is a scalar for one cell and a tuple of row tuples otherwise"""
+    if isinstance(value, (list, tuple)):
+        return [list(row) for row in value]
+    return [[value]]
+
+
+FORMULA_REFERENCE = re.compile(
+    r'(?P<string>"[^"]*")|(?<![A-Za-z_.$\d])(?P<col_abs>\$?)(?P<col>[A-Z]{1,3})(?P<row_abs>\$?)(?P<row>\d+)(?![\w(])'
+)
+
+@functools.lru_cache(maxsize=256)
+def _formula_parts(formula: str) -> tuple:
+    """Split a formula into literal text and (column anchor, column, row anchor, row) references"""
+    parts, position = [], 0
+    for match in FORMULA_REFERENCE.finditer(formula):
+        if match.group("string"):
+            continue
+        parts.append(formula[position:match.start()])
+        _, column = parse_cell(f"{match.group('col')}1")
+        parts.append((match.group("col_abs"), column, match.group("row_abs"), int(match.group("row"))))
+        position = match.end()
+    parts.append(formula[position:])
+    return tuple(parts)
+
+
+def shift_formula(formula: str, rows: int, columns: int) -> str:
+    """Move the relative references of an A1-style formula, as Excel does when filling a range.
+    
+    shift_formula("=A1*$B$1", 2, 1) -> "=B3*$B$1"; quoted strings are left alone.
+    """
+    if not rows and not columns:
+        return formula
+    
+    shifted = []
+    for part in _formula_parts(formula):
+        if isinstance(part, str):
+            shifted.append(part)
+            continue
+        column_anchor, column, row_anchor, row = part
+        shifted.append(f"{column_anchor}{column_letters(column if column_anchor else column + columns)}"
+                       f"{row_anchor}{row if row_anchor else row + rows}")
+    return "".join(shifted)
+
+
+CONDITION_PATTERN = re.compile(
+    r'^(?:(?P<between>between)\s+(?P<low>-?[\d.]+)\s+and\s+(?P<high>-?[\d.]+)'
+    r'|(?P<operator>>=|<=|<>|!=|=|>|<|greater than|less than|equal to|not equal to)\s*(?P<value>.+)'
+    r'|(?P<special>duplicates?|unique|above average|below average))$',
+    re.IGNORECASE
+)
+
+CONDITION_OPERATORS = {
+    "greater than": ">", "less than": "<", "equal to": "=", "not equal to": "<>", "!=": "<>"
+}
+
+# Fill and font colors for conditional formats, as #RRGGBB
+CONDITION_STYLES = {
+    "red": {"fill_color": "#FFC7CE", "font_color": "#9C0006"},
+    "green": {"fill_color": "#C6EFCE", "font_color": "#006100"},
+    "yellow": {"fill_color": "#FFEB9C", "font_color": "#9C5700"},
+    "bold": {"bold": True},
+}
+
+# Conditional formats that style the whole range instead of matching cells
+RANGE_CONDITION_STYLES = ("data_bar", "color_scale")
+
+
+def parse_condition(condition: str, format_type: str) -> Dict:
+    """Turn "> 100" / "between 1 and 5" / "duplicates" plus a style name into a rule dict.
+    
+    The rule has a "type" of cell, between, duplicate, unique, average,
+    data_bar or color_scale, the comparison fields that type needs, and a
+    "style" of formatting properties for apply_format().
+    """
+    format_type = format_type.strip().lower().replace(" ", "_")
+    if format_type in RANGE_CONDITION_STYLES:
+        return {"type": format_type}
+    if format_type not in CONDITION_STYLES:
+        raise ValueError(f"Unknown conditional format: {format_type}")
+    style = CONDITION_STYLES[format_type]
+    
+    match = CONDITION_PATTERN.match(condition.strip())
+    if not match:
+        raise ValueError(f"Unsupported condition: {condition}")
+    if match.group("between"):
+        return {"type": "between", "minimum": float(match.group("low")),
+                "maximum": float(match.group("high")), "style": style}
+    if match.group("operator"):
+        operator = match.group("operator").lower()
+        value = match.group("value").strip()
+        try:
+            value = float(value)
+        except ValueError:
+            value = f'"{value}"'
+        return {"type": "cell", "criteria": CONDITION_OPERATORS.get(operator, operator),
+                "value": value, "style": style}
+    
+    special = match.group("special").lower()
+    if special.startswith("duplicate"):
+        return {"type": "duplicate", "style": style}
+    if special == "unique":
+        return {"type": "unique", "style": style}
+    return {"type": "average", "above": special.startswith("above"), "style": style}
+
+
+def bgr_color(color: str) -> int:
+    """'#RRGGBB' -> the BGR integer the Excel object model uses"""
+    value = int(color.lstrip("#"), 16)
+    return ((value & 0xFF) << 16) | (value & 0xFF00) | (value >> 16)
+
+
+class ExcelBackend:
+    """Spreadsheet engine behind ExcelManager.
+    
+    Ranges are passed as (first row, first column, last row, last column)
+    bounds, 1-based, and blocks as rectangular tuples of row tuples.
+    Formatting properties are number_format, bold, font_color,
+    fill_color (#RRGGBB) and column_width.
+    """
+    name = "backend"
+    
+    def open(self):
+        raise NotImplementedError
+    
+    @contextlib.contextmanager
+    def batch(self):
+        yield
+    
+    def write_range(self, top: int, left: int, block: Tuple[tuple, ...]):
+        raise NotImplementedError
+    
+    def read_range(self, bounds: Tuple[int, int, int, int]) -> List[list]:
+        raise NotImplementedError(f"The {self.name} backend cannot read cells back")
+    
+    def set_formulas(self, bounds: Tuple[int, int, int, int], formulas):
+        raise NotImplementedError
+    
+    def apply_format(self, bounds: Tuple[int, int, int, int], properties: Dict):
+        raise NotImplementedError
+    
+    def add_conditional_format(self, bounds: Tuple[int, int, int, int], rule: Dict):
+        raise NotImplementedError
+    
+    def add_chart(self, bounds: Tuple[int, int, int, int], chart_type: str):
+        raise NotImplementedError
+    
+    def save(self, filename: str = None) -> str:
+        """Save and return the file name"""
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+class ComExcelBackend(ExcelBackend):
+    """The Excel application through COM.
+    
+    Every property access or method call on the Excel object model is a
+    cross-process round trip, so each operation addresses its whole range
+    at once. Inside batch(), screen updating, events and automatic
+    calculation are switched off and restored afterwards.
+    
+    application_factory returns an Excel.Application object; it defaults
+    to win32com's Dispatch and can be replaced by the FakeExcelApplication
+    in tests/fake_excel.py to run without Excel.
+    """
+    name = "com"
+    XL_CALCULATION_MANUAL = -4135
+    XL_CELL_VALUE = 1
+    XL_OPERATORS = {"between": 1, "=": 3, "<>": 4, ">": 5, "<": 6, ">=": 7, "<=": 8}
+    CHART_TYPES = {"Column": 51, "Bar": 57, "Line": 4, "Pie": 5, "Area": 1, "Scatter": -4169}
+    
+    def __init__(self, application_factory=None):
+        self.application_factory = application_factory or self._dispatch_excel
+        self.excel = None
+        self.workbook = None
+        self.worksheet = None
+        self._saved_state = None
+    
+    @staticmethod
+    def _dispatch_excel():
+        return lazy_import("win32com.client").Dispatch("Excel.Application")
+    
+    def open(self):
+        self.excel = self.application_factory()
+        self.excel.Visible = True
+        self.workbook = self.excel.Workbooks.Add()
+        self.worksheet = self.workbook.ActiveSheet
+    
+    def _range(self, bounds: Tuple[int, int, int, int]):
+        top, left, bottom, right = bounds
+        return self.worksheet.Range(range_address(top, left, bottom - top + 1, right - left + 1))
+    
+    @contextlib.contextmanager
+    def batch(self):
+        excel = self.excel
+        saved = (excel.ScreenUpdating, excel.EnableEvents, excel.Calculation)
+        excel.ScreenUpdating = False
+        excel.EnableEvents = False
+        excel.Calculation = self.XL_CALCULATION_MANUAL
+        try:
+            yield
+        finally:
+            screen_updating, enable_events, calculation = saved
+            excel.Calculation = calculation
+            excel.EnableEvents = enable_events
+            excel.ScreenUpdating = screen_updating
+    
+    def write_range(self, top: int, left: int, block: Tuple[tuple, ...]):
+        self._range((top, left, top + len(block) - 1, left + len(block[0]) - 1)).Value = block
+    
+    def read_range(self, bounds: Tuple[int, int, int, int]) -> List[list]:
+        return from_block(self._range(bounds).Value)
+    
+    def set_formulas(self, bounds: Tuple[int, int, int, int], formulas):
+        self._range(bounds).Formula = formulas
+    
+    def _style(self, target, properties: Dict):
+        if properties.get("number_format") is not None:
+            target.NumberFormat = properties["number_format"]
+        if properties.get("bold") is not None or properties.get("font_color") is not None:
+            font = target.Font
+            if properties.get("bold") is not None:
+                font.Bold = properties["bold"]
+            if properties.get("font_color") is not None:
+                font.Color = bgr_color(properties["font_color"])
+        if properties.get("fill_color") is not None:
+            target.Interior.Color = bgr_color(properties["fill_color"])
+    
+    def apply_format(self, bounds: Tuple[int, int, int, int], properties: Dict):
+        range_obj = self._range(bounds)
+        self._style(range_obj, properties)
+        if properties.get("column_width") is not None:
+            range_obj.ColumnWidth = properties["column_width"]
+    
+    def add_conditional_format(self, bounds: Tuple[int, int, int, int], rule: Dict):
+        conditions = self._range(bounds).FormatConditions
+        kind = rule["type"]
+        if kind == "data_bar":
+            conditions.AddDatabar()
+            return
+        if kind == "color_scale":
+            conditions.AddColorScale(3)
+            return
+        
+        if kind == "cell":
+            value = rule["value"]
+            condition = conditions.Add(self.XL_CELL_VALUE, self.XL_OPERATORS[rule["criteria"]], f"={value}")
+        elif kind == "between":
+            condition = conditions.Add(self.XL_CELL_VALUE, self.XL_OPERATORS["between"],
+                                       f"={rule['minimum']:g}", f"={rule['maximum']:g}")
+        elif kind in ("duplicate", "unique"):
+            condition = conditions.AddUniqueValues()
+            # xlDuplicate = 1, xlUnique = 0
+            condition.DupeUnique = 1 if kind == "duplicate" else 0
+        else:
+            condition = conditions.AddAboveAverage()
+            # xlAboveAverage = 0, xlBelowAverage = 1
+            condition.AboveBelow = 0 if rule["above"] else 1
+        self._style(condition, rule["style"])
+    
+    def add_chart(self, bounds: Tuple[int, int, int, int], chart_type: str):
+        xl_chart_type = self.CHART_TYPES.get(chart_type)
+        if xl_chart_type is None:
+            xl_chart_type = getattr(lazy_import("win32com.client").constants, f"xl{chart_type}")
+        # Chart type is passed to AddChart2 rather than set afterwards
+        chart = self.worksheet.Shapes.AddChart2(-1, xl_chart_type).Chart
+        chart.SetSourceData(self._range(bounds))
+    
+    def save(self, filename: str = None) -> str:
+        if filename:
+            self.workbook.SaveAs(filename)
+            return filename
+        self.workbook.Save()
+        return self.workbook.FullName
+    
+    def close(self):
+        self.workbook.Close()
+        self.excel.Quit()
+
+
+class XlsxExcelBackend(ExcelBackend):
+    """Headless engine writing .xlsx files with XlsxWriter (pip install xlsxwriter).
+    
+    The workbook is written in constant-memory mode: rows go to a temporary
+    file as soon as they are complete, so exports of millions of rows use
+    the same memory as a few thousand. Rows are buffered until buffer_rows
+    later rows have been written and must be written top to bottom after
+    that. Formats and formula fills are kept as range rules and applied as
+    each row is written out, so they may be declared before the data
+    streams past. Conditional formats, charts and column widths can be
+    added at any time. Cells cannot be read back, and the file is produced
+    by save(), after which the workbook is closed.
+    """
+    name = "xlsx"
+    CHART_TYPES = {"Column": "column", "Bar": "bar", "Line": "line", "Pie": "pie",
+                   "Area": "area", "Scatter": "scatter"}
+    FORMAT_PROPERTIES = {"number_format": "num_format", "bold": "bold",
+                         "font_color": "font_color", "fill_color": "bg_color"}
+    
+    def __init__(self, output_dir: str = "exports", buffer_rows: int = 1000, sheet_name: str = "Sheet1"):
+        self.output_dir = output_dir
+        self.buffer_rows = buffer_rows
+        self.sheet_name = sheet_name
+        self.workbook = None
+        self.worksheet = None
+        self.filename = None
+        self.modified = False
+        self._rows: Dict[int, Dict[int, object]] = {}
+        self._next_row = 1
+        # Highest row holding data, and highest row touched by data or rules
+        self._last_row = 0
+        self._extent = 0
+        self._rules = []
+        self._formats = {}
+        self._charts = 0
+    
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("xlsxwriter") is not None
+    
+    def open(self):
+        try:
+            xlsxwriter = lazy_import("xlsxwriter")
+        except ImportError:
+            raise RuntimeError("the xlsx Excel backend needs XlsxWriter (pip install xlsxwriter)") from None
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.filename = os.path.join(self.output_dir,
+                                     f"aiva_{datetime.datetime.now():%Y%m%d_%H%M%S}.xlsx")
+        self.workbook = xlsxwriter.Workbook(self.filename, {"constant_memory": True})
+        self.worksheet = self.workbook.add_worksheet(self.sheet_name)
+        self._rows.clear()
+        self._next_row = 1
+        self._last_row = 0
+        self._extent = 0
+        self._rules = []
+        self._formats = {}
+        self._charts = 0
+        self.modified = False
+    
+    def _check_streamed(self, top: int):
+        if top < self._next_row:
+            raise ValueError(f"Row {top} was already streamed to disk; the xlsx backend writes rows "
+                             f"top to bottom (next writable row is {self._next_row})")
+    
+    def write_range(self, top: int, left: int, block: Tuple[tuple, ...]):
+        self._check_streamed(top)
+        rows = self._rows
+        for row, values in enumerate(block, start=top):
+            cells = rows.get(row)
+            if cells is None:
+                cells = rows[row] = {}
+            cells.update(zip(range(left, left + len(values)), values))
+        self._last_row = max(self._last_row, top + len(block) - 1)
+        self._extent = max(self._extent, self._last_row)
+        self.modified = True
+        if self._last_row - self._next_row >= self.buffer_rows:
+            self._flush(self._last_row - self.buffer_rows)
+    
+    def set_formulas(self, bounds: Tuple[int, int, int, int], formulas):
+        top, left, bottom, right = bounds
+        self._check_streamed(top)
+        if isinstance(formulas, str):
+            self._rules.append((bounds, "formula", formulas))
+        else:
+            # Explicit per-cell formulas are just values starting with "="
+            self.write_range(top, left, formulas)
+        self._extent = max(self._extent, bottom)
+        self.modified = True
+    
+    def apply_format(self, bounds: Tuple[int, int, int, int], properties: Dict):
+        top, left, bottom, right = bounds
+        if properties.get("column_width") is not None:
+            self.worksheet.set_column(left - 1, right - 1, properties["column_width"])
+        cell_format = {self.FORMAT_PROPERTIES[key]: value for key, value in properties.items()
+                       if key in self.FORMAT_PROPERTIES and value is not None}
+        if cell_format:
+            self._check_streamed(top)
+            self._rules.append((bounds, "format", cell_format))
+            self._extent = max(self._extent, bottom)
+            self.modified = True
+    
+    def _format(self, properties: Dict):
+        key = tuple(sorted(properties.items()))
+        cell_format = self._formats.get(key)
+        if cell_format is None:
+            cell_format = self._formats[key] = self.workbook.add_format(properties)
+        return cell_format
+    
+    def _row_layout(self, active: Tuple[int, ...]):
+        """Formats by column and formula fills for rows covered by the given rules"""
+        styles: Dict[int, Dict] = {}
+        formulas = []
+        for index in active:
+            (top, left, _, right), kind, payload = self._rules[index]
+            for column in range(left, right + 1):
+                if kind == "formula":
+                    formulas.append((column, payload, top, column - left))
+                else:
+                    styles.setdefault(column, {}).update(payload)
+        return {column: self._format(style) for column, style in styles.items()}, formulas
+    
+    def _flush(self, through: int):
+        """Write out buffered rows up to and including row `through`"""
+        write, write_blank = self.worksheet.write, self.worksheet.write_blank
+        rules = self._rules
+        layouts = {}
+        for row in range(self._next_row, through + 1):
+            cells = self._rows.pop(row, None)
+            active = tuple(index for index, rule in enumerate(rules) if rule[0][0] <= row <= rule[0][2])
+            if not active:
+                if cells:
+                    for column, value in cells.items():
+                        if value is not None:
+                            write(row - 1, column - 1, value)
+                continue
+            
+            layout = layouts.get(active)
+            if layout is None:
+                layout = layouts[active] = self._row_layout(active)
+            styles, formulas = layout
+            cells = cells or {}
+            for column, formula, top, columns in formulas:
+                cells[column] = shift_formula(formula, row - top, columns)
+            for column in sorted(cells.keys() | styles.keys()):
+                value = cells.get(column)
+                style = styles.get(column)
+                if value is None:
+                    if style is not None:
+                        write_blank(row - 1, column - 1, None, style)
+                else:
+                    write(row - 1, column - 1, value, style)
+        self._next_row = max(self._next_row, through + 1)
+        # Rules wholly above the stream position are done
+        self._rules = [rule for rule in rules if rule[0][2] >= self._next_row]
+    
+    def add_conditional_format(self, bounds: Tuple[int, int, int, int], rule: Dict):
+        top, left, bottom, right = bounds
+        kind = rule["type"]
+        if kind == "data_bar":
+            options = {"type": "data_bar"}
+        elif kind == "color_scale":
+            options = {"type": "3_color_scale"}
+        elif kind == "cell":
+            options = {"type": "cell", "criteria": rule["criteria"], "value": rule["value"]}
+        elif kind == "between":
+            options = {"type": "cell", "criteria": "between",
+                       "minimum": rule["minimum"], "maximum": rule["maximum"]}
+        elif kind in ("duplicate", "unique"):
+            options = {"type": kind}
+        else:
+            options = {"type": "average", "criteria": "above" if rule["above"] else "below"}
+        if "style" in rule:
+            options["format"] = self.workbook.add_format(
+                {self.FORMAT_PROPERTIES[key]: value for key, value in rule["style"].items()})
+        self.worksheet.conditional_format(top - 1, left - 1, bottom - 1, right - 1, options)
+        self.modified = True
+    
+    def add_chart(self, bounds: Tuple[int, int, int, int], chart_type: str):
+        """Chart the columns of a range: first row as series names, first column as categories"""
+        top, left, bottom, right = bounds
+        chart = self.workbook.add_chart({"type": self.CHART_TYPES.get(chart_type, chart_type.lower())})
+        sheet = self.sheet_name
+        if right > left and bottom > top:
+            categories = [sheet, top, left - 1, bottom - 1, left - 1]
+            for column in range(left, right):
+                chart.add_series({"name": [sheet, top - 1, column], "categories": categories,
+                                  "values": [sheet, top, column, bottom - 1, column]})
+        else:
+            chart.add_series({"values": [sheet, top - 1, left - 1, bottom - 1, right - 1]})
+        # Place charts side by side to the right of the data
+        self.worksheet.insert_chart(top - 1, right + 1 + 8 * self._charts, chart)
+        self._charts += 1
+        self.modified = True
+    
+    def save(self, filename: str = None) -> str:
+        if self.workbook is None:
+            # Already saved and closed: the file is final, so saving again copies it
+            if self.filename is None:
+                raise RuntimeError("no workbook is open")
+            if filename and os.path.abspath(filename) != os.path.abspath(self.filename):
+                shutil.copyfile(self.filename, filename)
+                self.filename = filename
+            return self.filename
+        self._flush(self._extent)
+        if filename:
+            self.workbook.filename = filename
+        self.workbook.close()
+        self.filename = self.workbook.filename
+        self.workbook = None
+        self.modified = False
+        return self.filename
+    
+    def close(self):
+        """Save unsaved work to the default file rather than discard it"""
+        if self.workbook is not None and self.modified:
+            self.save()
+        self.workbook = None
+
+
+class ExcelManager:
+    """Spreadsheet automation on top of an ExcelBackend.
+    
+    Bulk operations address a whole range at once: write_range() and
+    read_range() move a 2-D block in one call, write_rows() streams any
+    number of rows in chunks, and set_formulas() and apply_format() apply
+    to every cell of a range in one call per property. Operations inside
+    batch() share one suspension of screen updating and recalculation.
+    """
+    
+    def __init__(self, logger: AIVALogger, backend: ExcelBackend = None):
+        self.logger = logger
+        self.backend = backend or ComExcelBackend()
+        self.is_initialized = False
+        self._batch_depth = 0
+    
+    def initialize(self):
+        """Initialize Excel application"""
+        try:
+            if not self.is_initialized:
+                self.logger.info(f"Initializing Excel ({self.backend.name} backend)...")
+                self.backend.open()
+                self.is_initialized = True
+                self.logger.info("Excel initialized successfully")
+            return True
+        except Exception as e:
+            self.logger.error(f"Excel initialization error: {e}")
+            return False
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """Group operations; batches nest and only the outermost one reaches the backend"""
+        if not self.is_initialized or self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+        
+        self._batch_depth = 1
+        try:
+            with self.backend.batch():
+                yield self
+        finally:
+            self._batch_depth = 0
+    
+    @tracer.traced("excel.write_range")
+    def write_range(self, top_left: str, values) -> Optional[str]:
+        """Write a 2-D block starting at top_left in one call.
+        
+        Rows are padded with empty cells to the widest row. Returns the
+        address written, or None on failure.
+        """
+        try:
+            if not self.is_initialized:
+                return None
+            
+            block = to_block(values)
+            top, left = parse_cell(top_left)
+            self.backend.write_range(top, left, block)
+            address = range_address(top, left, len(block), len(block[0]))
+            
+            self.logger.debug("Wrote %dx%d block to %s", len(block), len(block[0]), address)
+            return address
+        except Exception as e:
+            self.logger.error(f"Excel write error: {e}")
+            return None
+    
+    @tracer.traced("excel.write_rows")
+    def write_rows(self, top_left: str, rows, chunk_rows: int = 1000) -> Optional[str]:
+        """Stream rows from any iterable in blocks of chunk_rows.
+        
+        Only one chunk is held in memory at a time. Returns the address
+        spanned by the rows written, or None on failure.
+        """
+        try:
+            if not self.is_initialized:
+                return None
+            
+            top, left = parse_cell(top_left)
+            row, width = top, 0
+            iterator = iter(rows)
+            with self.batch():
+                while True:
+                    chunk = list(itertools.islice(iterator, chunk_rows))
+                    if not chunk:
+                        break
+                    block = to_block(chunk)
+                    self.backend.write_range(row, left, block)
+                    row += len(block)
+                    width = max(width, len(block[0]))
+            if row == top:
+                return None
+            address = range_address(top, left, row - top, width)
+            
+            self.logger.debug("Streamed %d rows to %s", row - top, address)
+            return address
+        except Exception as e:
+            self.logger.error(f"Excel write error: {e}")
+            return None
+    
+    @tracer.traced("excel.read_range")
+    def read_range(self, address: str) -> Optional[List[list]]:
+        """Read a range as a list of rows in one call"""
+        try:
+            if not self.is_initialized:
+                return None
+            
+            return self.backend.read_range(parse_range(address))
+        except Exception as e:
+            self.logger.error(f"Excel read error: {e}")
+            return None
+    
+    @tracer.traced("excel.set_formulas")
+    def set_formulas(self, address: str, formulas) -> bool:
+        """Set formulas for a whole range in one call.
+        
+        A single formula string is filled across the range with relative
+        references adjusted, e.g. set_formulas("C1:C100", "=A1*B1");
+        a 2-D block sets each cell's formula explicitly.
+        """
+        try:
+            if not self.is_initialized:
+                return False
+            
+            if not isinstance(formulas, str):
+                formulas = to_block(formulas)
+            self.backend.set_formulas(parse_range(address), formulas)
+            
+            self.logger.debug("Set formulas for %s", address)
+            return True
+        except Exception as e:
+            self.logger.error(f"Excel formula error: {e}")
+            return False
+    
+    @tracer.traced("excel.apply_format")
+    def apply_format(self, address: str, number_format: str = None, bold: bool = None,
+                     font_color: str = None, fill_color: str = None, column_width: float = None) -> bool:
+        """Format every cell of a range; colors are #RRGGBB"""
+        try:
+            if not self.is_initialized:
+                return False
+            
+            self.backend.apply_format(parse_range(address), {
+                "number_format": number_format, "bold": bold, "font_color": font_color,
+                "fill_color": fill_color, "column_width": column_width
+            })
+            
+            self.logger.debug("Formatted %s", address)
+            return True
+        except Exception as e:
+            self.logger.error(f"Excel format error: {e}")
+            return False
+    
+    def write_table(self, top_left: str, headers: List[str], rows: List[list],
+                    number_formats: Dict[str, str] = None) -> Optional[str]:
+        """Write headers and rows in one batch, bold the header and format columns by header name"""
+        if not self.is_initialized:
+            return None
+        
+        top, left = parse_cell(top_left)
+        with self.batch():
+            # Formats first, so streaming backends can apply them as rows are written
+            self.apply_format(range_address(top, left, 1, len(headers)), bold=True)
+            for header, number_format in (number_formats or {}).items():
+                if header in headers and rows:
+                    column = left + headers.index(header)
+                    self.apply_format(range_address(top + 1, column, len(rows), 1),
+                                      number_format=number_format)
+            return self.write_range(top_left, [list(headers)] + [list(row) for row in rows])
+    
+    def create_chart(self, data_range: str, chart_type: str = "Column"):
+        """Create chart from data range"""
+        try:
+            if not self.is_initialized:
+                return False
+            
+            self.backend.add_chart(parse_range(data_range), chart_type)
+            
+            self.logger.info(f"Created {chart_type} chart for range {data_range}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Chart creation error: {e}")
+            return False
+    
+    def apply_conditional_formatting(self, range_addr: str, condition: str, format_type: str):
+        """Apply conditional formatting to range.
+        
+        condition is a comparison ("> 100", "<= 0", "between 1 and 5",
+        "= done"), "duplicates", "unique" or "above average"/"below
+        average"; format_type is red, green, yellow or bold, or data_bar or
+        color_scale, which ignore the condition.
+        """
+        try:
+            if not self.is_initialized:
+                return False
+            
+            self.backend.add_conditional_format(parse_range(range_addr), parse_condition(condition, format_type))
+            self.logger.info(f"Applied conditional formatting to {range_addr}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Conditional formatting error: {e}")
+            return False
+    
+    def save_workbook(self, filename: str = None):
+        """Save current workbook"""
+        try:
+            if not self.is_initialized:
+                return False
+            
+            filename = self.backend.save(filename)
+            if isinstance(self.backend, XlsxExcelBackend):
+                # The streamed file is final; the next command starts a new workbook
+                self.is_initialized = False
+            
+            self.logger.info(f"Workbook saved: {filename or 'default'}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Save workbook error: {e}")
+            return False
+    
+    def close(self):
+        """Close Excel application"""
+        try:
+            if self.is_initialized:
+                self.backend.close()
+                self.is_initialized = False
+                self.logger.info("Excel closed")
+        except Exception as e:
+            self.logger.error(f"Excel close error: {e}")
+
+# ===== Enhanced Email Manager =====
+# One grammar for email commands: a template send or a compose with subject and optional body
+EMAIL_GRAMMAR = re.compile(r"""
+    \bsend\s+(?:an?\s+)?(?:e-?mail|mail)\s+using\s+template\s+(?P<template>\w+)
+        (?:.*?\bto\s+(?P<template_recipient>\S+))?
+  | (?:\bsend\s+(?:an?\s+)?)?\b(?:e-?mail|mail)\s+to\s+(?P<recipient>.+?)
+        \s+(?:regarding|about|for|with\s+subject|subject)\s+(?P<subject>.+?)
+        (?:\s+(?:saying|with\s+message|body)\s+(?P<body>.+))?$
+""", re.VERBOSE)
+
+SPOKEN_ADDRESS_SYMBOLS = {"at": "@", "dot": ".", "underscore": "_", "dash": "-", "hyphen": "-"}
+EMAIL_PROVIDERS = {"gmail": "gmail.com", "yahoo": "yahoo.com", "outlook": "outlook.com",
+                   "hotmail": "hotmail.com", "icloud": "icloud.com"}
+
+EMAIL_BODY_TEMPLATES = {
+    "meeting": """Dear Recipient,
+
+I hope this email finds you well. I am writing to discuss the {subject}.
+
+I would appreciate the opportunity to meet and discuss this matter further. Please let me know your availability.
+
+Best regards,
+AIVA User""",
+    
+    "sick": """Dear Sir/Madam,
+
+I am writing to inform you that I will be unable to attend work today due to illness. I expect to return once I have recovered.
+
+I will monitor my email and respond to urgent matters as my health permits.
+
+Thank you for your understanding.
+
+Best regards,
+AIVA User""",
+    
+    "follow_up": """Dear Recipient,
+
+I hope you are doing well. I wanted to follow up on our previous discussion regarding {subject}.
+
+Please let me know if you need any additional information or if there are any updates.
+
+Looking forward to your response.
+
+Best regards,
+AIVA User""",
+    
+    "general": """Dear Recipient,
+
+I hope this email finds you well. I am writing regarding {subject}.
+
+Please let me know if you need any additional information.
+
+Best regards,
+AIVA User"""
+}
+
+# Subject words that select a body template, checked in this order
+EMAIL_TOPICS = re.compile(r"(?P<sick>sick|illness|health|leave)"
+                          r"|(?P<meeting>meeting|appointment|discussion)"
+                          r"|(?P<follow_up>follow|update|check)")
+EMAIL_TOPIC_PRIORITY = ("sick", "meeting", "follow_up")
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_email_intent(command: str) -> Optional[Tuple[str, ...]]:
+    """Parse a lowercased email command in one pass.
+    
+    Returns ("template", name, recipient or None) or
+    ("compose", recipient, subject, body or None), or None when the
+    command is not an email request. Results are cached, since voice
+    commands repeat.
+    """
+    match = EMAIL_GRAMMAR.search(command)
+    if not match:
+        return None
+    if match.group("template"):
+        return ("template", match.group("template"), match.group("template_recipient"))
+    return ("compose", match.group("recipient").strip(), match.group("subject").strip(),
+            match.group("body") and match.group("body").strip())
+
+
+@functools.lru_cache(maxsize=1024)
+def spoken_email_address(recipient: str) -> str:
+    """Translate a spoken address word by word: "john dot smith at gmail" -> "john.smith@gmail.com".
+    
+    Spoken symbols become characters and spaces are dropped; a bare
+    provider name as the domain gets its .com.
+    """
+    symbols = SPOKEN_ADDRESS_SYMBOLS
+    address = "".join([symbols.get(token, token) for token in recipient.lower().split()])
+    user, at, domain = address.partition("@")
+    if at and domain in EMAIL_PROVIDERS:
+        return f"{user}@{EMAIL_PROVIDERS[domain]}"
+    return address
+
+
+class EmailManager:
+    def __init__(self, config: AIVAConfig, logger: AIVALogger, database: AIVADatabase):
+        self.config = config
+        self.logger = logger
+        self.database = database
+        # (heard, used) when the last template name was corrected to a close match
+        self.last_template_correction: Optional[Tuple[str, str]] = None
+    
+    def parse_email_command(self, command: str, intent: Tuple[str, ...] = None) -> Optional[Tuple[str, str, str]]:
+        """Enhanced email command parsing; intent is parse_email_intent's result when already parsed"""
+        intent = intent or parse_email_intent(command.lower())
+        if intent is None:
+            return None
+        
+        if intent[0] == "template":
+            _, template_name, recipient = intent
+            template = self.database.render_email_template(template_name, recipient or "")
+            self.last_template_correction = None
+            if not template:
+                suggestion = self.database.suggest_email_template(template_name)
+                if suggestion:
+                    self.logger.info(f"Template '{template_name}' not found, did you mean '{suggestion}'?")
+                    self.last_template_correction = (template_name, suggestion)
+                    template = self.database.render_email_template(suggestion, recipient or "")
+            if template and recipient:
+                return (recipient, template["subject"], template["body"])
+            return None
+        
+        _, recipient, subject, body = intent
+        return (recipient, subject, body or self.generate_email_body(subject))
+    
+    def process_email_address(self, recipient: str) -> str:
+        """Enhanced email address processing"""
+        address = spoken_email_address(recipient.strip())
+        if "@" in address:
+            return address
+        
+        # Default domain handling
+        return f"{address}@{self.config.settings.EMAIL.default_domain}"
+    
+    def generate_email_body(self, subject: str) -> str:
+        """Generate contextual email body"""
+        topics = {match.lastgroup for match in EMAIL_TOPICS.finditer(subject.lower())}
+        topic = next((topic for topic in EMAIL_TOPIC_PRIORITY if topic in topics), "general")
+        return EMAIL_BODY_TEMPLATES[topic].format(subject=subject)
+    
+    def open_gmail_compose(self, recipient: str, subject: str, body: str = None) -> bool:
+        """Open Gmail compose with enhanced features"""
+        try:
+            formatted_recipient = self.process_email_address(recipient)
+            self.logger.info(f"Composing email to: {formatted_recipient}")
+            
+            base_url = "https://mail.google.com/mail/?view=cm&fs=1"
+            base_url += f"&to={urllib.parse.quote(formatted_recipient)}"
+            base_url += f"&su={urllib.parse.quote(subject)}"
+            
+            if not body:
+                body = self.generate_email_body(subject)
+            
+            base_url += f"&body={urllib.parse.quote(body)}"
+            
+            webbrowser.open(base_url)
+            command_sleep(self.config.settings.EMAIL.send_delay)
+            
+            return True
+        except Exception as e:
+            self.logger.error(f"Gmail compose error: {e}")
+            return False
+    
+    def auto_send_email(self) -> bool:
+        """Automatically send email using keyboard shortcuts"""
+        try:
+            if not self.config.settings.EMAIL.auto_send:
+                return False
+            
+            # Focus browser and send
+            pyautogui = lazy_import("pyautogui")
+            pyautogui.click(500, 500)
+            command_sleep(1)
+            pyautogui.hotkey('ctrl', 'enter')
+            command_sleep(2)
+            
+            self.logger.info("Email sent automatically")
+            return True
+        except Exception as e:
+            self.logger.error(f"Auto send error: {e}")
+            return False
+
+# ===== Audio Pipeline =====
+def frame_rms(frame: bytes, sample_width: int) -> float:
+    """Root mean square energy of a little-endian signed PCM frame"""
+    typecode = {1: 'b', 2: 'h', 4: 'i'}.get(sample_width)
+    if typecode is None:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    
+    samples = array.array(typecode, frame[:len(frame) - len(frame) % sample_width])
+    if not samples:
+        return 0.0
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+class NoiseFloorTracker:
+    """Adaptive ambient noise floor that drives the speech energy threshold.
+    
+    Calibrated once from a short stretch of ambient audio, then blended
+    towards the energy of every non-speech chunk the capture path already
+    reads, so listening never stops to recalibrate. The floor is also kept
+    at or above the quietest chunk of the last `window` seconds, so it can
+    rise when the room gets louder than the current threshold.
+    """
+    
+    def __init__(self, calibration_duration: float = 0.5, energy_ratio: float = 1.5,
+                 damping: float = 0.15, min_threshold: float = 50.0, initial_threshold: float = 300.0,
+                 window: float = 2.0):
+        self.calibration_duration = calibration_duration
+        self.energy_ratio = energy_ratio
+        self.damping = damping
+        self.min_threshold = min_threshold
+        self.window = window
+        self._recent: Optional[collections.deque] = None
+        self.noise_floor = initial_threshold / energy_ratio
+        self.calibrated = False
+        # Wall-clock seconds the one-off calibration took
+        self.calibration_time = 0.0
+    
+    @property
+    def threshold(self) -> float:
+        """Energy above which a chunk counts as speech"""
+        return max(self.min_threshold, self.noise_floor * self.energy_ratio)
+    
+    def calibrate(self, energies: List[float], elapsed: float = 0.0):
+        """Set the noise floor from ambient chunk energies"""
+        if energies:
+            self.noise_floor = sum(energies) / len(energies)
+        self.calibrated = True
+        self.calibration_time = elapsed
+    
+    def observe(self, energy: float, duration: float) -> bool:
+        """Track a captured chunk lasting duration seconds; returns True if it is speech"""
+        if self._recent is None:
+            self._recent = collections.deque(maxlen=max(1, math.ceil(self.window / duration)))
+        self._recent.append(energy)
+        
+        speech = energy > self.threshold
+        if not speech:
+            weight = self.damping ** duration
+            self.noise_floor = self.noise_floor * weight + energy * (1 - weight)
+        elif len(self._recent) == self._recent.maxlen:
+            # Even continuous speech has gaps; a window without any means the noise rose
+            self.noise_floor = max(self.noise_floor, min(self._recent))
+        return speech
+
+
+class AudioSource:
+    """Source of raw PCM frames for an AudioPipeline"""
+    sample_rate = 16000
+    sample_width = 2
+    frames_per_chunk = 1024
+    
+    def open(self):
+        pass
+    
+    def read(self) -> Optional[bytes]:
+        """Return the next chunk of audio, or None at end of stream"""
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+    
+    @property
+    def chunk_duration(self) -> float:
+        return self.frames_per_chunk / self.sample_rate
+
+
+class MicrophoneSource(AudioSource):
+    """Live audio from a speech_recognition Microphone"""
+    
+    def __init__(self, microphone: sr.Microphone):
+        self.microphone = microphone
+        self._source = None
+    
+    def open(self):
+        self._source = self.microphone.__enter__()
+        self.sample_rate = self._source.SAMPLE_RATE
+        self.sample_width = self._source.SAMPLE_WIDTH
+        self.frames_per_chunk = self._source.CHUNK
+    
+    def read(self) -> Optional[bytes]:
+        return self._source.stream.read(self._source.CHUNK)
+    
+    def close(self):
+        if self._source is not None:
+            self.microphone.__exit__(None, None, None)
+            self._source = None
+
+
+class ArrayAudioSource(AudioSource):
+    """Audio from an in-memory PCM buffer or WAV file, for tests and replay"""
+    
+    def __init__(self, data, sample_rate: int = 16000, sample_width: int = 2,
+                 frames_per_chunk: int = 1024, realtime: bool = False):
+        self.data = bytes(memoryview(data).cast('B'))
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frames_per_chunk = frames_per_chunk
+        self.realtime = realtime
+        self.position = 0
+    
+    @classmethod
+    def from_wav(cls, path: str, **kwargs) -> "ArrayAudioSource":
+        """Load a mono PCM WAV file"""
+        with wave.open(path, 'rb') as wav:
+            if wav.getnchannels() != 1:
+                raise ValueError(f"{path}: expected mono audio")
+            return cls(
+                wav.readframes(wav.getnframes()),
+                sample_rate=wav.getframerate(),
+                sample_width=wav.getsampwidth(),
+                **kwargs
+            )
+    
+    def open(self):
+        self.position = 0
+    
+    def read(self) -> Optional[bytes]:
+        if self.position >= len(self.data):
+            return None
+        size = self.frames_per_chunk * self.sample_width
+        chunk = self.data[self.position:self.position + size]
+        self.position += size
+        if self.realtime:
+            time.sleep(self.chunk_duration)
+        return chunk
+
+
+class AudioRingBuffer:
+    """Bounded thread-safe buffer between pipeline stages.
+    
+    When full, policy "drop_oldest" evicts the oldest item to make room and
+    policy "block" makes the producer wait (backpressure).
+    """
+    
+    def __init__(self, capacity: int, policy: str = "drop_oldest", on_drop=None):
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+    
+    def put(self, item) -> bool:
+        """Add an item; returns False if the buffer has been closed"""
+        with self._cond:
+            if self.policy == "block":
+                while len(self._items) >= self.capacity and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                return False
+            
+            dropped = None
+            if len(self._items) >= self.capacity:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+        
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return True
+    
+    def get(self, timeout: float = None):
+        """Remove the oldest item; returns None once closed and drained"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+    
+    def close(self):
+        """Stop accepting items; consumers drain what is left"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+    
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class AudioPipeline:
+    """Streaming capture -> segmentation -> recognition -> dispatch pipeline.
+    
+    A capture thread reads chunks from the source into a frame ring buffer,
+    a segmenter cuts them into phrases on energy and silence, a pool of
+    recognizer workers transcribes phrases concurrently (after an optional
+    local gate such as a wake word detector), and a dispatcher hands
+    transcripts to the callback in the order they were spoken.
+    """
+    
+    _BREAK = object()
+    
+    def __init__(self, source: AudioSource, recognize, dispatch, logger: "AIVALogger", gate=None,
+                 workers: int = 2, buffer_seconds: float = 10.0, phrase_queue_size: int = 4,
+                 policy: str = "drop_oldest", noise_tracker: NoiseFloorTracker = None,
+                 pause_threshold: float = 0.8, phrase_threshold: float = 0.3,
+                 non_speaking_duration: float = 0.5, phrase_time_limit: float = 7.0,
+                 on_muted_chunk=None, replay_seconds: float = 1.0):
+        self.source = source
+        self.recognize = recognize
+        self.dispatch = dispatch
+        # Optional local check before recognition: returns the audio to
+        # recognize (possibly trimmed) or None to drop the phrase
+        self.gate = gate
+        # Called with (energy, duration) for chunks captured while muted,
+        # e.g. to detect the user talking over the assistant
+        self.on_muted_chunk = on_muted_chunk
+        self.replay_seconds = replay_seconds
+        self.logger = logger
+        self.workers = max(1, workers)
+        self.noise_tracker = noise_tracker or NoiseFloorTracker()
+        self.pause_threshold = pause_threshold
+        self.phrase_threshold = phrase_threshold
+        self.non_speaking_duration = non_speaking_duration
+        self.phrase_time_limit = phrase_time_limit
+        self.buffer_seconds = buffer_seconds
+        
+        self.frames = None
+        self.phrases = AudioRingBuffer(phrase_queue_size, policy, on_drop=self._phrase_dropped)
+        self.policy = policy
+        self.results: "queue.Queue" = queue.Queue()
+        
+        self.stats = {"chunks": 0, "phrases": 0, "recognized": 0, "dispatched": 0}
+        self._stop = threading.Event()
+        self._muted = threading.Event()
+        self._replay = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    # --- lifecycle ---
+    def start(self):
+        """Open the source and start all pipeline threads"""
+        self.source.open()
+        capacity = int(self.buffer_seconds / self.source.chunk_duration) or 1
+        self.frames = AudioRingBuffer(capacity, self.policy)
+        
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="AudioCapture", daemon=True),
+            threading.Thread(target=self._segment_loop, name="AudioSegmenter", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="AudioDispatcher", daemon=True)
+        ]
+        self._threads += [
+            threading.Thread(target=self._recognize_loop, name=f"AudioRecognizer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        """Stop capturing; phrases already captured are still dispatched"""
+        self._stop.set()
+    
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for the pipeline to drain; returns True once every thread has exited"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        return not self.is_running()
+    
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+    
+    def mute(self):
+        """Discard captured audio (e.g. while the assistant is speaking)"""
+        self._muted.set()
+    
+    def unmute(self, replay: bool = False):
+        """Resume capture; replay feeds the last muted second back in first"""
+        if replay:
+            self._replay.set()
+        self._muted.clear()
+    
+    @property
+    def dropped_chunks(self) -> int:
+        return self.frames.dropped if self.frames is not None else 0
+    
+    @property
+    def dropped_phrases(self) -> int:
+        return self.phrases.dropped
+    
+    # --- stages ---
+    def _capture_loop(self):
+        muted = False
+        chunk_duration = self.source.chunk_duration
+        tail = collections.deque(maxlen=max(1, int(self.replay_seconds / chunk_duration)))
+        try:
+            while not self._stop.is_set():
+                chunk = self.source.read()
+                if chunk is None:
+                    break
+                if self._muted.is_set():
+                    # Cut any phrase in progress at the start of the muted stretch
+                    if not muted:
+                        self.frames.put(self._BREAK)
+                        tail.clear()
+                    muted = True
+                    tail.append(chunk)
+                    if self.on_muted_chunk:
+                        self.on_muted_chunk(frame_rms(chunk, self.source.sample_width), chunk_duration)
+                    continue
+                muted = False
+                if self._replay.is_set():
+                    self._replay.clear()
+                    for frame in tail:
+                        self.stats["chunks"] += 1
+                        self.frames.put(frame)
+                tail.clear()
+                self.stats["chunks"] += 1
+                self.frames.put(chunk)
+        except Exception as e:
+            self.logger.error(f"Audio capture error: {e}")
+        finally:
+            self.source.close()
+            self.frames.close()
+    
+    def _segment_loop(self):
+        chunk_duration = self.source.chunk_duration
+        preroll = collections.deque(maxlen=max(1, int(self.non_speaking_duration / chunk_duration)))
+        phrase: List[bytes] = []
+        speech = silence = 0.0
+        tracker = self.noise_tracker
+        calibration: List[float] = []
+        
+        while True:
+            chunk = self.frames.get()
+            if chunk is None or chunk is self._BREAK:
+                if phrase and speech >= self.phrase_threshold and chunk is None:
+                    self._emit(phrase)
+                phrase, speech, silence = [], 0.0, 0.0
+                preroll.clear()
+                if chunk is None:
+                    break
+                continue
+            
+            energy = frame_rms(chunk, self.source.sample_width)
+            if not tracker.calibrated:
+                calibration.append(energy)
+                if len(calibration) * chunk_duration >= tracker.calibration_duration:
+                    tracker.calibrate(calibration)
+                continue
+            
+            loud = tracker.observe(energy, chunk_duration)
+            if not phrase:
+                if loud:
+                    phrase = list(preroll) + [chunk]
+                    speech, silence = chunk_duration, 0.0
+                else:
+                    preroll.append(chunk)
+                continue
+            
+            phrase.append(chunk)
+            if loud:
+                speech += chunk_duration
+                silence = 0.0
+            else:
+                silence += chunk_duration
+            
+            duration = len(phrase) * chunk_duration
+            if silence >= self.pause_threshold or duration >= self.phrase_time_limit:
+                if speech >= self.phrase_threshold:
+                    self._emit(phrase)
+                phrase, speech, silence = [], 0.0, 0.0
+                preroll.clear()
+        
+        self.phrases.close()
+    
+    def _emit(self, phrase: List[bytes]):
+        sequence = self.stats["phrases"]
+        self.stats["phrases"] += 1
+        audio = sr.AudioData(b"".join(phrase), self.source.sample_rate, self.source.sample_width)
+        self.phrases.put((sequence, audio))
+    
+    def _phrase_dropped(self, item):
+        sequence, _ = item
+        self.logger.warning(f"Dropped phrase {sequence}: recognizers are falling behind")
+        self.results.put((sequence, None))
+    
+    def _recognize_loop(self):
+        while True:
+            item = self.phrases.get()
+            if item is None:
+                break
+            sequence, audio = item
+            try:
+                if self.gate is not None:
+                    audio = self.gate(audio)
+                transcript = self.recognize(audio) if audio is not None else ""
+            except Exception as e:
+                self.logger.error(f"Phrase recognition error: {e}")
+                transcript = ""
+            self.results.put((sequence, transcript))
+        self.results.put(None)
+    
+    def _dispatch_loop(self):
+        pending: Dict[int, Optional[str]] = {}
+        next_sequence = 0
+        finished_workers = 0
+        
+        while finished_workers < self.workers:
+            item = self.results.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            
+            sequence, transcript = item
+            pending[sequence] = transcript
+            while next_sequence in pending:
+                transcript = pending.pop(next_sequence)
+                next_sequence += 1
+                if not transcript:
+                    continue
+                self.stats["recognized"] += 1
+                try:
+                    self.dispatch(transcript)
+                    self.stats["dispatched"] += 1
+                except Exception as e:
+                    self.logger.error(f"Transcript dispatch error: {e}")
+
+# ===== Recognizer Backends =====
+class RecognizerBackend:
+    """Speech-to-text engine used by RecognizerRouter.
+    
+    transcribe() returns the lowercased transcript, raises
+    sr.UnknownValueError when the audio holds no intelligible speech and
+    any other exception when the engine itself failed.
+    """
+    name = "backend"
+    
+    def transcribe(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (cloud)"""
+    name = "google"
+    
+    def __init__(self, recognizer: sr.Recognizer, language: str = "en-US"):
+        self.recognizer = recognizer
+        self.language = language
+    
+    def transcribe(self, audio: sr.AudioData) -> str:
+        return self.recognizer.recognize_google(audio, language=self.language).lower()
+
+
+class VoskBackend(RecognizerBackend):
+    """Offline Kaldi recognizer through the vosk bindings"""
+    name = "vosk"
+    
+    def __init__(self, model_path: str, sample_rate: int = 16000):
+        vosk = lazy_import("vosk")
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"Vosk model not found: {model_path}")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.sample_rate = sample_rate
+    
+    def transcribe(self, audio: sr.AudioData) -> str:
+        recognizer = self._vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text.lower()
+
+
+class FakeBackend(RecognizerBackend):
+    """Deterministic backend for tests and headless runs.
+    
+    Returns the transcripts in order (cycling), or calls transcripts(audio)
+    when it is callable, after an optional fixed latency. fail_every makes
+    every n-th call raise sr.RequestError.
+    """
+    
+    def __init__(self, transcripts=None, latency: float = 0.0, fail_every: int = 0, name: str = "fake"):
+        self.name = name
+        self.transcripts = transcripts if transcripts is not None else [""]
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def transcribe(self, audio: sr.AudioData) -> str:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and call % self.fail_every == 0:
+            raise sr.RequestError(f"{self.name}: simulated failure")
+        
+        if callable(self.transcripts):
+            text = self.transcripts(audio)
+        else:
+            text = self.transcripts[(call - 1) % len(self.transcripts)]
+        if not text:
+            raise sr.UnknownValueError()
+        return text.lower()
+
+
+class CircuitBreaker:
+    """Stops calling a backend after repeated failures.
+    
+    After failure_threshold consecutive failures the breaker opens; once
+    reset_timeout seconds pass a single trial call is let through
+    (half-open), and its outcome closes or re-opens the breaker.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class RecognizerRouter:
+    """Latency-aware routing over recognizer backends with automatic fallback.
+    
+    Healthy backends are tried fastest first (by moving average latency,
+    configured order until measured). race_width backends are raced at a
+    time; the first transcript within timeout wins and the rest are tried
+    only if they all fail, time out or hear no intelligible speech. A call
+    that timed out counts as a failure even if it finishes later.
+    """
+    
+    def __init__(self, backends: List[RecognizerBackend], logger: "AIVALogger", timeout: float = 5.0,
+                 race_width: int = 1, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.backends = list(backends)
+        self.logger = logger
+        self.timeout = timeout
+        self.race_width = max(1, race_width)
+        self.breakers = {backend.name: CircuitBreaker(failure_threshold, reset_timeout) for backend in self.backends}
+        self.latency: Dict[str, Optional[float]] = {backend.name: None for backend in self.backends}
+        self.calls = {backend.name: 0 for backend in self.backends}
+        # Guards calls and latency, and orders late results after their timeout
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(2, len(self.backends) * 2), thread_name_prefix="Recognizer"
+        )
+    
+    def ranked(self) -> List[RecognizerBackend]:
+        """Backends whose breakers are not open, fastest first"""
+        order = sorted(
+            self.backends,
+            key=lambda backend: self.latency[backend.name] if self.latency[backend.name] is not None else self.timeout
+        )
+        return [backend for backend in order if self.breakers[backend.name].state != "open"]
+    
+    def _call(self, backend: RecognizerBackend, audio: sr.AudioData, abandoned: threading.Event) -> str:
+        start = time.perf_counter()
+        breaker = self.breakers[backend.name]
+        with self._lock:
+            self.calls[backend.name] += 1
+        try:
+            text = backend.transcribe(audio)
+        except sr.UnknownValueError:
+            text = ""
+        except Exception:
+            with self._lock:
+                if not abandoned.is_set():
+                    breaker.record_failure()
+            raise
+        
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            # transcribe() already counted a timeout as this call's failure
+            if abandoned.is_set():
+                return text
+            previous = self.latency[backend.name]
+            self.latency[backend.name] = elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+            breaker.record_success()
+        return text
+    
+    def transcribe(self, audio: sr.AudioData) -> str:
+        """Transcribe with the best available backend; "" when nothing was understood.
+        
+        Raises sr.RequestError when every backend failed or timed out.
+        """
+        candidates = self.ranked()
+        errors = []
+        heard_nothing = False
+        while candidates:
+            batch = []
+            while candidates and len(batch) < self.race_width:
+                backend = candidates.pop(0)
+                if self.breakers[backend.name].allow():
+                    batch.append(backend)
+            if not batch:
+                break
+            
+            abandoned = threading.Event()
+            futures = {self._executor.submit(self._call, backend, audio, abandoned): backend for backend in batch}
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout=self.timeout):
+                    backend = futures[future]
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        errors.append(f"{backend.name}: {e}")
+                        self.logger.warning(f"Recognizer {backend.name} failed: {e}")
+                        continue
+                    if text:
+                        return text
+                    # Another engine may still make out what this one could not
+                    heard_nothing = True
+            except concurrent.futures.TimeoutError:
+                with self._lock:
+                    abandoned.set()
+                    for future, backend in futures.items():
+                        if not future.done():
+                            self.breakers[backend.name].record_failure()
+                            errors.append(f"{backend.name}: timed out after {self.timeout}s")
+                            self.logger.warning(f"Recognizer {backend.name} timed out")
+        
+        if heard_nothing:
+            return ""
+        raise sr.RequestError("; ".join(errors) or "No recognizer backend available")
+    
+    def report(self) -> Dict[str, Dict]:
+        """Per-backend latency, breaker state and call count"""
+        with self._lock:
+            return {
+                backend.name: {
+                    "latency_ms": None if self.latency[backend.name] is None else self.latency[backend.name] * 1000,
+                    "state": self.breakers[backend.name].state,
+                    "calls": self.calls[backend.name]
+                }
+                for backend in self.backends
+            }
+
+# ===== Wake Word Detection =====
+@functools.lru_cache(maxsize=4)
+def _mfcc_matrices(sample_rate: int, fft_size: int, num_filters: int, num_coefficients: int):
+    """Mel filterbank and DCT-II matrices for mfcc_features"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+    
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+    
+    # Speech band only; keeps features comparable across sample rates
+    mel_points = np.linspace(hz_to_mel(80.0), hz_to_mel(min(4000.0, sample_rate / 2)), num_filters + 2)
+    bins = np.floor((fft_size + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    filterbank = np.zeros((num_filters, fft_size // 2 + 1))
+    for index in range(1, num_filters + 1):
+        left, center, right = bins[index - 1], bins[index], bins[index + 1]
+        for k in range(left, center):
+            filterbank[index - 1, k] = (k - left) / max(1, center - left)
+        for k in range(center, right):
+            filterbank[index - 1, k] = (right - k) / max(1, right - center)
+    
+    n = np.arange(num_filters)
+    dct = np.cos(np.pi / num_filters * (n[None, :] + 0.5) * np.arange(num_coefficients)[:, None])
+    return filterbank, dct
+
+
+def mfcc_features(audio: sr.AudioData, num_coefficients: int = 13, sample_rate: int = 16000):
+    """Mean/variance normalized MFCC frames (25 ms window, 10 ms hop), without c0"""
+    samples = np.frombuffer(
+        audio.get_raw_data(convert_rate=sample_rate, convert_width=2), dtype='<i2'
+    ).astype(np.float64)
+    frame_length, hop, fft_size = int(0.025 * sample_rate), int(0.010 * sample_rate), 512
+    if len(samples) < frame_length:
+        return np.zeros((0, num_coefficients - 1))
+    
+    samples = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    count = 1 + (len(samples) - frame_length) // hop
+    indices = np.arange(frame_length)[None, :] + hop * np.arange(count)[:, None]
+    frames = samples[indices] * np.hamming(frame_length)
+    power = np.abs(np.fft.rfft(frames, fft_size)) ** 2 / fft_size
+    
+    filterbank, dct = _mfcc_matrices(sample_rate, fft_size, 26, num_coefficients)
+    coefficients = np.log(power @ filterbank.T + 1e-10) @ dct.T
+    coefficients = coefficients[:, 1:]
+    return (coefficients - coefficients.mean(axis=0)) / (coefficients.std(axis=0) + 1e-8)
+
+
+def subsequence_dtw(template, series) -> Tuple[float, int]:
+    """Best alignment of template against any stretch of series.
+    
+    Every template frame is matched to exactly one series frame, advancing
+    the series by 0-2 frames per step, so the cost is normalized by the
+    template length. Returns (average frame distance, series end frame).
+    """
+    n, m = len(template), len(series)
+    if n == 0 or m == 0:
+        return float("inf"), 0
+    
+    cost = np.sqrt(((template[:, None, :] - series[None, :, :]) ** 2).sum(axis=2) / template.shape[1])
+    previous = cost[0].copy()
+    for i in range(1, n):
+        best = previous.copy()
+        best[1:] = np.minimum(best[1:], previous[:-1])
+        best[2:] = np.minimum(best[2:], previous[:-2])
+        previous = cost[i] + best
+    end = int(np.argmin(previous))
+    return float(previous[end] / n), end
+
+
+class WakeWordDetector:
+    """Local wake word stage run on captured phrases before recognition.
+    
+    detect() returns the offset in seconds where the wake word ends, or
+    None. Detection latency and trigger counts are kept in stats.
+    """
+    
+    def __init__(self):
+        self.stats = {"phrases": 0, "triggers": 0, "gated": 0, "detect_seconds": 0.0}
+    
+    def detect(self, audio: sr.AudioData) -> Optional[float]:
+        start = time.perf_counter()
+        self.stats["phrases"] += 1
+        try:
+            end = self._detect(audio)
+        finally:
+            self.stats["detect_seconds"] += time.perf_counter() - start
+        if end is not None:
+            self.stats["triggers"] += 1
+        return end
+    
+    def _detect(self, audio: sr.AudioData) -> Optional[float]:
+        raise NotImplementedError
+    
+    def evaluate(self, samples: List[Tuple[sr.AudioData, bool]]) -> Dict:
+        """Score the detector on labeled (audio, contains_wake_word) samples"""
+        false_accepts = false_rejects = positives = 0
+        latencies = []
+        for audio, expected in samples:
+            start = time.perf_counter()
+            triggered = self.detect(audio) is not None
+            latencies.append(time.perf_counter() - start)
+            positives += expected
+            false_accepts += triggered and not expected
+            false_rejects += expected and not triggered
+        
+        negatives = len(samples) - positives
+        latencies.sort()
+        return {
+            "samples": len(samples),
+            "false_accept_rate": false_accepts / negatives if negatives else 0.0,
+            "false_reject_rate": false_rejects / positives if positives else 0.0,
+            "p50_latency_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            "max_latency_ms": latencies[-1] * 1000 if latencies else 0.0
+        }
+    
+    def report(self) -> Dict:
+        phrases = self.stats["phrases"]
+        return {
+            "phrases": phrases,
+            "triggers": self.stats["triggers"],
+            "trigger_rate": self.stats["triggers"] / phrases if phrases else 0.0,
+            "avg_latency_ms": self.stats["detect_seconds"] / phrases * 1000 if phrases else 0.0
+        }
+
+
+class TemplateWakeWordDetector(WakeWordDetector):
+    """Keyword spotter matching MFCC features against enrolled recordings.
+    
+    Phrases are cut by the pipeline's energy gate; each one is compared to
+    the enrolled wake word templates with subsequence DTW over its opening
+    seconds, so only a trigger costs a call to the full recognizer.
+    
+    threshold is the largest average frame distance that still counts as
+    the wake word. The default of 0.73 sits where false accepts and false
+    rejects cross on the synthetic benchmark (3-6% each over three seeds;
+    0.7 rejected 7-15% of wake words); recordings of a real voice may
+    need it nudged either way with bench_wake_word.py.
+    """
+    
+    def __init__(self, threshold: float = 0.73, search_seconds: float = 2.5):
+        super().__init__()
+        if np is None:
+            raise RuntimeError("numpy is required for the template wake word detector")
+        self.threshold = threshold
+        self.search_seconds = search_seconds
+        self.templates = []
+    
+    @classmethod
+    def from_directory(cls, path: str, **kwargs) -> "TemplateWakeWordDetector":
+        """Enroll every mono WAV recording in a directory"""
+        detector = cls(**kwargs)
+        for wav_path in sorted(Path(path).glob("*.wav")):
+            source = ArrayAudioSource.from_wav(str(wav_path))
+            detector.enroll(sr.AudioData(source.data, source.sample_rate, source.sample_width))
+        return detector
+    
+    def enroll(self, audio: sr.AudioData):
+        """Add a recording of the wake word, trimmed to its voiced part"""
+        features = mfcc_features(self._trim_silence(audio))
+        if len(features):
+            self.templates.append(features)
+    
+    @staticmethod
+    def _trim_silence(audio: sr.AudioData, ratio: float = 0.1) -> sr.AudioData:
+        chunk = int(0.010 * audio.sample_rate) * audio.sample_width
+        energies = [frame_rms(audio.frame_data[i:i + chunk], audio.sample_width)
+                    for i in range(0, len(audio.frame_data), chunk)]
+        if not energies:
+            return audio
+        # Voiced means well above the recording's own noise floor
+        floor = sorted(energies)[len(energies) // 10]
+        cutoff = floor + (max(energies) - floor) * ratio
+        loud = [i for i, energy in enumerate(energies) if energy >= cutoff]
+        return sr.AudioData(audio.frame_data[loud[0] * chunk:(loud[-1] + 1) * chunk],
+                            audio.sample_rate, audio.sample_width)
+    
+    def _detect(self, audio: sr.AudioData) -> Optional[float]:
+        if not self.templates:
+            return None
+        
+        # Cheap reject: too short to hold even half of the shortest template
+        shortest = min(len(template) for template in self.templates) * 0.010
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        if duration < shortest / 2:
+            return None
+        
+        window = audio.get_segment(end_ms=self.search_seconds * 1000)
+        series = mfcc_features(window)
+        best_cost, best_end = min(subsequence_dtw(template, series) for template in self.templates)
+        if best_cost > self.threshold:
+            return None
+        # Frame i covers [i * 10 ms, i * 10 ms + 25 ms)
+        return (best_end * 0.010) + 0.025
+
+# ===== Speech Output =====
+class PhraseCache:
+    """Size-bounded LRU cache of synthesized phrases, stored as WAV files.
+    
+    Entries are keyed by (text, voice, rate, volume). Recency is kept in
+    the file modification time so it survives restarts.
+    """
+    
+    def __init__(self, directory: str = "data/tts_cache", max_bytes: int = 20 * 1024 * 1024,
+                 logger: "AIVALogger" = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        # key -> file size, least recently used first
+        self._entries: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._size = 0
+        
+        files = sorted(self.directory.glob("*.wav"), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._size += size
+        self._evict()
+    
+    @staticmethod
+    def key(text: str, voice, rate, volume) -> str:
+        return hashlib.sha1(repr((text, voice, rate, volume)).encode("utf-8")).hexdigest()
+    
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.wav"
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def size(self) -> int:
+        return self._size
+    
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached audio file for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        return path
+    
+    def put(self, key: str, render) -> Optional[Path]:
+        """Render audio for key with render(path) and add it to the cache"""
+        path = self.path(key)
+        temp_path = path.with_name(f"{key}.tmp")
+        try:
+            render(str(temp_path))
+            # Only keep files we can play back
+            with wave.open(str(temp_path), 'rb') as wav:
+                if wav.getnframes() == 0:
+                    raise ValueError("empty audio")
+            os.replace(temp_path, path)
+        except Exception:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        
+        size = path.stat().st_size
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self.stats["renders"] += 1
+            self._evict()
+        return path
+    
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.stats["evictions"] += 1
+            try:
+                self.path(key).unlink()
+            except OSError:
+                pass
+    
+    def report(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+        }
+
+class WavPlayer:
+    """Plays WAV files through PyAudio in small blocks so playback can be stopped"""
+    
+    def __init__(self, block_frames: int = 1024):
+        self.block_frames = block_frames
+        self._pyaudio = None
+    
+    def play(self, path, should_stop=None, on_audio=None) -> bool:
+        """Play a WAV file; returns False if should_stop() cut it short"""
+        if self._pyaudio is None:
+            # PyAudio is already required by sr.Microphone
+            self._pyaudio = sr.Microphone.get_pyaudio().PyAudio()
+        
+        with wave.open(str(path), 'rb') as wav:
+            stream = self._pyaudio.open(
+                format=self._pyaudio.get_format_from_width(wav.getsampwidth()),
+                channels=wav.getnchannels(),
+                rate=wav.getframerate(),
+                output=True
+            )
+            try:
+                data = wav.readframes(self.block_frames)
+                if data and on_audio:
+                    on_audio()
+                while data:
+                    if should_stop and should_stop():
+                        return False
+                    stream.write(data)
+                    data = wav.readframes(self.block_frames)
+            finally:
+                stream.stop_stream()
+                stream.close()
+        return True
+    
+    def close(self):
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+
+class SpeechQueue:
+    """Text-to-speech worker thread fed by a priority queue.
+    
+    The pyttsx3 engine is created and driven only on the worker thread.
+    Text is split into sentences so the first one starts playing sooner
+    and cancellation (interrupt or barge-in) takes effect between words.
+    say() returns a Future that resolves to True once the text was spoken
+    in full, or False if it was cancelled or failed.
+    
+    With a PhraseCache, sentences of prewarmed phrases are rendered to disk
+    when the queue is otherwise idle and later played from the cache
+    instead of being synthesized again.
+    """
+    URGENT, NORMAL, LOW = 0, 5, 9
+    SENTENCE_END = re.compile(r'(?<=[.!?;])\s+')
+    _CONFIGURE = URGENT - 1
+    _STOP = LOW + 1
+    _RENDER = LOW + 2
+    
+    class _Utterance:
+        def __init__(self, future: concurrent.futures.Future, chunks: int):
+            self.future = future
+            self.remaining = chunks
+            self.cancelled = False
+            self.failed = False
+            self.queued_at = time.perf_counter()
+            self.started = False
+            self.audible = False
+    
+    def __init__(self, engine_factory, logger: "AIVALogger", on_start=None, on_idle=None,
+                 cache: PhraseCache = None, player: WavPlayer = None, on_audio=None):
+        self.engine_factory = engine_factory
+        self.logger = logger
+        self.on_start = on_start
+        self.on_idle = on_idle
+        # Called when audio for a sentence actually starts playing
+        self.on_audio = on_audio
+        self.cache = cache
+        self.player = player
+        self.cacheable = set()
+        self.engine = None
+        self.voice = None
+        self._audio_pending = False
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._current: Optional[SpeechQueue._Utterance] = None
+        self._thread = threading.Thread(target=self._run, name="SpeechQueue", daemon=True)
+        self._thread.start()
+    
+    def say(self, text: str, priority: int = NORMAL, interrupt: bool = False) -> concurrent.futures.Future:
+        """Queue text for speaking; interrupt cancels everything spoken or queued before it"""
+        future = concurrent.futures.Future()
+        chunks = self.split(text)
+        if not chunks:
+            future.set_result(True)
+            return future
+        
+        if interrupt:
+            self.cancel_all()
+        utterance = self._Utterance(future, len(chunks))
+        with self._lock:
+            self._pending += len(chunks)
+            self._idle.clear()
+        for chunk in chunks:
+            self._queue.put((priority, next(self._sequence), chunk, utterance))
+        return future
+    
+    @classmethod
+    def split(cls, text: str) -> List[str]:
+        return [chunk for chunk in cls.SENTENCE_END.split(text.strip()) if chunk]
+    
+    def prewarm(self, phrases: List[str]):
+        """Mark phrases as cacheable and render any that are not cached yet"""
+        if self.cache is None:
+            return
+        for phrase in phrases:
+            for chunk in self.split(phrase):
+                if chunk not in self.cacheable:
+                    self.cacheable.add(chunk)
+                    self._queue.put((self._RENDER, next(self._sequence), chunk, None))
+    
+    def reconfigure(self, apply):
+        """Run apply() on the worker thread before the next sentence, e.g. to change the voice.
+        
+        Cached phrases rendered with the old voice are rendered again.
+        """
+        self._queue.put((self._CONFIGURE, next(self._sequence), apply, None))
+    
+    def cancel_current(self):
+        """Stop the utterance being spoken, at the next word"""
+        current = self._current
+        if current is not None:
+            current.cancelled = True
+    
+    def cancel_all(self):
+        """Stop the current utterance and drop everything queued"""
+        self.cancel_current()
+        with self._queue.mutex:
+            for _, _, _, utterance in self._queue.queue:
+                if utterance is not None:
+                    utterance.cancelled = True
+    
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until nothing is being spoken or queued"""
+        return self._idle.wait(timeout)
+    
+    def is_speaking(self) -> bool:
+        return not self._idle.is_set()
+    
+    def close(self):
+        """Finish queued speech and stop the worker (pending renders are skipped)"""
+        self._queue.put((self._STOP, next(self._sequence), None, None))
+        self._thread.join()
+    
+    def _on_word(self, name, location, length):
+        # Runs on the worker thread inside runAndWait, where stop() is safe
+        if self._audio_pending:
+            self._audio_started()
+        current = self._current
+        if current is not None and current.cancelled:
+            self.engine.stop()
+    
+    def _audio_started(self):
+        self._audio_pending = False
+        current = self._current
+        if current is not None and not current.audible:
+            current.audible = True
+            tracer.record("tts.first_audio", time.perf_counter() - current.queued_at)
+        if self.on_audio:
+            self.on_audio()
+    
+    def _cache_key(self, chunk: str) -> str:
+        return PhraseCache.key(chunk, *self.voice)
+    
+    def _speak(self, chunk: str, utterance: "_Utterance"):
+        self._audio_pending = True
+        if self.cache is not None and self.player is not None and self.voice is not None:
+            path = self.cache.get(self._cache_key(chunk))
+            if path is not None:
+                try:
+                    self.player.play(path, should_stop=lambda: utterance.cancelled,
+                                     on_audio=self._audio_started)
+                    return
+                except Exception as e:
+                    # Fall back to live synthesis from now on
+                    self.logger.error(f"Cached speech playback error: {e}")
+                    self.player = None
+            elif chunk in self.cacheable:
+                # Evicted or never rendered: render again once idle
+                self._queue.put((self._RENDER, next(self._sequence), chunk, None))
+        
+        if self.engine is None:
+            raise RuntimeError("speech engine unavailable")
+        self.engine.say(chunk)
+        self.engine.runAndWait()
+    
+    def _render(self, chunk: str):
+        if self.engine is None or self.voice is None:
+            return
+        key = self._cache_key(chunk)
+        if key in self.cache:
+            return
+        
+        def synthesize(path):
+            self.engine.save_to_file(chunk, path)
+            self.engine.runAndWait()
+        
+        try:
+            with tracer.span("tts.render"):
+                self.cache.put(key, synthesize)
+        except Exception as e:
+            self.logger.error(f"Speech cache render error: {e}")
+    
+    def _voice(self) -> Tuple:
+        return tuple(self.engine.getProperty(name) for name in ("voice", "rate", "volume"))
+    
+    def _configure(self, apply):
+        if self.engine is None:
+            return
+        try:
+            apply()
+            voice = self._voice()
+        except Exception as e:
+            self.logger.error(f"Speech engine configuration error: {e}")
+            return
+        if voice != self.voice and self.cache is not None:
+            for chunk in self.cacheable:
+                self._queue.put((self._RENDER, next(self._sequence), chunk, None))
+        self.voice = voice
+    
+    def _run(self):
+        try:
+            self.engine = self.engine_factory()
+            self.engine.connect('started-word', self._on_word)
+            self.voice = self._voice()
+        except Exception as e:
+            self.logger.error(f"Speech engine error: {e}")
+        
+        while True:
+            priority, _, chunk, utterance = self._queue.get()
+            if priority == self._STOP:
+                break
+            if priority == self._CONFIGURE:
+                self._configure(chunk)
+                continue
+            if priority == self._RENDER:
+                self._render(chunk)
+                continue
+            
+            if not utterance.cancelled:
+                self._current = utterance
+                if not utterance.started:
+                    utterance.started = True
+                    tracer.record("tts.queue_wait", time.perf_counter() - utterance.queued_at)
+                if self.on_start:
+                    self.on_start()
+                try:
+                    with tracer.span("tts.sentence"):
+                        self._speak(chunk, utterance)
+                except Exception as e:
+                    utterance.failed = True
+                    self.logger.error(f"Speech error: {e}")
+                self._current = None
+            
+            utterance.remaining -= 1
+            if utterance.remaining == 0:
+                utterance.future.set_result(not (utterance.cancelled or utterance.failed))
+            
+            with self._lock:
+                self._pending -= 1
+                idle = self._pending == 0
+            if idle:
+                if self.on_idle:
+                    self.on_idle()
+                self._idle.set()
+        
+        if self.player is not None:
+            self.player.close()
+
+# ===== Voice Manager =====
+class VoiceManager:
+    # Fixed responses spoken by the voice manager itself
+    FIXED_PHRASES = ["Yes, how can I help?", "My speech service is having issues."]
+    
+    def __init__(self, config: AIVAConfig, logger: AIVALogger):
+        self.config = config
+        self.logger = logger
+        self.recognizer = sr.Recognizer()
+        # Energy threshold is owned by the noise tracker instead
+        self.recognizer.dynamic_energy_threshold = False
+        speech_settings = config.settings.SPEECH_RECOGNITION
+        self.noise_tracker = NoiseFloorTracker(
+            calibration_duration=speech_settings.ambient_duration,
+            energy_ratio=speech_settings.energy_ratio,
+            damping=speech_settings.noise_damping,
+            min_threshold=speech_settings.min_energy_threshold,
+            window=speech_settings.noise_window,
+            initial_threshold=self.recognizer.energy_threshold
+        )
+        self.capture_stats = {"utterances": 0, "capture_seconds": 0.0, "calibration_seconds_saved": 0.0}
+        # Device lookup and template enrollment are slow: start them now, wait on first use
+        self._microphone = warm_up("microphone", sr.Microphone)
+        self._wake_word_detector = warm_up("wake_word_detector", self.create_wake_word_detector)
+        self.tts_engine = None
+        self.phrase_cache = self.create_phrase_cache()
+        self.speech = SpeechQueue(self._create_tts_engine, logger,
+                                  on_start=self._on_speech_start, on_idle=self._on_speech_idle,
+                                  cache=self.phrase_cache,
+                                  player=WavPlayer() if self.phrase_cache else None)
+        self._apply_barge_in_settings(config.settings.VOICE)
+        self._barge_in_seconds = 0.0
+        self._barged_in = False
+        self.is_listening = False
+        self.wake_words = ["aiva", "hey aiva", "ok aiva"]
+        self.pipeline: Optional[AudioPipeline] = None
+        # Until when a phrase is taken as a command without the wake word
+        # (inf while the acknowledgement is playing). The gate reads it on
+        # every recognizer worker, so it is only touched under _wake_lock
+        self._command_deadline = 0.0
+        self._wake_lock = threading.Lock()
+        self.recognizers = self.create_recognizer_router()
+        config.subscribe(self._on_config_change)
+    
+    @property
+    def microphone(self) -> sr.Microphone:
+        return self._microphone.result()
+    
+    @property
+    def wake_word_detector(self) -> Optional[WakeWordDetector]:
+        return self._wake_word_detector.result()
+    
+    def setup_voice(self):
+        """Setup text-to-speech configuration"""
+        try:
+            settings = self.config.settings.VOICE
+            voices = self.tts_engine.getProperty('voices')
+            
+            if voices and len(voices) > settings.voice_index:
+                self.tts_engine.setProperty('voice', voices[settings.voice_index].id)
+            
+            self.tts_engine.setProperty('rate', settings.rate)
+            self.tts_engine.setProperty('volume', settings.volume)
+            
+            self.logger.info("Voice engine configured")
+        except Exception as e:
+            self.logger.error(f"Voice setup error: {e}")
+    
+    def _apply_barge_in_settings(self, settings):
+        """Barge-in thresholds from the VOICE section"""
+        self.barge_in = settings.barge_in
+        self.barge_in_ratio = settings.barge_in_ratio
+        self.barge_in_duration = settings.barge_in_duration
+    
+    def _on_config_change(self, settings, previous):
+        """Apply voice settings from a reloaded configuration file"""
+        voice, old = settings.VOICE, previous.VOICE
+        self._apply_barge_in_settings(voice)
+        if (voice.voice_index, voice.rate, voice.volume) != (old.voice_index, old.rate, old.volume):
+            # The engine belongs to the speech thread; change it there, between sentences
+            self.speech.reconfigure(self.setup_voice)
+    
+    def _create_tts_engine(self):
+        """Create and configure the TTS engine (runs on the speech thread)"""
+        with startup_profiler.measure("tts_engine"):
+            self.tts_engine = lazy_import("pyttsx3").init()
+            self.setup_voice()
+        return self.tts_engine
+    
+    def create_phrase_cache(self) -> Optional[PhraseCache]:
+        """Create the on-disk cache of synthesized fixed responses, if enabled"""
+        settings = self.config.settings.VOICE
+        if not settings.cache_enabled:
+            return None
+        try:
+            return PhraseCache(
+                settings.cache_dir,
+                max_bytes=int(settings.cache_max_mb * 1024 * 1024),
+                logger=self.logger
+            )
+        except OSError as e:
+            self.logger.error(f"Speech cache error: {e}")
+            return None
+    
+    def prewarm_speech(self, phrases: List[str]):
+        """Render fixed responses ahead of time so they play from the cache"""
+        self.speech.prewarm(self.FIXED_PHRASES + list(phrases))
+    
+    @tracer.traced("voice.speak")
+    def speak(self, text: str, interrupt: bool = False,
+              priority: int = SpeechQueue.NORMAL) -> concurrent.futures.Future:
+        """Queue text-to-speech without blocking; interrupt cancels current speech.
+        
+        Returns a Future resolving to True once the text has been spoken.
+        """
+        print(f"AIVA: {text}")
+        self.logger.debug("Spoke: %s", text)
+        return self.speech.say(text, priority=priority, interrupt=interrupt)
+    
+    def _on_speech_start(self):
+        # Keep our own voice out of the capture pipeline
+        if self.pipeline:
+            self.pipeline.mute()
+    
+    def _on_speech_idle(self):
+        # Replay the audio that triggered a barge-in so the command is not lost
+        barged_in, self._barged_in = self._barged_in, False
+        self._barge_in_seconds = 0.0
+        if self.pipeline:
+            self.pipeline.unmute(replay=barged_in)
+    
+    def _check_barge_in(self, energy: float, duration: float):
+        """Cancel our own speech when the user talks over it"""
+        if not self.barge_in or self._barged_in:
+            return
+        # Well above the speech threshold, so our own voice from the speakers does not trigger it
+        if energy > self.noise_tracker.threshold * self.barge_in_ratio:
+            self._barge_in_seconds += duration
+            if self._barge_in_seconds >= self.barge_in_duration:
+                self._barged_in = True
+                self.logger.info("Barge-in detected, stopping speech")
+                self.speech.cancel_all()
+        else:
+            self._barge_in_seconds = 0.0
+    
+    @tracer.traced("voice.listen")
+    def listen(self, timeout: float = None, wake_word_mode: bool = False) -> str:
+        """Enhanced speech recognition with wake word support"""
+        settings = self.config.settings.SPEECH_RECOGNITION
+        if timeout is None:
+            timeout = settings.timeout
+        
+        # Do not record our own voice
+        with tracer.span("voice.wait_for_speech"):
+            self.speech.wait_idle()
+        
+        try:
+            with self.microphone as source:
+                startup_profiler.mark("first listening")
+                if not wake_word_mode:
+                    print("🎤 Listening...")
+                
+                # Calibrate once; afterwards the tracker adapts from captured audio
+                calibrated_now = not self.noise_tracker.calibrated
+                if calibrated_now:
+                    self.calibrate_noise(source)
+                self.recognizer.energy_threshold = self.noise_tracker.threshold
+                
+                capture_start = time.perf_counter()
+                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=settings.phrase_time_limit)
+                self._record_capture(time.perf_counter() - capture_start, calibrated_now)
+                self._track_noise(audio, source.CHUNK)
+                
+                with tracer.span("voice.recognition"):
+                    command = self.recognizers.transcribe(audio)
+                if not command:
+                    raise sr.UnknownValueError()
+                
+                if not wake_word_mode:
+                    print(f"You: {command}")
+                    self.logger.debug("Heard: %s", command)
+                
+                # Check for wake words if in wake word mode
+                if wake_word_mode:
+                    return command if any(wake_word in command for wake_word in self.wake_words) else ""
+                
+                return command
+                
+        except sr.WaitTimeoutError:
+            return ""
+        except sr.UnknownValueError:
+            if not wake_word_mode:
+                self.logger.debug("Could not understand audio")
+            return ""
+        except sr.RequestError as e:
+            self.logger.error(f"Speech recognition error: {e}")
+            if not wake_word_mode:
+                self.speak("My speech service is having issues.")
+            return ""
+    
+    def create_recognizer_router(self) -> RecognizerRouter:
+        """Recognizer backends from the RECOGNIZER config section"""
+        settings = self.config.settings.RECOGNIZER
+        backends = []
+        for name in settings.backends:
+            try:
+                if name == 'google':
+                    backends.append(GoogleBackend(self.recognizer, settings.language))
+                elif name == 'vosk':
+                    backends.append(VoskBackend(settings.vosk_model))
+                else:
+                    self.logger.warning(f"Unknown recognizer backend: {name}")
+            except Exception as e:
+                self.logger.warning(f"Recognizer backend {name} unavailable: {e}")
+        
+        return RecognizerRouter(
+            backends,
+            self.logger,
+            timeout=settings.timeout,
+            race_width=settings.race_width,
+            failure_threshold=settings.failure_threshold,
+            reset_timeout=settings.reset_timeout
+        )
+    
+    def create_wake_word_detector(self) -> Optional[WakeWordDetector]:
+        """Local wake word detector from config, or None to match on transcripts"""
+        settings = self.config.settings.SPEECH_RECOGNITION
+        if settings.wake_word_engine != 'template':
+            return None
+        
+        try:
+            detector = TemplateWakeWordDetector.from_directory(
+                settings.wake_word_templates,
+                threshold=settings.wake_word_threshold
+            )
+        except Exception as e:
+            self.logger.error(f"Wake word detector error: {e}")
+            return None
+        
+        if not detector.templates:
+            self.logger.warning("No wake word recordings found, matching wake words on transcripts")
+            return None
+        self.logger.info(f"Local wake word detector enrolled with {len(detector.templates)} recordings")
+        return detector
+    
+    @tracer.traced("voice.calibration")
+    def calibrate_noise(self, source):
+        """Measure the ambient noise floor once from an open microphone"""
+        start = time.perf_counter()
+        chunk_duration = source.CHUNK / source.SAMPLE_RATE
+        energies = []
+        while len(energies) * chunk_duration < self.noise_tracker.calibration_duration:
+            energies.append(frame_rms(source.stream.read(source.CHUNK), source.SAMPLE_WIDTH))
+        self.noise_tracker.calibrate(energies, time.perf_counter() - start)
+        self.logger.info(f"Ambient noise calibrated, energy threshold {self.noise_tracker.threshold:.0f}")
+    
+    def _track_noise(self, audio: sr.AudioData, chunk_size: int):
+        """Feed the quiet lead-in of a captured phrase to the noise tracker"""
+        lead_in = int(self.recognizer.non_speaking_duration * audio.sample_rate) * audio.sample_width
+        step = chunk_size * audio.sample_width
+        for offset in range(0, min(lead_in, len(audio.frame_data)) - step + 1, step):
+            energy = frame_rms(audio.frame_data[offset:offset + step], audio.sample_width)
+            self.noise_tracker.observe(energy, chunk_size / audio.sample_rate)
+    
+    def _record_capture(self, elapsed: float, calibrated_now: bool):
+        """Count capture time and the per-call calibration it no longer pays"""
+        saved = 0.0 if calibrated_now else self.noise_tracker.calibration_time
+        self.capture_stats["utterances"] += 1
+        self.capture_stats["capture_seconds"] += elapsed
+        self.capture_stats["calibration_seconds_saved"] += saved
+        tracer.record("voice.capture", elapsed)
+        self.logger.debug("Captured utterance in %.3fs, skipped %.3fs of noise calibration", elapsed, saved)
+    
+    def capture_latency_report(self) -> Dict:
+        """Average capture latency and calibration time saved per utterance"""
+        utterances = self.capture_stats["utterances"]
+        return {
+            "utterances": utterances,
+            "avg_capture_seconds": self.capture_stats["capture_seconds"] / utterances if utterances else 0.0,
+            "avg_saved_seconds": self.capture_stats["calibration_seconds_saved"] / utterances if utterances else 0.0,
+            "total_saved_seconds": self.capture_stats["calibration_seconds_saved"]
+        }
+    
+    @tracer.traced("voice.recognition")
+    def recognize(self, audio: sr.AudioData) -> str:
+        """Transcribe a captured phrase, returning "" when nothing was understood"""
+        try:
+            return self.recognizers.transcribe(audio)
+        except sr.RequestError as e:
+            self.logger.error(f"Speech recognition error: {e}")
+            return ""
+    
+    def create_pipeline(self, dispatch, source: AudioSource = None, gate=None) -> AudioPipeline:
+        """Build a capture/recognition pipeline feeding transcripts to dispatch"""
+        settings = self.config.settings.SPEECH_RECOGNITION
+        return AudioPipeline(
+            source or MicrophoneSource(self.microphone),
+            self.recognize,
+            dispatch,
+            self.logger,
+            gate=gate,
+            on_muted_chunk=self._check_barge_in,
+            workers=settings.recognizer_workers,
+            buffer_seconds=settings.audio_buffer_seconds,
+            phrase_queue_size=settings.phrase_queue_size,
+            policy=settings.overflow_policy,
+            noise_tracker=self.noise_tracker,
+            pause_threshold=self.recognizer.pause_threshold,
+            phrase_threshold=self.recognizer.phrase_threshold,
+            non_speaking_duration=self.recognizer.non_speaking_duration,
+            phrase_time_limit=settings.phrase_time_limit
+        )
+    
+    def continuous_listen(self, callback, source: AudioSource = None):
+        """Continuous listening with wake word detection.
+        
+        Capture and recognition run on background pipeline threads, so
+        speech that arrives while a phrase is being recognized is kept.
+        """
+        self.is_listening = True
+        self.logger.info("Started continuous listening mode")
+        
+        if self.wake_word_detector:
+            # Only phrases that pass the local detector reach the recognizer
+            self.pipeline = self.create_pipeline(lambda text: self._on_command(text, callback), source,
+                                                 gate=self._wake_gate)
+        else:
+            self.pipeline = self.create_pipeline(lambda text: self._on_transcript(text, callback), source)
+        self.pipeline.start()
+        startup_profiler.mark("first listening")
+        try:
+            while self.is_listening and not self.pipeline.wait(timeout=0.5):
+                pass
+        except KeyboardInterrupt:
+            self.stop_listening()
+        finally:
+            self.pipeline.stop()
+            self.pipeline.wait()
+            self.pipeline = None
+    
+    def _claim_command_window(self) -> bool:
+        """True if a bare wake word is waiting for a command; only one phrase gets it"""
+        with self._wake_lock:
+            if time.monotonic() < self._command_deadline:
+                self._command_deadline = 0.0
+                return True
+            return False
+    
+    def _on_transcript(self, text: str, callback):
+        """Gate pipeline transcripts on the wake word before dispatching"""
+        if self._claim_command_window():
+            command = text
+        else:
+            wake_word = next((word for word in sorted(self.wake_words, key=len, reverse=True) if word in text), None)
+            if wake_word is None:
+                return
+            command = text.split(wake_word, 1)[1].strip(" ,.")
+            if not command:
+                self._acknowledge_wake_word()
+                return
+        
+        self._on_command(command, callback)
+    
+    def _on_command(self, command: str, callback):
+        print(f"You: {command}")
+        self.logger.debug("Heard: %s", command)
+        callback(command)
+    
+    def _acknowledge_wake_word(self):
+        """Answer a bare wake word and accept the next phrase as a command"""
+        # The command must start within timeout of the answer (or of a
+        # barge-in cutting it short) and may run for phrase_time_limit
+        settings = self.config.settings.SPEECH_RECOGNITION
+        
+        def arm(_):
+            with self._wake_lock:
+                # Unless a phrase already claimed the window while the answer played
+                if self._command_deadline == float("inf"):
+                    self._command_deadline = time.monotonic() + settings.timeout + settings.phrase_time_limit
+        
+        with self._wake_lock:
+            self._command_deadline = float("inf")
+        self.speak("Yes, how can I help?", priority=SpeechQueue.URGENT).add_done_callback(arm)
+    
+    def _wake_gate(self, audio: sr.AudioData) -> Optional[sr.AudioData]:
+        """Pipeline gate: pass only phrases that follow or contain the wake word.
+        
+        Runs concurrently on every recognizer worker; detection itself
+        needs no lock, only claiming the command window does.
+        """
+        if self._claim_command_window():
+            return audio
+        
+        with tracer.span("voice.wake_word"):
+            wake_end = self.wake_word_detector.detect(audio)
+        if wake_end is None:
+            return None
+        
+        # Anything said after the wake word in the same breath is the command
+        command = audio.get_segment(start_ms=wake_end * 1000)
+        if self._voiced_seconds(command) < self.recognizer.phrase_threshold:
+            self._acknowledge_wake_word()
+            return None
+        return command
+    
+    def _voiced_seconds(self, audio: sr.AudioData, chunk_seconds: float = 0.03) -> float:
+        """Seconds of audio above the current speech energy threshold"""
+        step = max(1, int(chunk_seconds * audio.sample_rate)) * audio.sample_width
+        data = audio.frame_data
+        voiced = sum(
+            1 for offset in range(0, len(data) - step + 1, step)
+            if frame_rms(data[offset:offset + step], audio.sample_width) > self.noise_tracker.threshold
+        )
+        return voiced * chunk_seconds
+    
+    def stop_listening(self):
+        """Stop continuous listening"""
+        self.is_listening = False
+        if self.pipeline:
+            self.pipeline.stop()
+        self.logger.info("Stopped continuous listening")
+
+# ===== Intent Router =====
+class IntentRouter:
+    """Single-pass keyword router for command categories.
+    
+    All keyword tables are compiled into one regular expression that is
+    evaluated as a lookahead at every position of the command, so a single
+    scan finds every (possibly overlapping) keyword occurrence.
+    """
+    
+    def __init__(self, keyword_table: Dict[str, List[str]], priority: List[str] = None):
+        self.keyword_table = {category: list(keywords) for category, keywords in keyword_table.items()}
+        self.priority = self._build_priority(priority or list(self.keyword_table))
+        
+        # keyword -> categories that own it, in priority order
+        self.keyword_categories: Dict[str, List[str]] = {}
+        for category in self.priority:
+            for keyword in self.keyword_table.get(category, []):
+                owners = self.keyword_categories.setdefault(keyword.lower(), [])
+                if category not in owners:
+                    owners.append(category)
+        
+        # Each position reports its longest keyword; shorter keywords that are
+        # prefixes of it are expanded from this table afterwards.
+        keywords = sorted(self.keyword_categories)
+        trie, self.prefixes = self._trie(keywords)
+        
+        # Best priority rank reachable from each longest-match keyword, so
+        # route() can pick a winner without building the full match table
+        self.rank = rank = {category: index for index, category in enumerate(self.priority)}
+        self.best_rank: Dict[str, int] = {
+            keyword: min(
+                rank[category]
+                for expanded in [keyword] + self.prefixes[keyword]
+                for category in self.keyword_categories[expanded]
+            )
+            for keyword in keywords
+        }
+        
+        self.pattern = re.compile(f"(?=({self._trie_pattern(trie)}))") if keywords else None
+    
+    @staticmethod
+    def _trie(keywords: List[str]) -> Tuple[Dict, Dict[str, List[str]]]:
+        """Character trie of sorted keywords, and the shorter keywords each one starts with"""
+        trie: Dict = {}
+        prefixes: Dict[str, List[str]] = {}
+        for keyword in keywords:
+            # Sorted order inserts a keyword's prefixes before it, so they are
+            # the terminal nodes passed on the way down
+            node, starts = trie, []
+            for char in keyword:
+                if "" in node:
+                    starts.append(node[""])
+                node = node.setdefault(char, {})
+            node[""] = keyword
+            prefixes[keyword] = starts
+        return trie, prefixes
+    
+    @staticmethod
+    def _trie_pattern(trie: Dict) -> str:
+        """Build a prefix-factored alternation so each position branches on one character"""
+        escaped: Dict[str, str] = {}
+        
+        def escape(char: str) -> str:
+            text = escaped.get(char)
+            if text is None:
+                text = escaped[char] = re.escape(char)
+            return text
+        
+        def build(node: Dict) -> str:
+            # A chain of single-child nodes is one literal run
+            run = ""
+            while len(node) == 1 and "" not in node:
+                (char, node), = node.items()
+                run += escape(char)
+            terminal = "" in node
+            branches = [escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return run
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if terminal:
+                # Greedy optional tail: prefer the longest keyword at this position
+                return run + (body + "?" if len(branches) == 1 and len(branches[0]) == 1 else "(?:" + body + ")?")
+            return run + body
+        
+        return build(trie)
+    
+    def _build_priority(self, priority: List[str]) -> List[str]:
+        """Known categories in priority order, unlisted ones appended"""
+        ordered = [category for category in priority if category in self.keyword_table]
+        listed = set(ordered)
+        ordered += [category for category in self.keyword_table if category not in listed]
+        return ordered
+    
+    def match(self, command: str) -> Dict[str, List[Tuple[int, int, str]]]:
+        """Return every matching category with its (start, end, keyword) matches.
+        
+        Categories are returned in priority order.
+        """
+        if self.pattern is None:
+            return {}
+        
+        found: Dict[str, List[Tuple[int, int, str]]] = {}
+        for match in self.pattern.finditer(command.lower()):
+            start = match.start()
+            longest = match.group(1)
+            for keyword in [longest] + self.prefixes[longest]:
+                for category in self.keyword_categories[keyword]:
+                    found.setdefault(category, []).append((start, start + len(keyword), keyword))
+        
+        return {category: found[category] for category in self.priority if category in found}
+    
+    def route(self, command: str) -> Optional[str]:
+        """Return the highest priority category matching the command"""
+        if self.pattern is None:
+            return None
+        
+        found = self.pattern.findall(command.lower())
+        if not found:
+            return None
+        return self.priority[min(self.best_rank[keyword] for keyword in found)]
+    
+    def candidates(self, command: str) -> List[str]:
+        """Every category with a keyword in the command, in priority order"""
+        if self.pattern is None:
+            return []
+        
+        categories = {
+            category
+            for longest in self.pattern.findall(command.lower())
+            for keyword in [longest] + self.prefixes[longest]
+            for category in self.keyword_categories[keyword]
+        }
+        return sorted(categories, key=self.rank.__getitem__)
+    
+    def resolve(self, command: str, classifier: "IntentClassifier" = None,
+                min_confidence: float = 0.4, margin: float = 0.05) -> Optional[str]:
+        """Route with a classifier settling ties and misses.
+        
+        When several categories have keywords in the command, the
+        classifier's choice replaces the highest priority match only if it
+        scores at least margin higher. With no keyword match, the
+        classifier's best category is used if it scores at least
+        min_confidence.
+        """
+        candidates = self.candidates(command)
+        if len(candidates) == 1 or classifier is None:
+            return candidates[0] if candidates else None
+        
+        with tracer.span("command.classify"):
+            ranked = classifier.rank(command)
+        if not candidates:
+            return ranked[0][0] if ranked and ranked[0][1] >= min_confidence else None
+        
+        scores = dict(ranked)
+        best = max(candidates, key=lambda category: scores.get(category, 0.0))
+        return best if scores.get(best, 0.0) - scores.get(candidates[0], 0.0) >= margin else candidates[0]
+
+
+class IntentClassifier:
+    """Ranks command categories by similarity to example utterances.
+    
+    Utterances become TF-IDF vectors over words and the character 3- and
+    4-grams of each word, so inflections and slightly misrecognized words
+    still score. Scoring gathers the rows of the utterance's features from
+    a (features x examples) matrix and takes one vector-matrix product; a
+    category scores the cosine similarity of its closest example. The
+    matrix rows of each word's features are looked up once and kept, so
+    scoring a familiar utterance does no string work beyond splitting it.
+    Needs numpy.
+    """
+    WORD = re.compile(r"[a-z0-9]+")
+    # Distinct words whose feature rows are kept
+    WORD_CACHE_SIZE = 4096
+    
+    def __init__(self, examples: Dict[str, List[str]], ngrams: Tuple[int, ...] = (3, 4)):
+        if np is None:
+            raise RuntimeError("numpy is required for the intent classifier")
+        self.ngrams = ngrams
+        self.categories = [category for category, texts in examples.items() if texts]
+        documents = [self.features(text) for category in self.categories for text in examples[category]]
+        # Examples are grouped by category; starts[i] is the first column of category i
+        sizes = [len(examples[category]) for category in self.categories]
+        self.starts = np.cumsum([0] + sizes[:-1])
+        
+        self.vocabulary: Dict[str, int] = {}
+        for document in documents:
+            for feature in document:
+                self.vocabulary.setdefault(feature, len(self.vocabulary))
+        document_frequency = np.zeros(len(self.vocabulary))
+        for document in documents:
+            document_frequency[[self.vocabulary[feature] for feature in document]] += 1
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        # Features never seen in an example count as the rarest kind
+        self.unseen_idf = float(np.log(1 + len(documents)) + 1)
+        
+        self.matrix = np.zeros((len(self.vocabulary), len(documents)), dtype=np.float32)
+        for column, document in enumerate(documents):
+            for feature, count in document.items():
+                row = self.vocabulary[feature]
+                self.matrix[row, column] = (1 + math.log(count)) * self.idf[row]
+        norms = np.linalg.norm(self.matrix, axis=0)
+        self.matrix /= np.where(norms > 0, norms, 1)
+        self._word_rows: Dict[str, Tuple] = {}
+    
+    def word_features(self, word: str) -> List[str]:
+        features = [word]
+        padded = f"<{word}>"
+        for size in self.ngrams:
+            features += [padded[start:start + size] for start in range(len(padded) - size + 1)]
+        return features
+    
+    def features(self, text: str) -> "collections.Counter[str]":
+        features = collections.Counter()
+        for word in self.WORD.findall(text.lower()):
+            features.update(self.word_features(word))
+        return features
+    
+    def _rows(self, word: str) -> Tuple:
+        """Matrix row of each feature of a word, or the feature itself when it is not in the vocabulary"""
+        rows = self._word_rows.get(word)
+        if rows is None:
+            vocabulary = self.vocabulary
+            rows = tuple(vocabulary.get(feature, feature) for feature in self.word_features(word))
+            if len(self._word_rows) >= self.WORD_CACHE_SIZE:
+                self._word_rows.clear()
+            self._word_rows[word] = rows
+        return rows
+    
+    def rank(self, text: str) -> List[Tuple[str, float]]:
+        """Categories with their similarity (0 to 1), best first"""
+        counts = collections.Counter()
+        for word in self.WORD.findall(text.lower()):
+            counts.update(self._rows(word))
+        rows, weights, unseen = [], [], 0.0
+        for row, count in counts.items():
+            if isinstance(row, str):
+                unseen += ((1 + math.log(count)) * self.unseen_idf) ** 2
+            else:
+                rows.append(row)
+                weights.append(1 + math.log(count) if count > 1 else 1.0)
+        if not rows:
+            return []
+        
+        query = np.array(weights, dtype=np.float32) * self.idf.take(rows)
+        norm = math.sqrt(float(query @ query) + unseen)
+        scores = np.minimum(np.maximum.reduceat(query @ self.matrix.take(rows, axis=0), self.starts) / norm, 1.0)
+        order = np.argsort(-scores)
+        return [(self.categories[index], float(scores[index])) for index in order]
+
+
+class UtteranceCache:
+    """Recently resolved utterances, plus a filter for repeated transcripts.
+    
+    Voice users repeat a handful of commands, so the category each
+    normalized utterance resolved to and the arguments parsed from it are
+    kept (least recently used first out, expiring after ttl seconds) and
+    the router and parser are skipped next time. Categories in `uncached`
+    are routed afresh every time; use it for side-effecting ones like email.
+    
+    Separately, an utterance heard again within dedup_window seconds is
+    a duplicate: continuous listening transcribes a phrase twice when it
+    straddles two listen windows. Categories in `repeatable` are never
+    suppressed.
+    """
+    # Punctuation other than the dots, @ and + of "john.smith@gmail.com" or "3.5",
+    # which are only dropped at the ends of words
+    NOISE = re.compile(r"[^\w'.@+]+")
+    COUNTERS = ("hits", "misses", "bypassed", "duplicates")
+    # Returned by get() for utterances not cached; a None category is a cached "unrouted"
+    MISS = object()
+    
+    def __init__(self, size: int = 256, ttl: float = 300.0, dedup_window: float = 1.0,
+                 uncached: Tuple[str, ...] = (), repeatable: Tuple[str, ...] = (), clock=time.monotonic):
+        self.clock = clock
+        self.entries: "collections.OrderedDict[str, Tuple[Optional[str], object, float]]" = collections.OrderedDict()
+        self._heard: Dict[str, float] = {}
+        self.counts: Dict[str, List[int]] = collections.defaultdict(lambda: [0] * len(self.COUNTERS))
+        self._drained: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+        self.configure(size, ttl, dedup_window, uncached, repeatable)
+    
+    def configure(self, size: int, ttl: float, dedup_window: float, uncached: Tuple[str, ...] = (),
+                  repeatable: Tuple[str, ...] = ()):
+        with self._lock:
+            self.size = size
+            self.ttl = ttl
+            self.dedup_window = dedup_window
+            self.uncached = frozenset(uncached)
+            self.repeatable = frozenset(repeatable)
+            for key in [key for key, (category, _, _) in self.entries.items() if category in self.uncached]:
+                del self.entries[key]
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+    
+    @classmethod
+    def normalize(cls, utterance: str) -> str:
+        """Lower case with punctuation (but not addresses or decimals) and runs of spaces collapsed"""
+        text = cls.NOISE.sub(" ", utterance.lower())
+        if "." in text or "@" in text or "+" in text:
+            return " ".join([word for word in (word.strip(".@+") for word in text.split()) if word])
+        return " ".join(text.split())
+    
+    def get(self, key: str):
+        """Cached (category, arguments) for a normalized utterance, or MISS"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return self.MISS
+            category, arguments, stored = entry
+            if self.clock() - stored >= self.ttl:
+                del self.entries[key]
+                return self.MISS
+            self.entries.move_to_end(key)
+            self.counts[category or "unrouted"][0] += 1
+            return category, arguments
+    
+    def put(self, key: str, category: Optional[str], arguments=None):
+        """Remember where an utterance routed and its arguments, unless its category opted out"""
+        with self._lock:
+            if category in self.uncached:
+                self.counts[category][2] += 1
+                return
+            self.counts[category or "unrouted"][1] += 1
+            if self.size <= 0:
+                return
+            self.entries[key] = (category, arguments, self.clock())
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+    
+    def duplicate(self, key: str, category: Optional[str]) -> bool:
+        """Whether the utterance was already heard within the window; records it either way"""
+        if self.dedup_window <= 0 or category in self.repeatable:
+            return False
+        now = self.clock()
+        with self._lock:
+            last = self._heard.get(key)
+            self._heard[key] = now
+            if len(self._heard) > 64:
+                self._heard = {heard: at for heard, at in self._heard.items() if now - at < self.dedup_window}
+            if last is None or now - last >= self.dedup_window:
+                return False
+            self.counts[category or "unrouted"][3] += 1
+            return True
+    
+    def clear(self):
+        """Forget every resolved utterance, e.g. after routing settings change"""
+        with self._lock:
+            self.entries.clear()
+    
+    def drain(self) -> Dict[str, Tuple[int, ...]]:
+        """Counters per category accumulated since the previous drain"""
+        with self._lock:
+            current = {category: tuple(counts) for category, counts in self.counts.items()}
+        deltas = {}
+        for category, counts in current.items():
+            before = self._drained.get(category, (0,) * len(self.COUNTERS))
+            delta = tuple(now - then for now, then in zip(counts, before))
+            self._drained[category] = counts
+            if any(delta):
+                deltas[category] = delta
+        return deltas
+    
+    def undrain(self, deltas: Dict[str, Tuple[int, ...]]):
+        """Put back counters from a drain that could not be saved"""
+        for category, delta in deltas.items():
+            self._drained[category] = tuple(then - back for then, back in zip(self._drained[category], delta))
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            totals = [sum(column) for column in zip(*self.counts.values())] or [0] * len(self.COUNTERS)
+            return {"entries": len(self.entries), **dict(zip(self.COUNTERS, totals))}
+    
+    def prometheus(self, metric: str = "aiva_utterance_cache") -> str:
+        """Counters per category in Prometheus text exposition format"""
+        with self._lock:
+            counts = {category: tuple(values) for category, values in sorted(self.counts.items())}
+        lines = [f"# HELP {metric}_lookups_total Utterance lookups by category and result",
+                 f"# TYPE {metric}_lookups_total counter"]
+        for category, values in counts.items():
+            lines += [f'{metric}_lookups_total{{category="{category}",result="{result}"}} {value}'
+                      for result, value in zip(("hit", "miss", "bypassed"), values)]
+        lines += [f"# HELP {metric}_duplicates_total Repeated utterances suppressed by category",
+                  f"# TYPE {metric}_duplicates_total counter"]
+        lines += [f'{metric}_duplicates_total{{category="{category}"}} {values[3]}'
+                  for category, values in counts.items()]
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def report(rows: List[Dict]) -> str:
+        lines = [f"{'category':<12} {'hits':>8} {'misses':>8} {'bypassed':>9} {'hit rate':>9} {'duplicates':>11}"]
+        for row in rows:
+            hit_rate = f"{row['hit_rate']:.1%}" if row["hit_rate"] is not None else "-"
+            lines.append(f"{row['category']:<12} {row['hits']:>8,} {row['misses']:>8,} {row['bypassed']:>9,} "
+                         f"{hit_rate:>9} {row['duplicates']:>11,}")
+        return "\n".join(lines)
+
+# ===== Command Registry =====
+class CommandManifest:
+    """Declaration of one command category: what it matches and what runs it.
+    
+    handler is the name of an AIVA method, or "module:function" for a
+    plugin, called as function(assistant, command) -> bool. Nothing is
+    imported until the category first fires. Lower priority values win
+    when a command matches several categories. limit and timeout are the
+    category's scheduler defaults, and components are built in the
+    background as soon as a command for it is routed. examples are
+    utterances the intent classifier learns the category from, besides
+    its keywords.
+    
+    arguments optionally parses a command's arguments: a function, or
+    "module:function" for a plugin, called as function(normalized command).
+    Its result is cached with the category and the handler is then called
+    as handler(assistant, command, arguments).
+    """
+    FIELDS = ("name", "keywords", "handler", "response", "priority", "limit", "timeout", "components", "inline",
+              "examples", "arguments")
+    
+    def __init__(self, name: str, keywords: List[str], handler: str, response: str = "",
+                 priority: int = 100, limit: int = None, timeout: float = None,
+                 components: Tuple[str, ...] = (), inline: bool = False, examples: List[str] = (),
+                 arguments=None):
+        self.name = name
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.examples = list(examples)
+        self.handler = handler
+        self.response = response or f"{name.replace('_', ' ').capitalize()} command executed"
+        self.priority = priority
+        self.limit = limit
+        self.timeout = timeout
+        self.components = tuple(components)
+        # Run on the calling thread instead of the scheduler
+        self.inline = inline
+        self.arguments = arguments
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CommandManifest":
+        """Build a manifest from parsed JSON, raising ValueError when it is malformed"""
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+        name, keywords, handler = data.get("name"), data.get("keywords"), data.get("handler")
+        if not isinstance(name, str) or not name:
+            raise ValueError("name must be a non-empty string")
+        if not isinstance(keywords, list) or not keywords or not all(isinstance(k, str) and k for k in keywords):
+            raise ValueError(f"{name}: keywords must be a non-empty list of strings")
+        if not isinstance(handler, str) or not handler:
+            raise ValueError(f"{name}: handler must be a method name or 'module:function'")
+        if data.get("arguments") is not None and ':' not in str(data["arguments"]):
+            raise ValueError(f"{name}: arguments must be 'module:function'")
+        if not all(isinstance(example, str) for example in data.get("examples", [])):
+            raise ValueError(f"{name}: examples must be a list of strings")
+        if not isinstance(data.get("priority", 0), int):
+            raise ValueError(f"{name}: priority must be an integer")
+        if data.get("limit") is not None and (not isinstance(data["limit"], int) or data["limit"] < 1):
+            raise ValueError(f"{name}: limit must be a positive integer")
+        if data.get("timeout") is not None and (not isinstance(data["timeout"], (int, float)) or data["timeout"] <= 0):
+            raise ValueError(f"{name}: timeout must be a positive number of seconds")
+        return cls(**data)
+    
+    @property
+    def module(self) -> Optional[str]:
+        """Module imported for a plugin handler, None for AIVA methods"""
+        return self.handler.partition(':')[0] if ':' in self.handler else None
+
+
+# Built-in categories; plugins registered later under the same name replace them
+BUILTIN_COMMANDS = [
+    CommandManifest("control", COMMAND_KEYWORDS["control"], "handle_control_command", "Commands cancelled",
+                    priority=0, inline=True, examples=INTENT_EXAMPLES["control"]),
+    CommandManifest("performance", COMMAND_KEYWORDS["performance"], "handle_performance_command",
+                    "Performance report given", priority=10, examples=INTENT_EXAMPLES["performance"]),
+    CommandManifest("excel", COMMAND_KEYWORDS["excel"], "handle_excel_command", priority=20,
+                    components=("excel",), examples=INTENT_EXAMPLES["excel"]),
+    CommandManifest("email", COMMAND_KEYWORDS["email"], "handle_email_command", priority=30,
+                    examples=INTENT_EXAMPLES["email"], arguments=parse_email_intent),
+    CommandManifest("system", COMMAND_KEYWORDS["system"], "handle_system_command", priority=40,
+                    examples=INTENT_EXAMPLES["system"]),
+    CommandManifest("web", COMMAND_KEYWORDS["web"], "handle_web_command", priority=50,
+                    examples=INTENT_EXAMPLES["web"]),
+    CommandManifest("utility", COMMAND_KEYWORDS["utility"], "handle_utility_command", priority=60,
+                    examples=INTENT_EXAMPLES["utility"]),
+    CommandManifest("info", COMMAND_KEYWORDS["info"], "handle_info_command", "Information command executed",
+                    priority=70, examples=INTENT_EXAMPLES["info"]),
+    CommandManifest("media", COMMAND_KEYWORDS["media"], "handle_media_command", priority=80,
+                    examples=INTENT_EXAMPLES["media"]),
+    # Placeholder for future integration
+    CommandManifest("smart_home", COMMAND_KEYWORDS["smart_home"], "handle_smart_home_command", priority=90,
+                    examples=INTENT_EXAMPLES["smart_home"])
+]
+
+
+class CommandRegistry:
+    """Command manifests by category, with handlers resolved on first use.
+    
+    Plugins are JSON files in a directory, each holding one manifest or a
+    list of them. Reading them is all startup costs; a plugin's module is
+    imported by handler() the first time its category fires. The keyword
+    router is compiled by router() once every manifest is registered, and
+    kept until another one is.
+    """
+    
+    def __init__(self, manifests: List[CommandManifest] = ()):
+        self.manifests: Dict[str, CommandManifest] = {}
+        self._functions: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._routers: Dict[Tuple[str, ...], IntentRouter] = {}
+        self._routers_lock = threading.Lock()
+        for manifest in manifests:
+            self.register(manifest)
+    
+    def register(self, manifest: CommandManifest):
+        self.manifests[manifest.name] = manifest
+        self._functions.pop(manifest.name, None)
+        self._functions.pop((manifest.name, "arguments"), None)
+        self._routers.clear()
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifests
+    
+    def __getitem__(self, name: str) -> CommandManifest:
+        return self.manifests[name]
+    
+    def load_directory(self, directory: str) -> List[str]:
+        """Register the manifests in directory/*.json and return the problems found.
+        
+        The directory is put on sys.path so handler modules can live next
+        to their manifests.
+        """
+        errors = []
+        path = Path(directory)
+        if not path.is_dir():
+            return errors
+        for manifest_file in sorted(path.glob("*.json")):
+            try:
+                with open(manifest_file, encoding="utf-8") as f:
+                    data = json.load(f)
+                for entry in data if isinstance(data, list) else [data]:
+                    if not isinstance(entry, dict):
+                        raise ValueError("expected an object or a list of objects")
+                    self.register(CommandManifest.from_dict(entry))
+            except (OSError, ValueError, TypeError) as e:
+                errors.append(f"{manifest_file.name}: {e}")
+        if str(path) not in sys.path:
+            sys.path.append(str(path))
+        return errors
+    
+    def ordered(self) -> List[CommandManifest]:
+        """Manifests by priority, then registration order"""
+        return sorted(self.manifests.values(), key=lambda manifest: manifest.priority)
+    
+    def keyword_table(self) -> Dict[str, List[str]]:
+        return {manifest.name: manifest.keywords for manifest in self.ordered()}
+    
+    def router(self, priority: List[str] = None) -> IntentRouter:
+        """The keyword router over every manifest, compiled once per priority order"""
+        key = tuple(priority or ())
+        with self._routers_lock:
+            router = self._routers.get(key)
+            if router is None:
+                router = self._routers[key] = IntentRouter(self.keyword_table(), list(key))
+        return router
+    
+    def examples(self) -> Dict[str, List[str]]:
+        """Training utterances per category for the intent classifier"""
+        return {manifest.name: manifest.examples + manifest.keywords for manifest in self.ordered()}
+    
+    def limits(self) -> Dict[str, int]:
+        return {name: manifest.limit for name, manifest in self.manifests.items() if manifest.limit is not None}
+    
+    def timeouts(self) -> Dict[str, float]:
+        return {name: manifest.timeout for name, manifest in self.manifests.items() if manifest.timeout is not None}
+    
+    def loaded(self, name: str) -> bool:
+        return name in self._functions
+    
+    def handler(self, name: str, assistant):
+        """Return the callable handling command text for a category, importing it on first use"""
+        function = self._functions.get(name)
+        if function is None:
+            manifest = self.manifests[name]
+            with self._lock:
+                function = self._functions.get(name)
+                if function is None:
+                    function = self._resolve(manifest)
+                    self._functions[name] = function
+        if isinstance(function, str):
+            return getattr(assistant, function)
+        return functools.partial(function, assistant)
+    
+    def parse(self, name: str, key: str):
+        """A category's arguments parsed from a normalized command, or None without a parser"""
+        parser = self.manifests[name].arguments
+        if parser is None:
+            return None
+        if isinstance(parser, str):
+            function = self._functions.get((name, "arguments"))
+            if function is None:
+                with self._lock:
+                    function = self._functions.get((name, "arguments"))
+                    if function is None:
+                        function = self._functions[(name, "arguments")] = self._import(parser)
+            parser = function
+        return parser(key)
+    
+    @classmethod
+    def _resolve(cls, manifest: CommandManifest):
+        if manifest.module is None:
+            # An AIVA method, looked up on the assistant
+            return manifest.handler
+        return cls._import(manifest.handler)
+    
+    @staticmethod
+    def _import(reference: str):
+        """The function a "module:function" reference names, importing its module"""
+        module_name, _, attribute = reference.partition(':')
+        with tracer.span("command.load_handler"):
+            target = importlib.import_module(module_name)
+            for part in attribute.split('.'):
+                target = getattr(target, part)
+        return target
+
+# ===== Command Scheduler =====
+class CommandCancelled(BaseException):
+    """Raised in a handler whose command was cancelled or timed out.
+    
+    A BaseException, like KeyboardInterrupt, so the handlers' broad
+    "except Exception" blocks do not swallow it.
+    """
+
+_command_context = threading.local()
+
+def command_sleep(seconds: float):
+    """Sleep inside a command handler, waking early if the command is cancelled"""
+    job = getattr(_command_context, "job", None)
+    if job is None:
+        time.sleep(seconds)
+    elif job.cancel_event.wait(seconds):
+        raise CommandCancelled(job.outcome)
+
+class CommandJob:
+    """A submitted command; future resolves to the handler's success flag"""
+    
+    def __init__(self, seq: int, category: str, command: str, function, timeout: float):
+        self.seq = seq
+        self.category = category
+        self.command = command
+        self.function = function
+        self.timeout = timeout
+        self.future = concurrent.futures.Future()
+        self.cancel_event = threading.Event()
+        # pending, running, done, failed, cancelled or timed out
+        self.outcome = "pending"
+        self.error: Optional[BaseException] = None
+        self.result = False
+        self.response = ""
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+class CommandScheduler:
+    """Runs command handlers on a worker pool instead of the listening thread.
+    
+    Each category has a concurrency limit (one Excel COM session, one
+    browser-driving email at a time); commands beyond the limit wait in a
+    FIFO queue per category instead of being dropped. Jobs can be
+    cancelled, and a watchdog cancels jobs that run past their timeout;
+    handlers notice through command_sleep() or CommandJob.cancel_event.
+    """
+    
+    def __init__(self, logger: AIVALogger, workers: int = 4, limits: Dict[str, int] = None,
+                 default_limit: int = 1, timeouts: Dict[str, float] = None, default_timeout: float = 60.0,
+                 on_queued=None, on_done=None):
+        self.logger = logger
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        # Called with the job when it has to wait / after it finished (before its future resolves)
+        self.on_queued = on_queued
+        self.on_done = on_done
+        self._pool = concurrent.futures.ThreadPoolExecutor(max(1, workers), thread_name_prefix="AIVACommand")
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, "collections.deque[CommandJob]"] = collections.defaultdict(collections.deque)
+        self._running: Dict[str, List[CommandJob]] = collections.defaultdict(list)
+        # Watchdog: heap of (deadline, seq, job) for running jobs
+        self._deadlines: List[Tuple[float, int, CommandJob]] = []
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._watchdog = threading.Thread(target=self._watch, name="AIVACommandWatchdog", daemon=True)
+        self._watchdog.start()
+    
+    def submit(self, category: str, command: str, function) -> CommandJob:
+        """Queue function(command) under category's concurrency limit"""
+        timeout = self.timeouts.get(category, self.default_timeout)
+        job = CommandJob(next(self._sequence), category, command, function, timeout)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("command scheduler is shut down")
+            self._pending[category].append(job)
+            self._dispatch(category)
+            queued = job.outcome == "pending"
+        if queued and self.on_queued:
+            self.on_queued(job)
+        return job
+    
+    def cancel(self, job: CommandJob, reason: str = "cancelled") -> bool:
+        """Cancel a pending job outright, or signal a running one to stop"""
+        with self._lock:
+            if job.outcome == "pending":
+                self._pending[job.category].remove(job)
+                job.outcome = reason
+            elif job.outcome == "running":
+                job.outcome = reason
+                job.cancel_event.set()
+                return True
+            else:
+                return False
+        self._finish(job, False)
+        return True
+    
+    def cancel_latest(self) -> Optional[CommandJob]:
+        """Cancel the most recently submitted unfinished job"""
+        jobs = self.jobs()
+        if jobs and self.cancel(jobs[-1]):
+            return jobs[-1]
+        return None
+    
+    def cancel_all(self) -> int:
+        return sum(self.cancel(job) for job in self.jobs())
+    
+    def jobs(self) -> List[CommandJob]:
+        """Unfinished jobs in submission order"""
+        with self._lock:
+            jobs = [job for jobs in self._running.values() for job in jobs]
+            jobs += [job for queue_ in self._pending.values() for job in queue_]
+        return sorted(jobs, key=lambda job: job.seq)
+    
+    def shutdown(self, cancel: bool = True, wait: bool = True):
+        """Stop accepting commands; cancel or finish the queued ones"""
+        if cancel:
+            self.cancel_all()
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._pool.shutdown(wait=wait)
+    
+    def _dispatch(self, category: str):
+        # Called with the lock held
+        pending = self._pending[category]
+        running = self._running[category]
+        while pending and len(running) < self.limits.get(category, self.default_limit):
+            job = pending.popleft()
+            job.outcome = "running"
+            running.append(job)
+            self._pool.submit(self._run, job)
+    
+    def _run(self, job: CommandJob):
+        job.started = time.perf_counter()
+        tracer.record("command.queue_wait", job.started - job.submitted)
+        if job.timeout > 0:
+            with self._lock:
+                heapq.heappush(self._deadlines, (time.monotonic() + job.timeout, job.seq, job))
+                self._wakeup.notify()
+        
+        _command_context.job = job
+        result = False
+        try:
+            with tracer.span(f"handler.{job.category}"):
+                result = job.function(job.command)
+        except CommandCancelled:
+            pass
+        except Exception as e:
+            job.error = e
+            self.logger.error(f"{job.category} command error: {e}")
+        finally:
+            _command_context.job = None
+        
+        with self._lock:
+            self._running[job.category].remove(job)
+            if job.outcome == "running":
+                job.outcome = "failed" if job.error is not None else "done"
+            self._dispatch(job.category)
+        self._finish(job, result)
+    
+    def _finish(self, job: CommandJob, result):
+        job.finished = time.perf_counter()
+        tracer.record("command.completed", job.finished - job.submitted)
+        job.result = bool(result) and job.outcome == "done"
+        if self.on_done:
+            try:
+                self.on_done(job)
+            except Exception as e:
+                self.logger.error(f"Command completion error: {e}")
+        job.future.set_result(job.result)
+    
+    def _watch(self):
+        with self._lock:
+            while not self._closed:
+                now = time.monotonic()
+                while self._deadlines and (self._deadlines[0][0] <= now or self._deadlines[0][2].outcome != "running"):
+                    _, _, job = heapq.heappop(self._deadlines)
+                    if job.outcome == "running":
+                        job.outcome = "timed out"
+                        job.cancel_event.set()
+                        self.logger.warning(f"Command timed out after {job.timeout:g}s: {job.command}")
+                timeout = self._deadlines[0][0] - now if self._deadlines else None
+                self._wakeup.wait(timeout)
+
+# ===== Headless Replay =====
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+class CallRecorder:
+    """Stand-in for a side-effecting module or object that records calls.
+    
+    Attribute access returns another recorder, so chains such as
+    excel.Workbooks.Add() are recorded as "win32com.client.Dispatch().Workbooks.Add".
+    """
+    
+    def __init__(self, name: str, calls: List[Tuple[str, tuple, dict]]):
+        self._name = name
+        self._calls = calls
+    
+    def __getattr__(self, attr: str) -> "CallRecorder":
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return CallRecorder(f"{self._name}.{attr}", self._calls)
+    
+    def __call__(self, *args, **kwargs) -> "CallRecorder":
+        self._calls.append((self._name, args, kwargs))
+        return CallRecorder(f"{self._name}()", self._calls)
+    
+    def __repr__(self) -> str:
+        return f"<CallRecorder {self._name}>"
+
+# Module globals and lazily imported modules that act on the desktop
+SIDE_EFFECT_GLOBALS = ["webbrowser", "subprocess"]
+SIDE_EFFECT_MODULES = ["pyautogui", "win32com", "win32com.client"]
+
+@contextlib.contextmanager
+def recording_side_effects(calls: List[Tuple[str, tuple, dict]]):
+    """Replace browser, GUI automation, COM and process calls with recorders"""
+    module_globals = globals()
+    saved_globals = {name: module_globals[name] for name in SIDE_EFFECT_GLOBALS}
+    saved_modules = {name: sys.modules.get(name) for name in SIDE_EFFECT_MODULES}
+    for name in SIDE_EFFECT_GLOBALS:
+        module_globals[name] = CallRecorder(name, calls)
+    for name in SIDE_EFFECT_MODULES:
+        # lazy_import() finds these in sys.modules and never imports the real ones
+        sys.modules[name] = CallRecorder(name, calls)
+    try:
+        yield calls
+    finally:
+        module_globals.update(saved_globals)
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+class HeadlessVoiceManager:
+    """Voice manager without microphone or TTS: records what would be spoken"""
+    
+    def __init__(self, logger: AIVALogger):
+        self.logger = logger
+        self.spoken: "collections.Counter[str]" = collections.Counter()
+        self.is_listening = False
+    
+    def speak(self, text: str, interrupt: bool = False,
+              priority: int = SpeechQueue.NORMAL) -> concurrent.futures.Future:
+        self.spoken[text] += 1
+        self.logger.debug("Spoke: %s", text)
+        future = concurrent.futures.Future()
+        future.set_result(True)
+        return future
+    
+    def listen(self, timeout: int = None, wake_word_mode: bool = False) -> str:
+        return ""
+    
+    def stop_listening(self):
+        self.is_listening = False
+
+class BatchRunner:
+    """Drives AIVA.process_command from recorded commands instead of a microphone.
+    
+    Input is plain text (one command per line, # comments) or JSONL with a
+    "command" field and an optional "expected" category to check routing.
+    """
+    
+    def __init__(self, assistant: "AIVA"):
+        self.assistant = assistant
+        self.calls: List[Tuple[str, tuple, dict]] = []
+    
+    @staticmethod
+    def read_commands(lines) -> List[Dict]:
+        commands = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                commands.append({"command": record["command"], "expected": record.get("expected")})
+            else:
+                commands.append({"command": line, "expected": None})
+        return commands
+    
+    def run(self, commands: List[Dict]) -> Dict:
+        """Process every command with side effects recorded; returns the report"""
+        latencies: Dict[str, List[float]] = collections.defaultdict(list)
+        outcomes: Dict[str, Dict[str, int]] = collections.defaultdict(lambda: {"success": 0, "failed": 0})
+        mismatches = []
+        checked = 0
+        
+        with recording_side_effects(self.calls):
+            start = time.perf_counter()
+            for record in commands:
+                command_start = time.perf_counter()
+                result = self.assistant.process_command(record["command"], wait=True)
+                elapsed = time.perf_counter() - command_start
+                
+                category = result["category"] or "unrouted"
+                latencies[category].append(elapsed)
+                outcomes[category]["success" if result["success"] else "failed"] += 1
+                if record["expected"] is not None:
+                    checked += 1
+                    if record["expected"] != category:
+                        mismatches.append({"command": record["command"], "expected": record["expected"],
+                                           "routed": category})
+            processed = time.perf_counter() - start
+            # Include writing the command log, which happens behind the queue
+            self.assistant.database.flush()
+            elapsed = time.perf_counter() - start
+        
+        categories = {}
+        for category, values in sorted(latencies.items()):
+            values.sort()
+            categories[category] = {
+                "count": len(values),
+                **outcomes[category],
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000
+            }
+        
+        side_effects = collections.Counter(name for name, _, _ in self.calls)
+        spoken = getattr(self.assistant.voice_manager, "spoken", collections.Counter())
+        return {
+            "commands": len(commands),
+            "seconds": elapsed,
+            "process_seconds": processed,
+            "throughput": len(commands) / processed if processed else 0.0,
+            "categories": categories,
+            "routing_checked": checked,
+            "routing_accuracy": (checked - len(mismatches)) / checked if checked else None,
+            "mismatches": mismatches,
+            "side_effects": dict(side_effects.most_common()),
+            "spoken": dict(spoken.most_common(10)),
+            "stages": {
+                name: {"count": histogram.count, "p50_ms": histogram.percentile(0.50) * 1000,
+                       "p95_ms": histogram.percentile(0.95) * 1000, "p99_ms": histogram.percentile(0.99) * 1000}
+                for name, histogram in tracer.snapshot().items()
+            }
+        }
+    
+    @staticmethod
+    def format_report(report: Dict, max_mismatches: int = 20) -> str:
+        lines = [
+            f"{report['commands']:,} commands in {report['process_seconds']:.2f} s "
+            f"({report['throughput']:,.0f}/s), command log flushed after {report['seconds']:.2f} s",
+            "",
+            f"{'category':<12} {'count':>8} {'success':>8} {'failed':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        ]
+        for category, stats in report["categories"].items():
+            lines.append(f"{category:<12} {stats['count']:>8,} {stats['success']:>8,} {stats['failed']:>8,} "
+                         f"{stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+        
+        if report["routing_checked"]:
+            lines += ["", f"Routing: {report['routing_accuracy']:.1%} of {report['routing_checked']:,} "
+                          f"commands routed as expected"]
+            for mismatch in report["mismatches"][:max_mismatches]:
+                lines.append(f"  {mismatch['command']!r}: expected {mismatch['expected']}, "
+                             f"routed {mismatch['routed']}")
+        
+        if report["side_effects"]:
+            lines += ["", "Recorded side effects:"]
+            lines += [f"  {name:<40} {count:>8,}" for name, count in report["side_effects"].items()]
+        
+        if report["spoken"]:
+            lines += ["", "Most frequent responses:"]
+            lines += [f"  {count:>8,}  {text}" for text, count in report["spoken"].items()]
+        
+        if report["stages"]:
+            lines += ["", f"{'stage':<32} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+            lines += [f"{name:<32} {stats['count']:>8,} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+                      f"{stats['p99_ms']:>9.3f}" for name, stats in report["stages"].items()]
+        return "\n".join(lines)
+
+# ===== Main AIVA Class =====
+class AIVA:
+    # Fixed responses, prewarmed in the speech cache at startup
+    FIXED_PHRASES = [
+        "Hello! I am AIVA, your Advanced AI Voice Assistant. How can I help you today?",
+        "Would you like to enable continuous listening mode? Say yes or no.",
+        "Continuous mode enabled. Just say 'Hey AIVA' to get my attention.",
+        "Goodbye! Have a great day.",
+        "I'm sorry, I don't understand that command. You can ask me about my capabilities by saying 'what can you do'.",
+        "I encountered an error processing that command.",
+        "I couldn't open Excel. Please make sure Microsoft Excel is installed.",
+        "Excel is ready.",
+        "Cancelled.",
+        "There's nothing to cancel."
+    ]
+    # Whole words only: "cancel that call" cancels one command, not all
+    CANCEL_ALL = re.compile(r"\b(all|everything)\b")
+    
+    def __init__(self, config: AIVAConfig = None, components: Dict = None):
+        # Initialize components
+        with startup_profiler.measure("config"):
+            self.config = config or AIVAConfig()
+            self.logger = AIVALogger(self.config)
+            for error in self.config.errors:
+                self.logger.error(f"Configuration error (default used): {error}")
+        
+        # Components are built on first use; those listed under
+        # STARTUP/warm_up start building on background threads right away
+        self._component_factories = {
+            "database": self.create_database,
+            "voice": self.create_voice_manager,
+            "excel": lambda: ExcelManager(self.logger, self.create_excel_backend()),
+            "email": lambda: EmailManager(self.config, self.logger, self.database),
+            "web": lambda: WebSearchManager(self.logger),
+            "system": lambda: SystemMonitor(self.logger, self.create_system_sampler())
+        }
+        # Replacement factories, e.g. a headless voice manager for batch runs
+        self._component_factories.update(components or {})
+        self._components: Dict[str, concurrent.futures.Future] = {}
+        self._components_lock = threading.Lock()
+        for name in self.config.settings.STARTUP.warm_up:
+            self._warm_up(name)
+        
+        # Command categories: built-ins plus plugin manifests; plugin code loads on first use
+        with startup_profiler.measure("commands"):
+            self.commands = CommandRegistry(BUILTIN_COMMANDS)
+            for error in self.commands.load_directory(self.config.settings.PLUGINS.directory):
+                self.logger.error(f"Plugin manifest error: {error}")
+            self.utterances = self.create_utterance_cache()
+        # Router and classifier grow with the plugins' keywords and examples;
+        # both are built once, from every manifest, on background threads
+        self._router = warm_up("router", self.create_router)
+        self._classifier = warm_up("classifier", self.create_intent_classifier)
+        self.config.subscribe(self._on_config_change)
+        
+        # Handlers run on the scheduler so slow ones do not block listening;
+        # configured limits and timeouts override the manifests' own
+        settings = self.config.settings.SCHEDULER
+        limits = self.commands.limits()
+        limits.update(settings.limits)
+        timeouts = self.commands.timeouts()
+        timeouts.update(settings.timeouts)
+        self.scheduler = CommandScheduler(
+            self.logger,
+            workers=settings.workers,
+            limits=limits,
+            default_limit=settings.default_limit,
+            timeouts=timeouts,
+            default_timeout=settings.timeout,
+            on_queued=self._command_queued,
+            on_done=self._command_done
+        )
+        
+        # Application state
+        self.is_running = False
+        self.conversation_mode = False
+        
+        # Stage latencies are saved to the metrics table periodically
+        tracer.enabled = self.config.settings.METRICS.enabled
+        self._metrics_stop = threading.Event()
+        if tracer.enabled:
+            threading.Thread(target=self._metrics_loop, name="AIVAMetrics", daemon=True).start()
+        
+        self.logger.info("AIVA initialized successfully")
+    
+    def create_database(self) -> AIVADatabase:
+        settings = self.config.settings.DATABASE
+        return AIVADatabase(
+            settings.path,
+            flush_interval=settings.flush_interval,
+            batch_size=settings.batch_size,
+            template_check_interval=settings.template_check_interval
+        )
+    
+    def create_system_sampler(self) -> SystemSampler:
+        settings = self.config.settings.SYSTEM_MONITOR
+        return SystemSampler(
+            self.logger,
+            interval=settings.sample_interval,
+            history_seconds=settings.history_minutes * 60,
+            process_interval=settings.process_interval,
+            disk_path=settings.disk_path
+        )
+    
+    def create_excel_backend(self) -> ExcelBackend:
+        settings = self.config.settings.APPLICATIONS
+        backend = settings.excel_backend
+        if backend == 'auto':
+            # Drive Excel through COM on Windows with pywin32; otherwise write files
+            com = sys.platform == 'win32' and importlib.util.find_spec("win32com") is not None
+            backend = 'com' if com else 'xlsx'
+        if backend == 'xlsx':
+            if not XlsxExcelBackend.available():
+                self.logger.warning("Excel commands need XlsxWriter on this system: pip install xlsxwriter")
+            return XlsxExcelBackend(settings.excel_output_dir)
+        return ComExcelBackend()
+    
+    def create_router(self) -> IntentRouter:
+        return self.commands.router(self.config.settings.ROUTING.priority)
+    
+    def create_intent_classifier(self) -> Optional[IntentClassifier]:
+        if not self.config.settings.ROUTING.classifier:
+            return None
+        try:
+            return IntentClassifier(self.commands.examples())
+        except RuntimeError as e:
+            self.logger.warning(f"Intent classifier disabled: {e}")
+            return None
+    
+    def create_utterance_cache(self) -> UtteranceCache:
+        settings = self.config.settings.UTTERANCE_CACHE
+        return UtteranceCache(settings.size, settings.ttl, settings.dedup_window_ms / 1000,
+                              settings.uncached, settings.repeatable)
+    
+    def _on_config_change(self, settings, previous):
+        """Apply utterance cache settings from a reloaded configuration file"""
+        cache = settings.UTTERANCE_CACHE
+        if cache != previous.UTTERANCE_CACHE:
+            self.utterances.configure(cache.size, cache.ttl, cache.dedup_window_ms / 1000,
+                                      cache.uncached, cache.repeatable)
+        if settings.ROUTING != previous.ROUTING:
+            # Cached categories were resolved with the old thresholds
+            self.utterances.clear()
+        if settings.ROUTING.priority != previous.ROUTING.priority:
+            self._router = warm_up("router", self.create_router)
+        if settings.ROUTING.classifier != previous.ROUTING.classifier:
+            self._classifier = warm_up("classifier", self.create_intent_classifier)
+    
+    def create_voice_manager(self) -> VoiceManager:
+        voice_manager = VoiceManager(self.config, self.logger)
+        voice_manager.prewarm_speech(self.FIXED_PHRASES)
+        return voice_manager
+    
+    def _warm_up(self, name: str):
+        """Start building a component on a background thread, unless it was already started"""
+        if name in self._component_factories:
+            with self._components_lock:
+                if name not in self._components:
+                    self._components[name] = warm_up(name, self._component_factories[name])
+    
+    def _component(self, name: str):
+        """Return a component, building it on first use"""
+        with self._components_lock:
+            future = self._components.get(name)
+            build = future is None
+            if build:
+                future = self._components[name] = concurrent.futures.Future()
+        
+        if build:
+            try:
+                with startup_profiler.measure(name):
+                    future.set_result(self._component_factories[name]())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+    
+    def _built(self, name: str) -> bool:
+        future = self._components.get(name)
+        return future is not None and future.done() and future.exception() is None
+    
+    @property
+    def router(self) -> IntentRouter:
+        return self._router.result()
+    
+    @property
+    def classifier(self) -> Optional[IntentClassifier]:
+        return self._classifier.result()
+    
+    @property
+    def database(self) -> AIVADatabase:
+        return self._component("database")
+    
+    @property
+    def voice_manager(self) -> VoiceManager:
+        return self._component("voice")
+    
+    @property
+    def excel_manager(self) -> ExcelManager:
+        return self._component("excel")
+    
+    @property
+    def email_manager(self) -> EmailManager:
+        return self._component("email")
+    
+    @property
+    def web_search(self) -> WebSearchManager:
+        return self._component("web")
+    
+    @property
+    def system_monitor(self) -> SystemMonitor:
+        return self._component("system")
+    
+    def _metrics_loop(self):
+        # Re-read every round so a reloaded interval applies from the next flush
+        while not self._metrics_stop.wait(self.config.settings.METRICS.flush_interval):
+            self.flush_metrics()
+    
+    def flush_metrics(self):
+        """Save stage latencies recorded since the last flush"""
+        deltas = tracer.drain()
+        cache_counts = self.utterances.drain()
+        try:
+            self.database.save_metrics(deltas)
+            self.database.save_utterance_cache_stats(cache_counts)
+        except sqlite3.Error as e:
+            tracer.undrain(deltas)
+            self.utterances.undrain(cache_counts)
+            self.logger.error(f"Metrics flush error: {e}")
+        
+        prometheus_file = self.config.settings.METRICS.prometheus_file
+        if prometheus_file:
+            # For the node_exporter textfile collector: write, then rename into place
+            try:
+                temp_file = f"{prometheus_file}.tmp"
+                with open(temp_file, 'w') as f:
+                    f.write(Tracer.prometheus(tracer.snapshot()))
+                    f.write(self.database.templates.prometheus())
+                    f.write(self.utterances.prometheus())
+                os.replace(temp_file, prometheus_file)
+            except OSError as e:
+                self.logger.error(f"Prometheus export error: {e}")
+    
+    def performance_report(self, since: str = None) -> str:
+        """Stage latency and utterance cache report over everything saved since a UTC timestamp"""
+        self.flush_metrics()
+        report = Tracer.report(self.database.get_metrics(since))
+        cache_stats = self.database.get_utterance_cache_stats(since)
+        if cache_stats:
+            report += "\n\nUtterance cache:\n" + UtteranceCache.report(cache_stats)
+        return report
+    
+    def report_startup(self):
+        """Log the startup profile and check time to listening against the target"""
+        ready = startup_profiler.mark("listening ready")
+        self.logger.info(startup_profiler.report())
+        target = self.config.settings.STARTUP.listening_target_ms / 1000
+        if ready > target:
+            self.logger.warning(f"Listening ready after {ready * 1000:.0f} ms, target {target * 1000:.0f} ms")
+    
+    def start(self):
+        """Start AIVA assistant"""
+        self.is_running = True
+        # Voice and email settings follow edits to the configuration file
+        self.config.watch(self.logger)
+        # Everything needed to listen: the voice manager and its microphone
+        self.voice_manager.microphone
+        self.report_startup()
+        self.voice_manager.speak("Hello! I am AIVA, your Advanced AI Voice Assistant. How can I help you today?")
+        
+        try:
+            # Check if continuous mode is requested
+            self.voice_manager.speak("Would you like to enable continuous listening mode? Say yes or no.")
+            response = self.voice_manager.listen()
+            
+            if "yes" in response:
+                self.voice_manager.speak("Continuous mode enabled. Just say 'Hey AIVA' to get my attention.")
+                self.continuous_mode()
+            else:
+                self.command_mode()
+                
+        except KeyboardInterrupt:
+            self.shutdown()
+    
+    def continuous_mode(self):
+        """Run in continuous listening mode"""
+        self.voice_manager.continuous_listen(self.process_command)
+    
+    def command_mode(self):
+        """Run in traditional command mode"""
+        while self.is_running:
+            try:
+                command = self.voice_manager.listen()
+                if command:
+                    if any(word in command for word in ["exit", "stop", "goodbye", "quit"]):
+                        self.shutdown()
+                        break
+                    self.process_command(command)
+            except KeyboardInterrupt:
+                self.shutdown()
+                break
+    
+    def shutdown(self):
+        """Stop AIVA and release resources"""
+        self.is_running = False
+        self._metrics_stop.set()
+        self.config.stop()
+        self.voice_manager.stop_listening()
+        self.scheduler.shutdown(cancel=True)
+        self.voice_manager.speak("Goodbye! Have a great day.", interrupt=True)
+        self.voice_manager.speech.close()
+        # Components never used were never built; nothing to release
+        if self._built("excel"):
+            self.excel_manager.close()
+        if self._built("system"):
+            self.system_monitor.sampler.stop()
+        if self._built("database"):
+            self.flush_metrics()
+            self.database.close()
+        self.logger.info("AIVA shut down")
+    
+    @tracer.traced("command.total")
+    def process_command(self, command: str, wait: bool = False) -> Dict:
+        """Enhanced command processing with comprehensive features.
+        
+        Handlers run on the command scheduler, so this returns as soon as
+        the command is queued: success is None and the result is logged
+        when the job finishes. wait=True blocks until then.
+        """
+        self.logger.info("Processing command: %s", command)
+        category = None
+        job = None
+        
+        try:
+            success = None
+            response = ""
+            
+            with tracer.span("command.route"):
+                key, category, arguments = self.route_utterance(command)
+            if self.utterances.duplicate(key, category):
+                self.logger.info("Suppressed repeated command: %s", command)
+                return {"category": category, "success": False, "response": "Duplicate suppressed", "job": None}
+            
+            manifest = self.commands.manifests.get(category)
+            if manifest is not None and manifest.inline:
+                success = self.run_handler(category, command, arguments)
+                response = manifest.response
+                self.database.log_command(command, success, response, category)
+            elif manifest is not None:
+                # Components the handler needs build while the command waits its turn
+                for name in manifest.components:
+                    self._warm_up(name)
+                job = self.scheduler.submit(category, command,
+                                            functools.partial(self.run_handler, category, arguments=arguments))
+                if wait:
+                    success = job.future.result()
+                    response = job.response
+            else:
+                self.voice_manager.speak("I'm sorry, I don't understand that command. You can ask me about my capabilities by saying 'what can you do'.")
+                success = False
+                response = "Command not recognized"
+                self.database.log_command(command, success, response, category)
+            
+        except Exception as e:
+            self.logger.error(f"Command processing error: {e}")
+            self.voice_manager.speak("I encountered an error processing that command.")
+            success, response = False, str(e)
+            self.database.log_command(command, success, response, category)
+        
+        return {"category": category, "success": success, "response": response, "job": job}
+    
+    def _command_queued(self, job: CommandJob):
+        self.voice_manager.speak(f"I'll do that after the current {job.category.replace('_', ' ')} task.")
+    
+    def _command_done(self, job: CommandJob):
+        """Log a finished command and tell the user when it did not complete"""
+        if job.outcome == "done":
+            job.response = self.commands[job.category].response
+        elif job.outcome == "failed":
+            job.response = str(job.error)
+            self.voice_manager.speak("I encountered an error processing that command.")
+        elif job.outcome == "timed out":
+            job.response = f"Timed out after {job.timeout:g} seconds"
+            self.voice_manager.speak(f"The {job.category.replace('_', ' ')} command took too long, so I stopped it.")
+        else:
+            job.response = "Cancelled"
+        self.database.log_command(job.command, job.result, job.response, job.category)
+    
+    def route(self, command: str) -> Optional[str]:
+        """Category for a command: keywords first, the intent classifier for ties and misses"""
+        settings = self.config.settings.ROUTING
+        return self.router.resolve(command, self.classifier, settings.min_confidence, settings.margin)
+    
+    def route_utterance(self, command: str) -> Tuple[str, Optional[str], object]:
+        """Normalized command, its category and arguments, reusing those of a recently heard utterance"""
+        key = UtteranceCache.normalize(command)
+        if self.config.settings.UTTERANCE_CACHE.enabled:
+            cached = self.utterances.get(key)
+            if cached is not UtteranceCache.MISS:
+                return (key, *cached)
+        category = self.route(command)
+        arguments = self.commands.parse(category, key) if category in self.commands else None
+        if self.config.settings.UTTERANCE_CACHE.enabled:
+            self.utterances.put(key, category, arguments)
+        return key, category, arguments
+    
+    def run_handler(self, category: str, command: str, arguments=None) -> bool:
+        """Run a category's handler, importing a plugin's module the first time (on the worker thread)"""
+        handler = self.commands.handler(category, self)
+        if self.commands[category].arguments is None:
+            return handler(command)
+        return handler(command, arguments)
+    
+    # Command category checkers
+    @tracer.traced("route.is_excel")
+    def is_excel_command(self, command: str) -> bool:
+        return "excel" in self.router.match(command)
+    
+    @tracer.traced("route.is_email")
+    def is_email_command(self, command: str) -> bool:
+        return "email" in self.router.match(command)
+    
+    @tracer.traced("route.is_system")
+    def is_system_command(self, command: str) -> bool:
+        return "system" in self.router.match(command)
+    
+    @tracer.traced("route.is_web")
+    def is_web_command(self, command: str) -> bool:
+        return "web" in self.router.match(command)
+    
+    @tracer.traced("route.is_utility")
+    def is_utility_command(self, command: str) -> bool:
+        return "utility" in self.router.match(command)
+    
+    @tracer.traced("route.is_info")
+    def is_info_command(self, command: str) -> bool:
+        return "info" in self.router.match(command)
+    
+    @tracer.traced("route.is_media")
+    def is_media_command(self, command: str) -> bool:
+        return "media" in self.router.match(command)
+    
+    @tracer.traced("route.is_smart_home")
+    def is_smart_home_command(self, command: str) -> bool:
+        return "smart_home" in self.router.match(command)
+    
+    @tracer.traced("route.is_control")
+    def is_control_command(self, command: str) -> bool:
+        return "control" in self.router.match(command)
+    
+    @tracer.traced("route.is_performance")
+    def is_performance_command(self, command: str) -> bool:
+        return "performance" in self.router.match(command)
+    
+    # Command handlers (implementations)
+    def handle_control_command(self, command: str) -> bool:
+        """Cancel the last queued or running command, or all of them"""
+        if self.CANCEL_ALL.search(command.lower()):
+            cancelled = self.scheduler.cancel_all()
+        else:
+            cancelled = self.scheduler.cancel_latest() is not None
+        self.voice_manager.speak("Cancelled." if cancelled else "There's nothing to cancel.")
+        return bool(cancelled)
+    
+    def handle_performance_command(self, command: str) -> bool:
+        """Report where time goes between speaking and acting, this session"""
+        histograms = tracer.snapshot()
+        commands = histograms.get("command.total")
+        if commands is None:
+            self.voice_manager.speak("I don't have any performance data yet.")
+            return True
+        
+        self.logger.info("Performance report:\n%s", Tracer.report(histograms))
+        # The end-to-end totals contain the other stages
+        stages = [(name, histogram.percentile(0.95)) for name, histogram in histograms.items()
+                  if name not in ("command.total", "voice.listen")]
+        slowest = sorted(stages, key=lambda stage: stage[1], reverse=True)[:3]
+        summary = ", ".join(f"{name.replace('.', ' ').replace('_', ' ')} {spoken_duration(seconds)}"
+                            for name, seconds in slowest)
+        self.voice_manager.speak(f"Over {commands.count} commands, the slowest stages at the 95th "
+                                 f"percentile were {summary}.")
+        return True
+    
+    def handle_excel_command(self, command: str) -> bool:
+        """Handle Excel-related commands"""
+        try:
+            if not self.excel_manager.initialize():
+                self.voice_manager.speak("I couldn't open Excel. Please make sure Microsoft Excel is installed.")
+                return False
+            
+            self.voice_manager.speak("Excel is ready.")
+            return True
+        except Exception as e:
+            self.logger.error(f"Excel command error: {e}")
+            return False
+
+# ===== Entry Point =====
+def main(argv: List[str] = None) -> int:
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="AIVA - AI Voice Assistant")
+    parser.add_argument("--config", default="config/aiva_config.ini", help="configuration file")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run commands from a text or JSONL file ('-' for stdin) without audio, "
+                             "recording side effects instead of performing them")
+    parser.add_argument("--db", help="database path for this run (e.g. a scratch file for batch runs)")
+    parser.add_argument("--log-level", help="override LOGGING/level (batch runs default to WARNING)")
+    parser.add_argument("--json", action="store_true", help="print the batch report as JSON")
+    parser.add_argument("--metrics", action="store_true", help="print the saved stage latency report and exit")
+    parser.add_argument("--prometheus", action="store_true",
+                        help="print saved stage latencies in Prometheus text format and exit")
+    parser.add_argument("--since", help="with --metrics/--prometheus: only intervals since this UTC timestamp")
+    args = parser.parse_args(argv)
+    
+    config = AIVAConfig(args.config)
+    if args.db:
+        config.set('DATABASE', 'path', args.db)
+    if args.log_level or args.batch:
+        config.set('LOGGING', 'level', (args.log_level or "WARNING").upper())
+    
+    if args.metrics or args.prometheus:
+        config.set('STARTUP', 'warm_up', 'database')
+        assistant = AIVA(config)
+        if args.metrics:
+            print(assistant.performance_report(args.since))
+        else:
+            print(Tracer.prometheus(assistant.database.get_metrics(args.since)), end="")
+        assistant.database.close()
+        return 0
+    
+    if not args.batch:
+        AIVA(config).start()
+        return 0
+    
+    # No microphone or speech engine; nothing else needs warming up. Recorded
+    # commands arrive back to back, so repeats are not listening glitches
+    config.set('STARTUP', 'warm_up', 'database')
+    config.set('UTTERANCE_CACHE', 'dedup_window_ms', '0')
+    assistant = AIVA(config, components={"voice": lambda: HeadlessVoiceManager(assistant.logger)})
+    if args.batch == "-":
+        commands = BatchRunner.read_commands(sys.stdin)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            commands = BatchRunner.read_commands(f)
+    
+    report = BatchRunner(assistant).run(commands)
+    assistant.flush_metrics()
+    assistant.database.close()
+    print(json.dumps(report, indent=2) if args.json else BatchRunner.format_report(report))
+    # Non-zero when expected routes were given and any of them differ
+    return 1 if report["mismatches"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Benchmark: startup and routing cost as plugin command categories are added.
+
+Writes N synthetic plugin manifests (four keywords each, one handler
+module per manifest) to a temporary directory, then measures loading the
+manifests (the startup cost) and compiling the router, which AIVA does
+on a background thread, commands routed per second compared with the
+legacy per-category keyword chain, and the one-off import when a plugin
+first fires. No plugin module is imported at startup.
+Run from the repository root:
+    python benchmarks/bench_command_registry.py [intents ...]
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import BUILTIN_COMMANDS, CommandRegistry
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qui", "dro"]
+FILLER = ["please", "could you", "now", "for me", "the", "with", "and then", "quickly"]
+
+
+def words():
+    """Distinct made-up words, so keyword overlap between intents stays low"""
+    for length in itertools.count(3):
+        for parts in itertools.product(SYLLABLES, repeat=length):
+            yield "".join(parts)
+
+
+def write_plugins(directory, count):
+    vocabulary = words()
+    intents = []
+    for index in range(count):
+        name = f"intent_{index}"
+        keywords = [next(vocabulary), next(vocabulary), f"{next(vocabulary)} {next(vocabulary)}", next(vocabulary)]
+        with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": name, "keywords": keywords, "handler": f"bench_plugin_{index}:handle",
+                       "priority": 100 + index}, f)
+        with open(os.path.join(directory, f"bench_plugin_{index}.py"), "w", encoding="utf-8") as f:
+            f.write("def handle(assistant, command):\n    return True\n")
+        intents.append((name, keywords))
+    return intents
+
+
+def commands(intents, count=200, seed=7):
+    """Commands for random intents (one in five matches nothing)"""
+    rng = random.Random(seed)
+    generated = []
+    for _ in range(count):
+        parts = rng.sample(FILLER, 3)
+        if rng.random() > 0.2:
+            parts.insert(1, rng.choice(rng.choice(intents)[1]))
+        generated.append(" ".join(parts))
+    return generated
+
+
+def legacy_route(table, priority, command):
+    """One substring check per keyword per category, as the is_*_command chain did"""
+    command = command.lower()
+    for category in priority:
+        if any(keyword in command for keyword in table[category]):
+            return category
+    return None
+
+
+def routes_per_second(route, inputs, minimum=0.3):
+    rounds, start = 0, time.perf_counter()
+    while True:
+        for command in inputs:
+            route(command)
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= minimum:
+            return rounds * len(inputs) / elapsed
+
+
+def run(count):
+    with tempfile.TemporaryDirectory() as directory:
+        intents = write_plugins(directory, count)
+        modules_before = set(sys.modules)
+        
+        start = time.perf_counter()
+        registry = CommandRegistry(BUILTIN_COMMANDS)
+        errors = registry.load_directory(directory)
+        startup = time.perf_counter() - start
+        assert not errors, errors
+        start = time.perf_counter()
+        router = registry.router()
+        build = time.perf_counter() - start
+        assert registry.router() is router
+        imported = sum(1 for name in set(sys.modules) - modules_before if name.startswith("bench_plugin_"))
+        
+        inputs = commands(intents)
+        table, priority = registry.keyword_table(), router.priority
+        for command in inputs:
+            assert router.route(command) == legacy_route(table, priority, command), command
+        legacy = routes_per_second(lambda command: legacy_route(table, priority, command), inputs)
+        routed = routes_per_second(router.route, inputs)
+        
+        start = time.perf_counter()
+        registry.handler(intents[-1][0], None)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        registry.handler(intents[-1][0], None)
+        cached = time.perf_counter() - start
+        sys.path.remove(directory)
+        return startup, build, imported, legacy, routed, first, cached
+
+
+def main(counts):
+    print(f"{'intents':>8} {'startup ms':>11} {'router ms':>10} {'imported':>9} {'legacy /s':>11} {'router /s':>11} "
+          f"{'first fire ms':>14} {'cached us':>10}")
+    for count in counts:
+        startup, build, imported, legacy, routed, first, cached = run(count)
+        print(f"{count:>8} {startup * 1000:>11.1f} {build * 1000:>10.1f} {imported:>9} {legacy:>11,.0f} "
+              f"{routed:>11,.0f} {first * 1000:>14.2f} {cached * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 50, 100, 500])
@@ -0,0 +1,57 @@
+"""Benchmark: logging commands with a connection per call vs AIVADatabase.
+
+Run from the repository root:
+    python benchmarks/bench_database.py [count]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import AIVADatabase
+
+
+def legacy_log_command(db_path, command, success=True, response=""):
+    """The original connect/insert/commit/close path"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO command_history (command, success, response) VALUES (?, ?, ?)",
+        (command, success, response)
+    )
+    conn.commit()
+    conn.close()
+
+
+def main(count=100000):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        AIVADatabase(legacy_path).close()
+        # Restore the rollback journal the original code ran with
+        sqlite3.connect(legacy_path).execute("PRAGMA journal_mode=DELETE").fetchall()
+        
+        start = time.perf_counter()
+        for i in range(count):
+            legacy_log_command(legacy_path, f"command {i}", True, "Utility command executed")
+        legacy = time.perf_counter() - start
+        
+        database = AIVADatabase(os.path.join(tmp, "pooled.db"))
+        start = time.perf_counter()
+        for i in range(count):
+            database.log_command(f"command {i}", True, "Utility command executed")
+        enqueued = time.perf_counter() - start
+        database.close()
+        pooled = time.perf_counter() - start
+    
+    print(f"{count:,} commands")
+    print(f"connection per call : {legacy:8.2f} s ({count / legacy:10,.0f}/s)")
+    print(f"write-behind queue  : {pooled:8.2f} s ({count / pooled:10,.0f}/s), "
+          f"caller time {enqueued:.2f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,148 @@
+"""Benchmark: email command parsing and address normalization, legacy vs compiled grammar.
+
+Checks both implementations against benchmarks/email_corpus.jsonl, then
+measures throughput on the corpus commands, cold (cache cleared on every
+pass) and with the parse cache warm.
+Run from the repository root:
+    python benchmarks/bench_email_parsing.py [iterations]
+"""
+
+import configparser
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import EmailManager, config_snapshot, parse_email_intent, spoken_email_address
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_corpus.jsonl")
+
+
+class Config:
+    settings = config_snapshot(configparser.ConfigParser())[0]
+    
+    def get(self, section, key, fallback=None):
+        return fallback
+
+
+class PrintLogger:
+    def info(self, message):
+        pass
+
+
+def legacy_parse(command):
+    """The original three-pattern search from EmailManager.parse_email_command"""
+    command = command.lower()
+    patterns = [
+        r"send (?:a |an )?(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+?)(?:saying|with message|body) (.+)",
+        r"send (?:a |an )?(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+)",
+        r"(?:mail|email) to (.+?)(?:regarding|about|for|with subject|subject) (.+)"
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, command)
+        if match:
+            if len(match.groups()) == 3:
+                return [match.group(1).strip(), match.group(2).strip(), match.group(3).strip()]
+            return [match.group(1).strip(), match.group(2).strip(), None]
+    return None
+
+
+def legacy_body(subject):
+    """The original generate_email_body, which rebuilt its templates on every call"""
+    subject_lower = subject.lower()
+    templates = {
+        "meeting": "Dear Recipient,\n\nI am writing to discuss the {subject}.\n\nBest regards,\nAIVA User",
+        "sick": "Dear Sir/Madam,\n\nI will be unable to attend work today due to illness.\n\nBest regards,\nAIVA User",
+        "follow_up": "Dear Recipient,\n\nI wanted to follow up regarding {subject}.\n\nBest regards,\nAIVA User"
+    }
+    if any(word in subject_lower for word in ["sick", "illness", "health", "leave"]):
+        return templates["sick"]
+    elif any(word in subject_lower for word in ["meeting", "appointment", "discussion"]):
+        return templates["meeting"].format(subject=subject)
+    elif any(word in subject_lower for word in ["follow", "update", "check"]):
+        return templates["follow_up"].format(subject=subject)
+    return f"Dear Recipient,\n\nI am writing regarding {subject}.\n\nBest regards,\nAIVA User"
+
+
+def legacy_command(command):
+    """Parse plus body generation, as parse_email_command did"""
+    parsed = legacy_parse(command)
+    if parsed and parsed[2] is None:
+        parsed[2] = legacy_body(parsed[1])
+    return parsed
+
+
+def legacy_address(recipient):
+    """The original chained str.replace from EmailManager.process_email_address"""
+    recipient = recipient.strip()
+    replacements = {" at ": "@", " dot ": ".", "gmail": "gmail.com", "yahoo": "yahoo.com",
+                    "outlook": "outlook.com", "hotmail": "hotmail.com"}
+    for old, new in replacements.items():
+        recipient = recipient.replace(old, new)
+    if "@" in recipient and "." in recipient.split("@")[1]:
+        parts = recipient.split("@")
+        return f"{parts[0].replace(' ', '')}@{parts[1]}"
+    if "@" not in recipient:
+        return f"{recipient.replace(' ', '').lower()}@gmail.com"
+    return recipient
+
+
+def new_parse(command):
+    intent = parse_email_intent(command.lower())
+    return list(intent[1:]) if intent else None
+
+
+def check(corpus, parse, address):
+    failures = []
+    for entry in corpus:
+        if "command" in entry:
+            actual = parse(entry["command"])
+            label = entry["command"]
+        else:
+            actual = address(entry["spoken"])
+            label = entry["spoken"]
+        if actual != entry["expected"]:
+            failures.append(f"  {label!r}: expected {entry['expected']!r}, got {actual!r}")
+    return failures
+
+
+def measure(function, inputs, iterations, clear=None):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clear:
+            clear()
+        for text in inputs:
+            function(text)
+    return iterations * len(inputs) / (time.perf_counter() - start)
+
+
+def main(iterations=2000):
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        corpus = [json.loads(line) for line in corpus_file if line.strip()]
+    manager = EmailManager(Config(), PrintLogger(), database=None)
+    
+    for name, parse, address in (("legacy", legacy_parse, legacy_address),
+                                 ("compiled", new_parse, manager.process_email_address)):
+        failures = check(corpus, parse, address)
+        print(f"{name:9}: {len(corpus) - len(failures)}/{len(corpus)} corpus entries correct")
+        for failure in failures:
+            print(failure)
+    
+    commands = [entry["command"] for entry in corpus if "command" in entry]
+    spoken = [entry["spoken"] for entry in corpus if "spoken" in entry]
+    print()
+    print(f"{'':24} {'legacy /s':>12} {'cold /s':>12} {'cached /s':>12}")
+    rows = (("parse commands", legacy_command, manager.parse_email_command, commands, parse_email_intent),
+            ("normalize addresses", legacy_address, manager.process_email_address, spoken, spoken_email_address))
+    for label, legacy, new, inputs, cached in rows:
+        before = measure(legacy, inputs, iterations)
+        cold = measure(new, inputs, iterations, clear=cached.cache_clear)
+        warm = measure(new, inputs, iterations)
+        print(f"{label:24} {before:12,.0f} {cold:12,.0f} {warm:12,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,78 @@
+"""Benchmark: email template lookups, connection per call vs shared connection vs cache.
+
+Also checks that a template changed from another connection is picked
+up through PRAGMA data_version within the cache's check interval.
+Run from the repository root:
+    python benchmarks/bench_email_templates.py [count]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import AIVADatabase
+
+TEMPLATES = {
+    "meeting": ("Meeting with {recipient}", "Hi {recipient},\n\nCan we meet about {subject}?\n\nThanks"),
+    "status": ("Weekly status", "Hi {recipient},\n\nHere is this week's status.\n\nBest"),
+    "sick": ("Out sick today", "Hi {recipient},\n\nI am out sick today and will reply tomorrow."),
+}
+
+
+def legacy_get_email_template(db_path, name):
+    """The original connect/select/close path"""
+    conn = sqlite3.connect(db_path)
+    result = conn.execute("SELECT subject, body FROM email_templates WHERE name = ?", (name,)).fetchone()
+    conn.close()
+    return {"subject": result[0], "body": result[1]} if result else None
+
+
+def shared_get_email_template(database, name):
+    """One query per lookup on the long-lived connection"""
+    with database._lock:
+        result = database._conn.execute(
+            "SELECT subject, body FROM email_templates WHERE name = ?", (name,)).fetchone()
+    return {"subject": result[0], "body": result[1]} if result else None
+
+
+def measure(lookup, count):
+    names = list(TEMPLATES) + ["missing"]
+    start = time.perf_counter()
+    for i in range(count):
+        lookup(names[i % len(names)])
+    return count / (time.perf_counter() - start)
+
+
+def main(count=50000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "templates.db")
+        database = AIVADatabase(path)
+        for name, (subject, body) in TEMPLATES.items():
+            database.save_email_template(name, subject, body)
+        
+        rates = [
+            ("connection per call", measure(lambda name: legacy_get_email_template(path, name), count // 10)),
+            ("shared connection", measure(lambda name: shared_get_email_template(database, name), count)),
+            ("template cache", measure(database.get_email_template, count)),
+            ("cache + render", measure(lambda name: database.render_email_template(name, "john", subject="q3"), count)),
+        ]
+        for label, rate in rates:
+            print(f"{label:20}: {rate:12,.0f} lookups/s")
+        print(f"cache stats         : {database.templates.stats()}")
+        
+        external = sqlite3.connect(path)
+        external.execute("UPDATE email_templates SET subject = 'Changed elsewhere' WHERE name = 'status'")
+        external.commit()
+        external.close()
+        time.sleep(database.templates.check_interval)
+        subject = database.get_email_template("status")["subject"]
+        print(f"external update seen: {subject == 'Changed elsewhere'} ({subject!r})")
+        database.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,111 @@
+"""Benchmark: exporting a table through the xlsx streaming backend vs the COM backend.
+
+The xlsx backend (needs xlsxwriter, skipped without it) writes a real
+file; its peak Python allocation should stay flat as the row count grows.
+The COM backend runs against real Excel on Windows with --excel, otherwise
+against FakeExcelApplication from tests/fake_excel.py with a simulated
+per-call latency, which models the round trips but not the time Excel
+itself spends on the data.
+Run from the repository root:
+    python benchmarks/bench_excel_backends.py [rows ...] [--excel] [--latency MS]
+    python benchmarks/bench_excel_backends.py 1000000   # about two minutes
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import ComExcelBackend, ExcelManager, XlsxExcelBackend, range_address
+from tests.fake_excel import FakeExcelApplication
+
+HEADERS = ["id", "region", "units", "price", "total"]
+REGIONS = ["north", "south", "east", "west"]
+
+
+class PrintLogger:
+    def info(self, message):
+        pass
+    
+    def debug(self, message):
+        pass
+    
+    def error(self, message):
+        print(f"error: {message}")
+
+
+def rows(count):
+    for index in range(count):
+        yield [index, REGIONS[index % 4], index % 97, (index % 500) / 10]
+
+
+def export(backend, count, filename):
+    """Header, number formats and a formula column declared up front, then the rows streamed"""
+    manager = ExcelManager(PrintLogger(), backend)
+    manager.initialize()
+    with manager.batch():
+        manager.write_range("A1", [HEADERS])
+        manager.apply_format(range_address(1, 1, 1, len(HEADERS)), bold=True)
+        manager.apply_format(range_address(2, 4, count, 2), number_format="0.00")
+        manager.set_formulas(range_address(2, 5, count, 1), "=C2*D2")
+        manager.write_rows("A2", rows(count))
+        manager.apply_conditional_formatting(range_address(2, 5, count, 1), "> 4000", "green")
+        manager.create_chart(range_address(1, 3, min(count, 50) + 1, 2), "Column")
+    manager.save_workbook(filename)
+    manager.close()
+
+
+def xlsx(count, directory):
+    filename = os.path.join(directory, f"export_{count}.xlsx")
+    start = time.perf_counter()
+    export(XlsxExcelBackend(directory), count, filename)
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    export(XlsxExcelBackend(directory), count, filename)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, os.path.getsize(filename)
+
+
+def com(count, directory, excel, latency):
+    if excel:
+        backend = ComExcelBackend()
+    else:
+        application = FakeExcelApplication(latency=latency)
+        backend = ComExcelBackend(lambda: application)
+    start = time.perf_counter()
+    export(backend, count, os.path.join(directory, f"export_com_{count}.xlsx"))
+    calls = "" if excel else f"{application.call_count:,}"
+    return time.perf_counter() - start, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="*", type=int, default=[10000, 100000])
+    parser.add_argument("--excel", action="store_true", help="drive real Excel through COM")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated COM latency in ms")
+    args = parser.parse_args()
+    
+    com_label = "Excel COM" if args.excel else f"COM ({args.latency:g} ms/call)"
+    has_xlsx = XlsxExcelBackend.available()
+    if not has_xlsx:
+        print("xlsx: skipped, XlsxWriter is not installed (pip install xlsxwriter)")
+    print(f"{'rows':>10} {'xlsx s':>8} {'peak KiB':>9} {'file KiB':>9} {com_label + ' s':>22} {'calls':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.rows:
+            if has_xlsx:
+                elapsed, peak, size = xlsx(count, directory)
+                xlsx_cells = f"{elapsed:>8.2f} {peak / 1024:>9,.0f} {size / 1024:>9,.0f}"
+            else:
+                xlsx_cells = f"{'-':>8} {'-':>9} {'-':>9}"
+            com_elapsed, calls = com(count, directory, args.excel, args.latency / 1000)
+            print(f"{count:>10,} {xlsx_cells} {com_elapsed:>22.2f} {calls:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark: per-cell COM calls vs ExcelManager's batched range operations.
+
+Runs against FakeExcelApplication from tests/fake_excel.py, which counts
+object model calls and sleeps for a fixed latency per call to model the
+cross-process COM round trip (out-of-process Excel typically costs 0.1-1 ms
+per call).
+Run from the repository root:
+    python benchmarks/bench_excel_batch.py [latency_ms]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import ComExcelBackend, ExcelManager, range_address
+from tests.fake_excel import FakeExcelApplication
+
+SIZES = [(10, 3), (100, 5), (500, 8)]
+
+
+class PrintLogger:
+    def info(self, message):
+        pass
+    
+    def debug(self, message):
+        pass
+    
+    def error(self, message):
+        print(f"error: {message}")
+
+
+def table(rows, columns):
+    return [[f"col{column}" for column in range(columns)]] + [
+        [row * columns + column for column in range(columns)] for row in range(rows)
+    ]
+
+
+def per_cell(manager, data):
+    """One Range lookup and one Value/format call per cell"""
+    sheet = manager.backend.worksheet
+    for row, values in enumerate(data, start=1):
+        for column, value in enumerate(values, start=1):
+            cell = sheet.Range(range_address(row, column, 1, 1))
+            cell.Value = value
+            if row == 1:
+                cell.Font.Bold = True
+            else:
+                cell.NumberFormat = "0.00"
+    columns = len(data[0])
+    for row in range(2, len(data) + 1):
+        last = range_address(row, columns, 1, 1)
+        sheet.Range(range_address(row, columns + 1, 1, 1)).Formula = f"=SUM(A{row}:{last})"
+
+
+def batched(manager, data):
+    """One Value write for the block, one call per format and one formula fill"""
+    columns = len(data[0])
+    headers, rows = data[0], data[1:]
+    with manager.batch():
+        manager.write_table("A1", headers, rows, {header: "0.00" for header in headers})
+        last = range_address(2, columns, 1, 1)
+        manager.set_formulas(range_address(2, columns + 1, len(rows), 1), f"=SUM(A2:{last})")
+
+
+def run(approach, data, latency):
+    application = FakeExcelApplication(latency=latency)
+    manager = ExcelManager(PrintLogger(), ComExcelBackend(lambda: application))
+    manager.initialize()
+    application.calls.clear()
+    start = time.perf_counter()
+    approach(manager, data)
+    return application.call_count, time.perf_counter() - start
+
+
+def main(latency_ms=0.2):
+    latency = latency_ms / 1000
+    print(f"simulated COM latency {latency_ms:g} ms per call")
+    print(f"{'cells':>8} {'per-cell calls':>15} {'time s':>8} {'batched calls':>14} {'time s':>8} {'speedup':>8}")
+    for rows, columns in SIZES:
+        data = table(rows, columns)
+        cell_calls, cell_time = run(per_cell, data, latency)
+        batch_calls, batch_time = run(batched, data, latency)
+        print(f"{(rows + 1) * columns:>8,} {cell_calls:>15,} {cell_time:>8.3f} "
+              f"{batch_calls:>14,} {batch_time:>8.3f} {cell_time / batch_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2)
@@ -0,0 +1,90 @@
+"""Benchmark: routing accuracy and latency with and without the intent classifier.
+
+Routes every command in intent_corpus.jsonl (commands labelled with
+their category, "unrouted" for ones AIVA should not act on) three ways:
+keywords alone, keywords with the classifier settling ties and misses
+(what AIVA does), and the classifier alone. Accuracy is broken down by
+whether the keywords found one, several or no categories. Latency is
+also measured with the garbage collector off, to tell its pauses from
+the operating system's. Needs numpy.
+Run from the repository root:
+    python benchmarks/bench_intent_classifier.py [min_confidence] [margin]
+"""
+
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import BUILTIN_COMMANDS, DEFAULT_ROUTING_PRIORITY, CommandRegistry, IntentClassifier, IntentRouter
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+
+
+def latencies(function, commands, repeats=50):
+    """Per-call seconds for every command, repeated"""
+    samples = []
+    for _ in range(repeats):
+        for command in commands:
+            start = time.perf_counter()
+            function(command)
+            samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+
+def main(min_confidence=0.4, margin=0.05):
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        corpus = [json.loads(line) for line in corpus_file if line.strip()]
+    registry = CommandRegistry(BUILTIN_COMMANDS)
+    router = IntentRouter(registry.keyword_table(), DEFAULT_ROUTING_PRIORITY)
+    start = time.perf_counter()
+    classifier = IntentClassifier(registry.examples())
+    built = time.perf_counter() - start
+    print(f"classifier: {len(classifier.categories)} categories, {classifier.matrix.shape[1]} examples, "
+          f"{classifier.matrix.shape[0]:,} features, built in {built * 1000:.1f} ms")
+    
+    def classify_only(command):
+        ranked = classifier.rank(command)
+        return ranked[0][0] if ranked and ranked[0][1] >= min_confidence else None
+    
+    approaches = {
+        "keywords": router.route,
+        "keywords + classifier": lambda command: router.resolve(command, classifier, min_confidence, margin),
+        "classifier only": classify_only
+    }
+    groups = {"one keyword match": [], "several matches": [], "no keyword match": []}
+    for entry in corpus:
+        matches = len(router.candidates(entry["command"]))
+        groups["no keyword match" if matches == 0 else "one keyword match" if matches == 1
+               else "several matches"].append(entry)
+    
+    print()
+    print(f"{'':22}" + "".join(f"{name:>20}" for name in groups) + f"{'all':>10}")
+    for name, route in approaches.items():
+        cells = []
+        for entries in list(groups.values()) + [corpus]:
+            correct = sum((route(entry["command"]) or "unrouted") == entry["expected"] for entry in entries)
+            cells.append(f"{correct}/{len(entries)}")
+        print(f"{name:22}" + "".join(f"{cell:>20}" for cell in cells[:-1]) + f"{cells[-1]:>10}")
+    
+    commands = [entry["command"] for entry in corpus]
+    print()
+    print(f"{'per utterance':22} {'p50 us':>8} {'p99 us':>8} {'p99.9 us':>9} {'max us':>8} {'> 1 ms':>7} "
+          f"{'per second':>12}")
+    rows = list(approaches.items()) + [("rank all categories", classifier.rank)]
+    for name, route in rows + [("rank, gc off", classifier.rank)]:
+        if name.endswith("gc off"):
+            gc.disable()
+        samples = latencies(route, commands)
+        gc.enable()
+        print(f"{name:22} {statistics.median(samples) * 1e6:>8.1f} {samples[int(len(samples) * 0.99)] * 1e6:>8.1f} "
+              f"{samples[int(len(samples) * 0.999)] * 1e6:>9.1f} {samples[-1] * 1e6:>8.1f} "
+              f"{sum(sample > 0.001 for sample in samples):>7} {len(samples) / sum(samples):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,76 @@
+"""Benchmark: caller-side cost of log calls on the command path, direct handlers vs AIVALogger.
+
+The legacy setup writes to the file and console on the calling thread;
+AIVALogger only puts the record on a queue. Console output goes to
+os.devnull in both cases. Also compares a disabled debug call with an
+f-string against %-style arguments, which are never formatted.
+Run from the repository root:
+    python benchmarks/bench_logging.py [calls]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import AIVAConfig, AIVALogger, percentile
+
+COMMAND = "send an email to john at gmail regarding the quarterly report"
+
+
+def timed(call, calls):
+    """Per-call latencies in microseconds"""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        call(i)
+        latencies.append((time.perf_counter() - start) * 1000000)
+    return sorted(latencies)
+
+
+def summary(label, latencies):
+    print(f"{label:34} {percentile(latencies, 0.5):8.2f} {percentile(latencies, 0.99):8.2f} "
+          f"{latencies[-1]:9.1f}")
+
+
+def main(calls=50000):
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        sys.stderr, stderr = devnull, sys.stderr
+        try:
+            legacy = logging.getLogger("legacy")
+            legacy.propagate = False
+            legacy.setLevel(logging.INFO)
+            formatter = logging.Formatter(AIVALogger.TEXT_FORMAT)
+            for handler in (logging.FileHandler(os.path.join(tmp, "legacy.log")), logging.StreamHandler()):
+                handler.setFormatter(formatter)
+                legacy.addHandler(handler)
+            
+            config = AIVAConfig(os.path.join(tmp, "aiva_config.ini"))
+            config.set('LOGGING', 'file', os.path.join(tmp, "aiva.log"))
+            config.set('LOGGING', 'level', 'INFO')
+            logger = AIVALogger(config)
+            
+            results = [
+                ("info, handlers on caller thread", timed(lambda i: legacy.info(f"Processing command: {COMMAND} {i}"), calls)),
+                ("info, AIVALogger queue", timed(lambda i: logger.info("Processing command: %s %d", COMMAND, i), calls)),
+                ("debug off, f-string", timed(lambda i: logger.debug(f"Heard: {COMMAND} {i}"), calls)),
+                ("debug off, %-style arguments", timed(lambda i: logger.debug("Heard: %s %d", COMMAND, i), calls)),
+            ]
+            start = time.perf_counter()
+            AIVALogger.stop()
+            drain = time.perf_counter() - start
+        finally:
+            sys.stderr = stderr
+    
+    print(f"{calls:,} calls each; microseconds per call on the calling thread")
+    print(f"{'':34} {'p50':>8} {'p99':>8} {'max':>9}")
+    for label, latencies in results:
+        summary(label, latencies)
+    print(f"queue drained by the listener {drain * 1000:.0f} ms after the last call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
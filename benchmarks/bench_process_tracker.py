@@ -0,0 +1,152 @@
+"""Benchmark: ProcessTracker refresh + top-N vs a full sort over every process.
+
+Synthetic process tables isolate the bookkeeping from psutil's own cost
+of reading /proc (or the Windows APIs). Both approaches get the same
+sample and track CPU and IO deltas against the previous one. The full
+sort builds a dict per process and sorts them all, as the old
+get_running_processes did through psutil's cpu_percent. A last row
+compares the two against the live process table, psutil included.
+Run from the repository root:
+    python benchmarks/bench_process_tracker.py [refreshes]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import ProcessTracker
+
+SIZES = [1000, 2000, 5000, 10000, 20000]
+CHURN = 0.01
+USERS = ["root", "build", "www-data", "alice"]
+
+
+class FakeProcessTable:
+    """Processes with growing CPU/IO counters; a fraction exits and is replaced each tick"""
+    
+    def __init__(self, size, rng):
+        self.rng = rng
+        self.next_pid = 1
+        self.processes = {}
+        self.now = time.time()
+        for _ in range(size):
+            self.spawn()
+    
+    def spawn(self):
+        pid = self.next_pid
+        self.next_pid += 1
+        self.processes[pid] = [self.now - self.rng.uniform(1, 3600), self.rng.uniform(0, 50),
+                               self.rng.uniform(1e6, 5e8), self.rng.uniform(0, 1e9),
+                               (f"proc-{pid % 500}", self.rng.choice(USERS))]
+    
+    def tick(self, seconds):
+        self.now += seconds
+        for pid in self.rng.sample(list(self.processes), int(len(self.processes) * CHURN)):
+            del self.processes[pid]
+            self.spawn()
+        for record in self.processes.values():
+            record[1] += self.rng.expovariate(10) * seconds
+            record[3] += self.rng.expovariate(1e-5) * seconds
+    
+    def records(self):
+        """One sample, read up front as ProcessTracker.refresh() does"""
+        return [(pid, create_time, cpu, rss, io, handle)
+                for pid, (create_time, cpu, rss, io, handle) in self.processes.items()]
+
+
+def legacy_top(records, previous, elapsed, limit=10):
+    """A dict per process with deltas against the previous sample, then a full sort"""
+    processes = []
+    current = {}
+    for pid, create_time, cpu, rss, io, (name, user) in records:
+        before = previous.get(pid)
+        if before is None or before[0] != create_time:
+            before = (create_time, cpu, io)
+        current[pid] = (create_time, cpu, io)
+        processes.append({"pid": pid, "name": name, "username": user,
+                          "cpu_percent": (cpu - before[1]) / elapsed * 100, "memory_percent": rss / 1.6e10 * 100,
+                          "io_rate": (io - before[2]) / elapsed})
+    previous.clear()
+    previous.update(current)
+    processes.sort(key=lambda x: x["cpu_percent"] or 0, reverse=True)
+    return processes[:limit]
+
+
+def legacy_live(limit=10):
+    """The old get_running_processes: psutil's own per-process tracking, then a full sort"""
+    import psutil
+    processes = []
+    for process in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+        processes.append(process.info)
+    processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
+    return processes[:limit]
+
+
+def measure(function, refreshes):
+    """Mean seconds per call, then peak traced allocation in a separate pass"""
+    start = time.perf_counter()
+    for _ in range(refreshes):
+        function()
+    elapsed = (time.perf_counter() - start) / refreshes
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(refreshes=20):
+    print(f"{'processes':>10} {'full sort ms':>13} {'peak KiB':>9} {'tracker ms':>11} {'peak KiB':>9} "
+          f"{'top-10 ms':>10} {'filtered ms':>12}")
+    for size in SIZES:
+        rng = random.Random(size)
+        table = FakeProcessTable(size, rng)
+        tracker = ProcessTracker(describe=lambda handle: handle)
+        tracker.update(table.records(), now=0.0)
+        previous = {}
+        legacy_top(table.records(), previous, 2.0)
+        clock = [0.0]
+        
+        def legacy():
+            table.tick(2.0)
+            legacy_top(table.records(), previous, 2.0)
+        
+        def tracked():
+            table.tick(2.0)
+            clock[0] += 2.0
+            tracker.update(table.records(), now=clock[0])
+            tracker.top(10)
+        
+        # Ticking and sampling the table is the same in both; time it separately and subtract
+        tick_time, _ = measure(lambda: (table.tick(2.0), table.records()), refreshes)
+        legacy_time, legacy_peak = measure(legacy, refreshes)
+        tracker_time, tracker_peak = measure(tracked, refreshes)
+        top_time, _ = measure(lambda: tracker.top(10), refreshes * 10)
+        filtered_time, _ = measure(lambda: tracker.top(10, by="io", user="build"), refreshes * 10)
+        print(f"{size:>10,} {(legacy_time - tick_time) * 1000:>13.2f} {legacy_peak / 1024:>9,.0f} "
+              f"{(tracker_time - tick_time) * 1000:>11.2f} {tracker_peak / 1024:>9,.0f} "
+              f"{top_time * 1000:>10.3f} {filtered_time * 1000:>12.3f}")
+    
+    try:
+        import psutil
+    except ImportError:
+        print("live: psutil is not installed")
+        return
+    tracker = ProcessTracker()
+    tracker.refresh()
+    legacy_live()
+    legacy_time, legacy_peak = measure(legacy_live, refreshes)
+    tracker_time, tracker_peak = measure(lambda: (tracker.refresh(), tracker.top(10)), refreshes)
+    top_time, _ = measure(lambda: tracker.top(10), refreshes * 10)
+    filtered_time, _ = measure(lambda: tracker.top(10, by="io", name="python"), refreshes * 10)
+    print(f"{'live ' + str(len(psutil.pids())):>10} {legacy_time * 1000:>13.2f} {legacy_peak / 1024:>9,.0f} "
+          f"{tracker_time * 1000:>11.2f} {tracker_peak / 1024:>9,.0f} {top_time * 1000:>10.3f} "
+          f"{filtered_time * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,59 @@
+"""Benchmark: commands routed per second, legacy keyword chain vs IntentRouter.
+
+Run from the repository root:
+    python benchmarks/bench_router.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import COMMAND_KEYWORDS, DEFAULT_ROUTING_PRIORITY, IntentRouter
+
+COMMANDS = [
+    "open excel and create a new spreadsheet",
+    "send an email to john at gmail regarding the meeting tomorrow",
+    "show system information",
+    "search for python tutorials",
+    "what time is it",
+    "what can you do",
+    "play some relaxing music",
+    "turn on the lights in the kitchen",
+    "this sentence matches no category whatsoever",
+    "blah blah blah"
+]
+
+
+def legacy_route(command):
+    """The original is_*_command chain from AIVA.process_command"""
+    for category in DEFAULT_ROUTING_PRIORITY:
+        if any(keyword in command.lower() for keyword in COMMAND_KEYWORDS[category]):
+            return category
+    return None
+
+
+def measure(route, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for command in COMMANDS:
+            route(command)
+    elapsed = time.perf_counter() - start
+    return iterations * len(COMMANDS) / elapsed
+
+
+def main(iterations=20000):
+    router = IntentRouter(COMMAND_KEYWORDS, DEFAULT_ROUTING_PRIORITY)
+    
+    for command in COMMANDS:
+        assert router.route(command) == legacy_route(command), command
+    
+    before = measure(legacy_route, iterations)
+    after = measure(router.route, iterations)
+    print(f"legacy chain : {before:12,.0f} commands/s")
+    print(f"IntentRouter : {after:12,.0f} commands/s ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark: full-text command history search on a large history.
+
+Run from the repository root:
+    python benchmarks/bench_search.py [rows]
+"""
+
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import AIVADatabase
+
+VERBS = ["open", "send", "search", "show", "play", "create", "write", "check", "turn", "close"]
+COMMON = ["email", "spreadsheet", "weather", "youtube", "music", "report", "budget", "tomorrow"]
+QUERIES = ["email", "spreadsheet budget", "budg", "weather tomorrow", "youtu", "invoice quarterly", "spreadshe",
+           "weather tomorro"]
+
+
+def vocabulary(size=20000, seed=7):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)}
+    # Common command words get the highest Zipf ranks, rare ones the lowest
+    return COMMON + sorted(words) + ["invoice", "quarterly"]
+
+
+def populate(database, rows, seed=7):
+    rng = random.Random(seed)
+    words = vocabulary()
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    pool = rng.choices(words, cum_weights=cum_weights, k=rows * 6)
+    
+    insert = "INSERT INTO command_history (command, success, response, timestamp, category) VALUES (?, ?, ?, ?, ?)"
+    batch = []
+    offset = 0
+    for _ in range(rows):
+        count = rng.randint(2, 6)
+        text = " ".join([rng.choice(VERBS)] + pool[offset:offset + count])
+        offset += count
+        batch.append((text, True, "", "2026-01-01 00:00:00", None))
+        if len(batch) == 50000:
+            database._conn.executemany(insert, batch)
+            batch = []
+    if batch:
+        database._conn.executemany(insert, batch)
+    database._conn.commit()
+    database._conn.execute("INSERT INTO command_history_fts (command_history_fts) VALUES ('optimize')")
+    database._conn.commit()
+
+
+def time_queries(database, rank, repeat):
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = database.search_command_history(query, limit=10, rank=rank)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{rank:9} {query!r:22} hits={len(results):2d} "
+              f"p50={timings[len(timings) // 2] * 1000:.3f} ms "
+              f"p99={timings[int(len(timings) * 0.99)] * 1000:.3f} ms")
+
+
+def time_after_logging(database, repeat):
+    """Search straight after logging a command, so the search has to flush it first"""
+    timings = []
+    for index in range(repeat):
+        database.log_command(f"check weather tomorrow {index}")
+        start = time.perf_counter()
+        results = database.search_command_history("weather tomorro", limit=10)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{'logged':9} {'weather tomorro'!r:22} hits={len(results):2d} "
+          f"p50={timings[len(timings) // 2] * 1000:.3f} ms "
+          f"p99={timings[int(len(timings) * 0.99)] * 1000:.3f} ms")
+
+
+def main(rows=1000000, repeat=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = AIVADatabase(os.path.join(tmp, "search.db"))
+        start = time.perf_counter()
+        populate(database, rows)
+        print(f"indexed {rows:,} commands in {time.perf_counter() - start:.1f} s")
+        
+        time_queries(database, "recent", repeat)
+        time_queries(database, "relevance", max(1, repeat // 20))
+        time_after_logging(database, max(1, repeat // 4))
+        database.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
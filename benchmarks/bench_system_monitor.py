@@ -0,0 +1,80 @@
+"""Benchmark: system queries answered from the background sampler vs on demand.
+
+Run from the repository root:
+    python benchmarks/bench_system_monitor.py [queries]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+from aiva import SystemMonitor, SystemSampler
+
+
+def legacy_system_info():
+    """The original blocking query"""
+    cpu_percent = psutil.cpu_percent(interval=1)
+    memory = psutil.virtual_memory()
+    disk = psutil.disk_usage('/')
+    return cpu_percent, memory.percent, disk.percent
+
+
+def legacy_processes(limit=10):
+    processes = [proc.info for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent'])]
+    processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
+    return processes[:limit]
+
+
+def timed(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1 if len(timings) >= 100 else -1]
+
+
+def report(label, timings):
+    p50, p99 = timings
+    print(f"{label:<36} p50 {p50 * 1000:9.3f} ms   p99 {p99 * 1000:9.3f} ms")
+
+
+def main(queries=10000):
+    logger = logging.getLogger("AIVA")
+    report("on demand: system info", timed(legacy_system_info, 3))
+    report("on demand: top processes", timed(legacy_processes, 20))
+    
+    sampler = SystemSampler(logger, interval=0.5, history_seconds=3600, process_interval=2.0)
+    monitor = SystemMonitor(logger, sampler)
+    time.sleep(5)
+    
+    # Fill the rest of the hour of history so windowed queries walk a full buffer
+    latest = sampler.samples.latest()
+    now = time.time()
+    for i in range(sampler.samples.capacity - len(sampler.samples)):
+        values = dict(latest)
+        values["cpu_percent"] = i % 100
+        sampler.samples.append(now - 3600 + i * sampler.interval, values)
+    
+    report("sampler: system info", timed(monitor.get_system_info, queries))
+    report("sampler: top processes", timed(monitor.get_running_processes, queries // 10))
+    report("sampler: average CPU, 5 minutes", timed(lambda: monitor.get_average_cpu(300), queries // 10))
+    report("sampler: usage over 60 minutes", timed(lambda: monitor.get_usage_over(3600), queries // 100))
+    
+    sampler.stop()
+    overhead = sampler.overhead()
+    print(f"\n{len(sampler.samples):,} samples buffered, {len(sampler.tracker):,} processes")
+    print(f"sampler cost: {overhead['sample_ms']:.3f} ms per system sample, "
+          f"{overhead['process_sample_ms']:.2f} ms per process sample")
+    print(f"at the default intervals (2 s / 10 s): "
+          f"{(overhead['sample_ms'] / 2 + overhead['process_sample_ms'] / 10) / 10:.3f}% of one core")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,101 @@
+"""Benchmark: time to first audio for fixed responses, synthesized vs cached.
+
+Needs a working pyttsx3 voice and an audio output device (PyAudio), and
+skips with the reason when either is missing.
+Run from the repository root:
+    python benchmarks/bench_tts_cache.py [repeats]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_recognition as sr
+
+from aiva import AIVA, PhraseCache, SpeechQueue, VoiceManager, WavPlayer, lazy_import
+
+
+class PrintLogger:
+    def error(self, message):
+        print(f"error: {message}")
+
+
+def missing_audio():
+    """Why speech cannot be synthesized and played here, or None"""
+    try:
+        engine = lazy_import("pyttsx3").init()
+        if not engine.getProperty('voices'):
+            return "pyttsx3 has no TTS voice installed"
+    except Exception as e:
+        # pyttsx3 raises RuntimeError or OSError when its speech engine
+        # (eSpeak, SAPI5, NSSpeechSynthesizer) is missing
+        return f"no TTS voice ({type(e).__name__}: {e})"
+    try:
+        sr.Microphone.get_pyaudio().PyAudio().get_default_output_device_info()
+    except Exception as e:
+        return f"no audio output device ({e})"
+    return None
+
+
+def first_audio_latencies(speech, phrases, audio_started, repeats):
+    """Seconds from say() until the first sentence starts playing"""
+    latencies = []
+    for _ in range(repeats):
+        for phrase in phrases:
+            audio_started.clear()
+            start = time.perf_counter()
+            future = speech.say(phrase)
+            if not audio_started.wait(30):
+                raise RuntimeError("no audio; is a TTS voice and output device available?")
+            latencies.append(time.perf_counter() - start)
+            # Only the start matters; skip the rest of the phrase
+            speech.cancel_all()
+            future.result()
+    return latencies
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+    return f"p50 {statistics.median(ordered) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms"
+
+
+def main(repeats=3):
+    problem = missing_audio()
+    if problem:
+        print(f"skipped: {problem}")
+        return
+    
+    phrases = AIVA.FIXED_PHRASES + VoiceManager.FIXED_PHRASES
+    audio_started = threading.Event()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PhraseCache(tmp, max_bytes=200 * 1024 * 1024)
+        speech = SpeechQueue(lazy_import("pyttsx3").init, PrintLogger(), cache=cache, player=WavPlayer(),
+                             on_audio=audio_started.set)
+        
+        # Nothing is prewarmed yet, so every sentence is synthesized live
+        misses = first_audio_latencies(speech, phrases, audio_started, repeats)
+        
+        speech.prewarm(phrases)
+        chunks = {chunk for phrase in phrases for chunk in SpeechQueue.split(phrase)}
+        deadline = time.monotonic() + 120
+        while len(cache) < len(chunks) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        
+        hits = first_audio_latencies(speech, phrases, audio_started, repeats)
+        speech.close()
+    
+    print(f"{len(phrases)} phrases x {repeats}, {len(chunks)} cached sentences "
+          f"({cache.size / 1024:,.0f} KiB)")
+    print(f"cache miss (pyttsx3)  : {summary(misses)}")
+    print(f"cache hit (WAV file)  : {summary(hits)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
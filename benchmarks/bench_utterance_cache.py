@@ -0,0 +1,88 @@
+"""Benchmark: routing cost of repeated voice commands with the utterance cache.
+
+Draws a session of commands from intent_corpus.jsonl with Zipf-like
+popularity (a few commands are said again and again), spoken with varying
+case and punctuation, and routes it as AIVA does: keywords with the intent
+classifier settling ties and misses. Compares routing every command with
+routing through UtteranceCache at several cache sizes, using the default
+uncached categories. Uses the classifier when numpy is installed.
+Run from the repository root:
+    python benchmarks/bench_utterance_cache.py [commands] [zipf exponent]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiva import (BUILTIN_COMMANDS, CONFIG_DEFAULTS, DEFAULT_ROUTING_PRIORITY, CommandRegistry, IntentClassifier,
+                  IntentRouter, UtteranceCache)
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+UNCACHED = tuple(item.strip() for item in CONFIG_DEFAULTS["UTTERANCE_CACHE"]["uncached"].split(","))
+
+
+def session(commands, count, exponent, seed=11):
+    """count utterances; the command at popularity rank r is drawn with weight 1 / r ** exponent"""
+    rng = random.Random(seed)
+    popular = rng.sample(commands, len(commands))
+    weights = [1 / rank ** exponent for rank in range(1, len(popular) + 1)]
+    spoken = []
+    for command in rng.choices(popular, weights, k=count):
+        if rng.random() < 0.3:
+            command = command.capitalize()
+        if rng.random() < 0.3:
+            command += rng.choice(["?", ".", "!"])
+        spoken.append(command)
+    return spoken
+
+
+def run(route, utterances, cache=None):
+    """Seconds to route every utterance, directly or through the cache"""
+    start = time.perf_counter()
+    for utterance in utterances:
+        if cache is None:
+            route(utterance)
+            continue
+        key = UtteranceCache.normalize(utterance)
+        category = cache.get(key)
+        if category is UtteranceCache.MISS:
+            cache.put(key, route(utterance))
+    return time.perf_counter() - start
+
+
+def main(count=20000, exponent=1.1):
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        commands = [json.loads(line)["command"] for line in corpus_file if line.strip()]
+    registry = CommandRegistry(BUILTIN_COMMANDS)
+    router = IntentRouter(registry.keyword_table(), DEFAULT_ROUTING_PRIORITY)
+    try:
+        classifier = IntentClassifier(registry.examples())
+    except RuntimeError as e:
+        print(f"keywords only: {e}")
+        classifier = None
+    
+    def route(command):
+        return router.resolve(command, classifier)
+    
+    utterances = session(commands, count, exponent)
+    distinct = len({UtteranceCache.normalize(utterance) for utterance in utterances})
+    print(f"{count:,} utterances, {distinct} distinct after normalizing, uncached categories: {', '.join(UNCACHED)}")
+    print()
+    print(f"{'cache size':>10} {'hit rate':>9} {'bypassed':>9} {'us / command':>13} {'speed-up':>9}")
+    baseline = run(route, utterances)
+    print(f"{'none':>10} {'-':>9} {'-':>9} {baseline / count * 1e6:>13.1f} {1:>8.1f}x")
+    for size in (8, 32, 256):
+        cache = UtteranceCache(size=size, ttl=3600, uncached=UNCACHED)
+        elapsed = run(route, utterances, cache)
+        stats = cache.stats()
+        hit_rate = stats["hits"] / (stats["hits"] + stats["misses"])
+        print(f"{size:>10} {hit_rate:>9.1%} {stats['bypassed'] / count:>9.1%} {elapsed / count * 1e6:>13.1f} "
+              f"{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) if index == 0 else float(arg) for index, arg in enumerate(sys.argv[1:3])))
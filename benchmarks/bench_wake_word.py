@@ -0,0 +1,123 @@
+"""Benchmark: local wake word detector accuracy and latency.
+
+Run from the repository root with recorded fixtures (mono WAV files):
+    python benchmarks/bench_wake_word.py TEMPLATES_DIR POSITIVES_DIR NEGATIVES_DIR
+
+Without arguments a synthetic wake word (a fixed sequence of voiced
+vowel-like sounds) is used, which exercises the same code path.
+--write-fixtures DIR saves a small synthetic set as WAV files in
+DIR/templates, DIR/positives and DIR/negatives (the test fixtures in
+tests/fixtures/wake_word were made this way).
+"""
+
+import math
+import os
+import random
+import sys
+import wave
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import speech_recognition as sr
+
+from aiva import ArrayAudioSource, TemplateWakeWordDetector
+
+RATE = 16000
+# (first formant, second formant) per syllable
+WAKE_WORD = [(700, 1200), (300, 2300), (600, 1000)]
+OTHER_WORDS = [
+    [(300, 2300), (700, 1200)],
+    [(500, 900), (400, 2000), (700, 1200), (300, 900)],
+    [(600, 1000), (600, 1000), (300, 2300)],
+    [(400, 2000)],
+    [(700, 1200), (500, 900), (400, 2000)]
+]
+
+
+def syllable(formants, seconds, rng):
+    t = np.arange(int(seconds * RATE)) / RATE
+    pitch = rng.uniform(100, 160)
+    envelope = np.sin(np.pi * t / seconds)
+    signal = np.zeros_like(t)
+    for harmonic in range(1, 30):
+        frequency = pitch * harmonic
+        gain = sum(math.exp(-((frequency - formant) / 120) ** 2) for formant in formants)
+        signal += gain * np.sin(2 * np.pi * frequency * t)
+    return envelope * signal / max(1e-9, np.abs(signal).max())
+
+
+def utterance(words, rng, noise=0.02):
+    parts = [np.zeros(int(0.4 * RATE))]
+    for word in words:
+        stretch = rng.uniform(0.85, 1.15)
+        for formants in word:
+            parts.append(syllable(formants, 0.18 * stretch, rng))
+        parts.append(np.zeros(int(rng.uniform(0.05, 0.15) * RATE)))
+    parts.append(np.zeros(int(0.6 * RATE)))
+    signal = np.concatenate(parts) * rng.uniform(0.3, 0.8)
+    signal += np.random.default_rng(rng.randrange(2 ** 32)).normal(0, noise, len(signal))
+    return sr.AudioData((np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes(), RATE, 2)
+
+
+def synthetic(rng, count=100):
+    detector = TemplateWakeWordDetector()
+    for _ in range(3):
+        detector.enroll(utterance([WAKE_WORD], rng))
+    samples = []
+    for _ in range(count):
+        command = [rng.choice(OTHER_WORDS) for _ in range(rng.randint(0, 2))]
+        samples.append((utterance([WAKE_WORD] + command, rng), True))
+        samples.append((utterance([rng.choice(OTHER_WORDS) for _ in range(rng.randint(1, 3))], rng), False))
+    return detector, samples
+
+
+def write_fixtures(directory, count=6, seed=7):
+    rng = random.Random(seed)
+    detector, samples = synthetic(rng, count)
+    templates = [utterance([WAKE_WORD], rng) for _ in range(3)]
+    sets = {"templates": templates,
+            "positives": [audio for audio, expected in samples if expected],
+            "negatives": [audio for audio, expected in samples if not expected]}
+    for name, recordings in sets.items():
+        os.makedirs(os.path.join(directory, name), exist_ok=True)
+        for index, audio in enumerate(recordings, start=1):
+            with wave.open(os.path.join(directory, name, f"{name[:-1]}_{index}.wav"), "wb") as wav:
+                wav.setnchannels(1)
+                # 8 kHz keeps the 80-4000 Hz band the features use at half the size
+                wav.setsampwidth(2)
+                wav.setframerate(8000)
+                wav.writeframes(audio.get_raw_data(convert_rate=8000, convert_width=2))
+        print(f"{directory}/{name}: {len(recordings)} files")
+
+
+def load(directory, expected):
+    samples = []
+    for path in sorted(Path(directory).glob("*.wav")):
+        source = ArrayAudioSource.from_wav(str(path))
+        samples.append((sr.AudioData(source.data, source.sample_rate, source.sample_width), expected))
+    return samples
+
+
+def main(args):
+    if len(args) == 2 and args[0] == "--write-fixtures":
+        write_fixtures(args[1])
+        return
+    if len(args) == 3:
+        detector = TemplateWakeWordDetector.from_directory(args[0])
+        samples = load(args[1], True) + load(args[2], False)
+    else:
+        detector, samples = synthetic(random.Random(3))
+    
+    for threshold in (0.65, 0.7, 0.73, 0.75, 0.8):
+        detector.threshold = threshold
+        result = detector.evaluate(samples)
+        print(f"threshold {threshold:.2f}: FA {result['false_accept_rate']:6.1%}  "
+              f"FR {result['false_reject_rate']:6.1%}  "
+              f"p50 {result['p50_latency_ms']:6.2f} ms  max {result['max_latency_ms']:6.2f} ms "
+              f"({result['samples']} samples)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,208 @@
+"""In-process stand-in for the Excel object model, for tests and benchmarks without Excel."""
+
+import collections
+import time
+
+from aiva import parse_range
+
+
+class FakeExcelApplication:
+    """In-process stand-in for Excel.Application that counts object model calls.
+    
+    Implements the part of the object model ComExcelBackend uses. Every
+    property get or set and method call is counted in calls (keyed like
+    "Range.Value=") and optionally delayed by latency seconds to model
+    the COM round trip. Formulas are stored, not evaluated.
+    """
+    
+    class _Object:
+        def __init__(self, application: "FakeExcelApplication", kind: str):
+            object.__setattr__(self, "_application", application)
+            object.__setattr__(self, "_kind", kind)
+            object.__setattr__(self, "_properties", {})
+        
+        def _call(self, name: str):
+            self._application._call(f"{self._kind}.{name}")
+        
+        def __getattr__(self, name: str):
+            if name.startswith("_"):
+                raise AttributeError(name)
+            self._call(name)
+            if name in ("Font", "Interior"):
+                return self._properties.setdefault(name, FakeExcelApplication._Object(self._application, name))
+            return self._properties.get(name)
+        
+        def __setattr__(self, name: str, value):
+            self._call(f"{name}=")
+            self._properties[name] = value
+    
+    class _Range(_Object):
+        def __init__(self, sheet: "FakeExcelApplication._Worksheet", address: str):
+            super().__init__(sheet._application, "Range")
+            object.__setattr__(self, "_sheet", sheet)
+            object.__setattr__(self, "_bounds", parse_range(address))
+        
+        def _cells(self):
+            top, left, bottom, right = self._bounds
+            return [[(row, column) for column in range(left, right + 1)] for row in range(top, bottom + 1)]
+        
+        def _store(self, target: dict, value):
+            cells = self._cells()
+            if isinstance(value, (list, tuple)):
+                if len(value) != len(cells) or any(len(row) != len(cells[0]) for row in value):
+                    raise ValueError("Block size does not match the range")
+                for cell_row, value_row in zip(cells, value):
+                    target.update(zip(cell_row, value_row))
+            else:
+                for cell_row in cells:
+                    target.update((cell, value) for cell in cell_row)
+        
+        def __getattr__(self, name: str):
+            if name == "Value":
+                self._call("Value")
+                block = tuple(tuple(self._sheet.values.get(cell) for cell in row) for row in self._cells())
+                return block[0][0] if len(block) == 1 and len(block[0]) == 1 else block
+            if name == "FormatConditions":
+                self._call(name)
+                return self._properties.setdefault(name, FakeExcelApplication._FormatConditions(self._application))
+            return super().__getattr__(name)
+        
+        def __setattr__(self, name: str, value):
+            if name == "Value":
+                self._call("Value=")
+                self._store(self._sheet.values, value)
+            elif name == "Formula":
+                self._call("Formula=")
+                self._store(self._sheet.formulas, value)
+            else:
+                super().__setattr__(name, value)
+    
+    class _FormatConditions(_Object):
+        def __init__(self, application: "FakeExcelApplication"):
+            super().__init__(application, "FormatConditions")
+            object.__setattr__(self, "added", [])
+        
+        def _add(self, kind: str, *args):
+            self._call(kind)
+            condition = FakeExcelApplication._Object(self._application, "FormatCondition")
+            self.added.append((kind, args, condition))
+            self._application.conditions.append((kind, args, condition))
+            return condition
+        
+        def Add(self, *args):
+            return self._add("Add", *args)
+        
+        def AddDatabar(self):
+            return self._add("AddDatabar")
+        
+        def AddColorScale(self, criteria: int):
+            return self._add("AddColorScale", criteria)
+        
+        def AddUniqueValues(self):
+            return self._add("AddUniqueValues")
+        
+        def AddAboveAverage(self):
+            return self._add("AddAboveAverage")
+    
+    class _Worksheet(_Object):
+        def __init__(self, application: "FakeExcelApplication"):
+            super().__init__(application, "Worksheet")
+            object.__setattr__(self, "values", {})
+            object.__setattr__(self, "formulas", {})
+            object.__setattr__(self, "charts", [])
+        
+        def Range(self, address: str):
+            self._call("Range")
+            return FakeExcelApplication._Range(self, address)
+        
+        @property
+        def Shapes(self):
+            self._call("Shapes")
+            return FakeExcelApplication._Shapes(self)
+    
+    class _Shapes(_Object):
+        def __init__(self, sheet: "FakeExcelApplication._Worksheet"):
+            super().__init__(sheet._application, "Shapes")
+            object.__setattr__(self, "_sheet", sheet)
+        
+        def AddChart2(self, style: int = -1, chart_type: int = None, *args):
+            self._call("AddChart2")
+            shape = FakeExcelApplication._Object(self._application, "Shape")
+            chart = FakeExcelApplication._Chart(self._application, chart_type)
+            shape._properties["Chart"] = chart
+            self._sheet.charts.append(chart)
+            return shape
+    
+    class _Chart(_Object):
+        def __init__(self, application: "FakeExcelApplication", chart_type: int):
+            super().__init__(application, "Chart")
+            self._properties["ChartType"] = chart_type
+        
+        def SetSourceData(self, source):
+            self._call("SetSourceData")
+            self._properties["Source"] = source
+    
+    class _Workbook(_Object):
+        def __init__(self, application: "FakeExcelApplication"):
+            super().__init__(application, "Workbook")
+            self._properties["ActiveSheet"] = FakeExcelApplication._Worksheet(application)
+            self._properties["FullName"] = f"Book{len(application.workbooks) + 1}"
+        
+        def Save(self):
+            self._call("Save")
+        
+        def SaveAs(self, filename: str):
+            self._call("SaveAs")
+            self._properties["FullName"] = filename
+        
+        def Close(self, *args):
+            self._call("Close")
+    
+    class _Workbooks(_Object):
+        def Add(self):
+            self._call("Add")
+            workbook = FakeExcelApplication._Workbook(self._application)
+            self._application.workbooks.append(workbook)
+            return workbook
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.workbooks = []
+        self.settings = {"Visible": False, "ScreenUpdating": True, "EnableEvents": True,
+                         "Calculation": -4105}
+        # Every conditional format added, on any range
+        self.conditions = []
+        # Application settings seen by each Range.Value write, to check batching
+        self.writes = []
+        self.quit = False
+    
+    def _call(self, name: str):
+        self.calls[name] += 1
+        if name == "Range.Value=":
+            self.writes.append(dict(self.settings))
+        if self.latency:
+            time.sleep(self.latency)
+    
+    @property
+    def call_count(self) -> int:
+        return sum(self.calls.values())
+    
+    def __getattr__(self, name: str):
+        if not name[:1].isupper():
+            raise AttributeError(name)
+        self._call(f"Application.{name}")
+        if name == "Workbooks":
+            return FakeExcelApplication._Workbooks(self, "Workbooks")
+        return self.settings.get(name)
+    
+    def __setattr__(self, name: str, value):
+        if name[:1].isupper():
+            self._call(f"Application.{name}=")
+            self.settings[name] = value
+        else:
+            object.__setattr__(self, name, value)
+    
+    def Quit(self):
+        self._call("Application.Quit")
+        self.quit = True
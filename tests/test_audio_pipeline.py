@@ -0,0 +1,252 @@
+"""Audio pipeline: segmentation, ordering, overflow accounting and stopping, fed from known arrays."""
+
+import array
+import logging
+import math
+import queue
+import threading
+import time
+import types
+
+import pytest
+
+from aiva import ArrayAudioSource, AudioPipeline, AudioRingBuffer, NoiseFloorTracker, VoiceManager
+
+RATE = 16000
+CHUNK = 160  # 10 ms
+
+
+def pcm(*segments):
+    """16-bit mono PCM from (seconds, amplitude) segments: a 440 Hz tone, or silence at amplitude 0"""
+    samples = array.array('h')
+    for seconds, amplitude in segments:
+        count = int(seconds * RATE)
+        samples.extend(int(amplitude * math.sin(2 * math.pi * 440 * index / RATE)) for index in range(count))
+    return samples
+
+
+def calibrated_tracker(cls=NoiseFloorTracker):
+    tracker = cls(initial_threshold=300.0)
+    tracker.calibrate([])
+    return tracker
+
+
+def run_pipeline(source, recognize=None, gate=None, timeout=10.0, **kwargs):
+    transcripts = []
+    pipeline = AudioPipeline(source, recognize or (lambda audio: f"{len(audio.frame_data) // 2}"),
+                             transcripts.append, logging.getLogger("test"), gate=gate,
+                             noise_tracker=kwargs.pop("noise_tracker", None) or calibrated_tracker(),
+                             pause_threshold=0.2, phrase_threshold=0.1, non_speaking_duration=0.05,
+                             **kwargs)
+    pipeline.start()
+    assert pipeline.wait(timeout)
+    return pipeline, transcripts
+
+
+def test_phrases_are_cut_on_silence_and_dispatched_in_order():
+    data = pcm((0.3, 0), (0.5, 4000), (0.4, 0), (0.3, 4000), (0.4, 0))
+    lengths = []
+    
+    def recognize(audio):
+        # The first phrase finishes last; the dispatcher still keeps spoken order
+        samples = len(audio.frame_data) // 2
+        if not lengths:
+            time.sleep(0.1)
+        lengths.append(samples)
+        return str(samples)
+    
+    pipeline, transcripts = run_pipeline(ArrayAudioSource(data, frames_per_chunk=CHUNK), recognize, workers=2)
+    
+    assert len(transcripts) == 2
+    first, second = (int(transcript) for transcript in transcripts)
+    # Preroll + speech + the silence that ended the phrase
+    assert first == (5 + 50 + 20) * CHUNK
+    assert second == (5 + 30 + 20) * CHUNK
+    assert pipeline.stats == {"chunks": len(data) // CHUNK, "phrases": 2, "recognized": 2, "dispatched": 2}
+    assert pipeline.dropped_chunks == 0 and pipeline.dropped_phrases == 0
+
+
+def test_gate_drops_phrases_before_recognition():
+    data = pcm((0.2, 0), (0.3, 4000), (0.3, 0), (0.3, 4000), (0.3, 0))
+    recognized = []
+    gated = iter([None, "keep"])
+    
+    def gate(audio):
+        return audio if next(gated) else None
+    
+    def recognize(audio):
+        recognized.append(audio)
+        return "second"
+    
+    pipeline, transcripts = run_pipeline(ArrayAudioSource(data, frames_per_chunk=CHUNK), recognize, gate=gate,
+                                         workers=1)
+    assert transcripts == ["second"]
+    assert len(recognized) == 1
+    assert pipeline.stats["phrases"] == 2 and pipeline.stats["recognized"] == 1
+
+
+class SignallingSource(ArrayAudioSource):
+    """Sets exhausted once every chunk has been read"""
+    
+    def __init__(self, data, **kwargs):
+        super().__init__(data, **kwargs)
+        self.exhausted = threading.Event()
+    
+    def read(self):
+        chunk = super().read()
+        if chunk is None:
+            self.exhausted.set()
+        return chunk
+
+
+class StalledTracker(NoiseFloorTracker):
+    """Holds the segmenter on its first chunk until released, counting chunks seen"""
+    
+    def __init__(self, release: threading.Event, **kwargs):
+        super().__init__(**kwargs)
+        self.release = release
+        self.observed = 0
+    
+    def observe(self, energy, duration):
+        self.observed += 1
+        self.release.wait(5)
+        return super().observe(energy, duration)
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "block"])
+def test_frame_buffer_overflow_is_accounted(policy):
+    data = pcm((1.0, 0))
+    total = len(data) // CHUNK
+    source = SignallingSource(data, frames_per_chunk=CHUNK)
+    release = source.exhausted
+    if policy == "block":
+        # Capture waits on the full buffer and never reaches the end on its own
+        release = threading.Event()
+        threading.Timer(0.1, release.set).start()
+    tracker = calibrated_tracker(lambda **kwargs: StalledTracker(release, **kwargs))
+    # Ten 10 ms chunks of buffer against 100 chunks of audio
+    pipeline, _ = run_pipeline(source, noise_tracker=tracker, buffer_seconds=0.1, policy=policy)
+    
+    assert pipeline.stats["chunks"] == total
+    assert tracker.observed + pipeline.dropped_chunks == total
+    if policy == "block":
+        assert pipeline.dropped_chunks == 0
+    else:
+        # At most the chunk being observed plus a full buffer survived the stall
+        assert pipeline.dropped_chunks >= total - 1 - 10
+
+
+def test_dropped_phrases_are_logged_and_skipped_in_order(caplog):
+    data = pcm(*[(0.3, 4000), (0.3, 0)] * 5)
+    release = threading.Event()
+    seen = []
+    
+    def recognize(audio):
+        seen.append(audio)
+        release.wait(5)
+        return f"phrase {len(seen)}"
+    
+    source = SignallingSource(data, frames_per_chunk=CHUNK)
+    threading.Thread(target=lambda: source.exhausted.wait(5) and release.set(), daemon=True).start()
+    with caplog.at_level(logging.WARNING):
+        pipeline, transcripts = run_pipeline(source, recognize, workers=1, phrase_queue_size=1)
+    
+    assert pipeline.stats["phrases"] == 5
+    assert pipeline.dropped_phrases == 5 - len(seen)
+    assert pipeline.dropped_phrases >= 1
+    assert transcripts == [f"phrase {index}" for index in range(1, len(seen) + 1)]
+    assert sum("recognizers are falling behind" in record.message for record in caplog.records) == \
+        pipeline.dropped_phrases
+
+
+class StoppingSource(ArrayAudioSource):
+    """Stops the pipeline after a given number of chunks"""
+    
+    def __init__(self, data, stop_after: int, **kwargs):
+        super().__init__(data, **kwargs)
+        self.stop_after = stop_after
+        self.pipeline = None
+        self.reads = 0
+    
+    def read(self):
+        self.reads += 1
+        if self.reads == self.stop_after:
+            self.pipeline.stop()
+        return super().read()
+
+
+def stopped_run(data, stop_after):
+    source = StoppingSource(data, stop_after, frames_per_chunk=CHUNK)
+    transcripts = []
+    pipeline = AudioPipeline(source, lambda audio: str(len(audio.frame_data) // 2), transcripts.append,
+                             logging.getLogger("test"), noise_tracker=calibrated_tracker(),
+                             pause_threshold=0.2, phrase_threshold=0.1, non_speaking_duration=0.05)
+    source.pipeline = pipeline
+    pipeline.start()
+    assert pipeline.wait(10)
+    return pipeline, transcripts
+
+
+def test_stopping_mid_utterance_dispatches_the_partial_phrase():
+    # Stop 40 chunks into a 2 s utterance
+    pipeline, transcripts = stopped_run(pcm((0.2, 0), (2.0, 4000)), stop_after=20 + 40)
+    
+    assert pipeline.stats["chunks"] == 60
+    assert transcripts == [str((5 + 40) * CHUNK)]
+    assert not pipeline.is_running()
+
+
+def test_stopping_before_enough_speech_dispatches_nothing():
+    # 5 chunks of speech is under the 0.1 s phrase threshold
+    pipeline, transcripts = stopped_run(pcm((0.2, 0), (2.0, 4000)), stop_after=20 + 5)
+    
+    assert transcripts == []
+    assert pipeline.stats["phrases"] == 0
+
+
+def test_ring_buffer_drop_oldest_keeps_the_newest():
+    dropped = []
+    buffer = AudioRingBuffer(3, on_drop=dropped.append)
+    for item in range(5):
+        assert buffer.put(item)
+    buffer.close()
+    
+    assert dropped == [0, 1] and buffer.dropped == 2
+    assert [buffer.get(), buffer.get(), buffer.get(), buffer.get()] == [2, 3, 4, None]
+    assert buffer.put(5) is False
+
+
+def test_ring_buffer_block_waits_for_the_consumer():
+    buffer = AudioRingBuffer(1, policy="block")
+    buffer.put("first")
+    put_done = threading.Event()
+    threading.Thread(target=lambda: buffer.put("second") and put_done.set(), daemon=True).start()
+    
+    assert not put_done.wait(0.05)
+    assert buffer.get() == "first"
+    assert put_done.wait(1)
+    assert buffer.get() == "second" and buffer.dropped == 0
+    with pytest.raises(queue.Empty):
+        buffer.get(timeout=0.01)
+
+
+def test_command_window_is_claimed_by_one_recognizer_worker():
+    voice = types.SimpleNamespace(_wake_lock=threading.Lock(), _command_deadline=time.monotonic() + 60,
+                                  wake_word_detector=types.SimpleNamespace(detect=lambda audio: None))
+    voice._claim_command_window = lambda: VoiceManager._claim_command_window(voice)
+    start = threading.Barrier(8)
+    passed = []
+    
+    def worker(index):
+        start.wait()
+        if VoiceManager._wake_gate(voice, index) is not None:
+            passed.append(index)
+    
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(passed) == 1
+    assert voice._command_deadline == 0.0
@@ -0,0 +1,112 @@
+"""Headless replay: reading command files, side-effect recording and the routing exit code."""
+
+import io
+import json
+import logging
+import subprocess
+import sys
+import webbrowser
+
+import pytest
+
+import aiva
+from aiva import BatchRunner, WebSearchManager, lazy_import, recording_side_effects
+
+
+def test_read_commands_takes_text_and_jsonl_and_skips_comments():
+    lines = io.StringIO("\n".join([
+        "# warm-up commands",
+        "open excel",
+        "",
+        '{"command": "what time is it", "expected": "utility"}',
+        '   {"command": "play some music"}   ',
+        "   # indented comment",
+        "  search for cats  "
+    ]))
+    
+    assert BatchRunner.read_commands(lines) == [
+        {"command": "open excel", "expected": None},
+        {"command": "what time is it", "expected": "utility"},
+        {"command": "play some music", "expected": None},
+        {"command": "search for cats", "expected": None}
+    ]
+
+
+def test_read_commands_rejects_broken_json():
+    with pytest.raises(json.JSONDecodeError):
+        BatchRunner.read_commands(['{"command": "open excel"'])
+    with pytest.raises(KeyError):
+        BatchRunner.read_commands(['{"expected": "excel"}'])
+
+
+def test_side_effects_are_recorded_then_restored():
+    real_modules = {name: sys.modules.get(name) for name in aiva.SIDE_EFFECT_MODULES}
+    calls = []
+    
+    with recording_side_effects(calls) as recorded:
+        assert recorded is calls
+        WebSearchManager(logging.getLogger("test")).search_web("cats")
+        aiva.subprocess.run(["shutdown", "/s"], check=False)
+        lazy_import("pyautogui").hotkey("ctrl", "enter")
+        excel = lazy_import("win32com.client").Dispatch("Excel.Application")
+        excel.Workbooks.Add()
+    
+    assert calls == [
+        ("webbrowser.open", ("https://www.google.com/search?q=cats",), {}),
+        ("subprocess.run", (["shutdown", "/s"],), {"check": False}),
+        ("pyautogui.hotkey", ("ctrl", "enter"), {}),
+        ("win32com.client.Dispatch", ("Excel.Application",), {}),
+        ("win32com.client.Dispatch().Workbooks.Add", (), {})
+    ]
+    assert aiva.webbrowser is webbrowser
+    assert aiva.subprocess is subprocess
+    assert {name: sys.modules.get(name) for name in aiva.SIDE_EFFECT_MODULES} == real_modules
+
+
+def test_side_effects_are_restored_after_an_error():
+    real_modules = {name: sys.modules.get(name) for name in aiva.SIDE_EFFECT_MODULES}
+    
+    with pytest.raises(RuntimeError):
+        with recording_side_effects([]):
+            raise RuntimeError("handler failed")
+    
+    assert aiva.webbrowser is webbrowser and aiva.subprocess is subprocess
+    assert {name: sys.modules.get(name) for name in aiva.SIDE_EFFECT_MODULES} == real_modules
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch, capsys):
+    # The log file and default config are created relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    
+    def run(*records, json_report=True):
+        commands = tmp_path / "commands.jsonl"
+        commands.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+        args = ["--batch", str(commands), "--db", str(tmp_path / "replay.db"),
+                "--config", str(tmp_path / "aiva_config.ini")]
+        code = aiva.main(args + ["--json"] if json_report else args)
+        output = capsys.readouterr().out
+        return code, json.loads(output) if json_report else output
+    
+    return run
+
+
+def test_replay_exits_zero_when_every_route_matches(replay):
+    code, report = replay({"command": "open excel", "expected": "excel"},
+                          {"command": "what time is it", "expected": "utility"},
+                          {"command": "good morning", "expected": "unrouted"},
+                          {"command": "play some music"})
+    
+    assert code == 0
+    assert report["commands"] == 4
+    assert report["routing_checked"] == 3 and report["routing_accuracy"] == 1.0
+    assert report["mismatches"] == []
+
+
+def test_replay_exits_one_on_a_routing_mismatch(replay):
+    code, output = replay({"command": "open excel", "expected": "web"},
+                          {"command": "what time is it", "expected": "utility"}, json_report=False)
+    
+    assert code == 1
+    assert "Routing: 50.0% of 2 commands routed as expected" in output
+    assert "'open excel': expected web, routed excel" in output
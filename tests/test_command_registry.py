@@ -0,0 +1,29 @@
+"""Command registry: the router is compiled once from every manifest and kept until one is registered."""
+
+from aiva import BUILTIN_COMMANDS, CommandManifest, CommandRegistry, IntentRouter
+
+
+def test_router_is_compiled_once_per_priority_order():
+    registry = CommandRegistry(BUILTIN_COMMANDS)
+    router = registry.router()
+    
+    assert registry.router() is router
+    assert registry.router(["web", "excel"]) is not router
+    assert registry.router(["web", "excel"]).priority[:2] == ["web", "excel"]
+    
+    registry.register(CommandManifest("lights", ["lamp"], "plugin:handle"))
+    rebuilt = registry.router()
+    assert rebuilt is not router
+    assert rebuilt.route("switch the lamp off") == "lights"
+
+
+def test_prefix_keywords_are_expanded_from_the_longest_match():
+    router = IntentRouter({"short": ["note"], "long": ["notepad"], "other": ["pad"]}, ["short", "long", "other"])
+    
+    assert router.prefixes == {"note": [], "notepad": ["note"], "pad": []}
+    assert router.match("open notepad") == {
+        "short": [(5, 9, "note")],
+        "long": [(5, 12, "notepad")],
+        "other": [(9, 12, "pad")]
+    }
+    assert router.route("open notepad") == "short"
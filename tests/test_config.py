@@ -0,0 +1,183 @@
+"""Configuration: typed snapshots, fallback to defaults, reloads and subscribers."""
+
+import concurrent.futures
+import os
+import textwrap
+import types
+
+import pytest
+
+from aiva import AIVA, BUILTIN_COMMANDS, CONFIG_DEFAULTS, AIVAConfig, CommandRegistry, UtteranceCache
+
+
+def write(path, text):
+    path.write_text(textwrap.dedent(text))
+    # Reloads are triggered by the size and mtime changing; make sure both do
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    return tmp_path / "config" / "aiva_config.ini"
+
+
+def test_missing_file_is_written_with_the_defaults(config_file):
+    config = AIVAConfig(str(config_file))
+    
+    assert config_file.exists()
+    assert config.errors == []
+    assert config.settings.SPEECH_RECOGNITION.timeout == 5.0
+    assert config.get("SPEECH_RECOGNITION", "timeout") == CONFIG_DEFAULTS["SPEECH_RECOGNITION"]["timeout"]
+
+
+def test_values_are_parsed_by_type(config_file):
+    config_file.parent.mkdir()
+    write(config_file, """
+        [SPEECH_RECOGNITION]
+        ambient_duration = 0.25
+        recognizer_workers = 3
+        
+        [VOICE]
+        barge_in = no
+        
+        [ROUTING]
+        priority = web , excel,,email
+    """)
+    settings = AIVAConfig(str(config_file)).settings
+    
+    # A float, not truncated to an int as getint() would
+    assert settings.SPEECH_RECOGNITION.ambient_duration == 0.25
+    assert settings.SPEECH_RECOGNITION.recognizer_workers == 3
+    assert settings.VOICE.barge_in is False
+    assert settings.ROUTING.priority == ("web", "excel", "email")
+    # Keys missing from the file take their defaults
+    assert settings.SPEECH_RECOGNITION.timeout == 5.0
+
+
+@pytest.mark.parametrize("section, key, value, default", [
+    ("SPEECH_RECOGNITION", "ambient_duration", "half a second", 0.5),
+    ("SPEECH_RECOGNITION", "recognizer_workers", "0", 2),
+    ("SPEECH_RECOGNITION", "noise_damping", "1.5", 0.15),
+    ("VOICE", "barge_in", "maybe", True),
+    ("LOGGING", "level", "LOUD", "INFO")
+])
+def test_bad_values_fall_back_to_the_default_and_are_reported(config_file, section, key, value, default):
+    config_file.parent.mkdir()
+    write(config_file, f"[{section}]\n{key} = {value}\n")
+    config = AIVAConfig(str(config_file))
+    
+    assert len(config.errors) == 1 and config.errors[0].startswith(f"{section}/{key}: ")
+    assert getattr(getattr(config.settings, section), key) == default
+
+
+def test_choices_are_case_insensitive(config_file):
+    config_file.parent.mkdir()
+    write(config_file, "[LOGGING]\nlevel = debug\n")
+    assert AIVAConfig(str(config_file)).settings.LOGGING.level == "DEBUG"
+
+
+def test_editing_the_file_produces_a_new_snapshot(config_file):
+    config = AIVAConfig(str(config_file))
+    before = config.settings
+    changes = []
+    config.subscribe(lambda settings, previous: changes.append((settings, previous)))
+    
+    write(config_file, "[SPEECH_RECOGNITION]\nambient_duration = 1.25\n")
+    assert config.reload()
+    
+    assert config.settings is not before
+    assert config.settings.SPEECH_RECOGNITION.ambient_duration == 1.25
+    # The old snapshot is never modified
+    assert before.SPEECH_RECOGNITION.ambient_duration == 0.5
+    assert changes == [(config.settings, before)]
+    assert config.reloads == 1
+
+
+def test_reload_without_changes_does_not_notify(config_file):
+    config = AIVAConfig(str(config_file))
+    changes = []
+    config.subscribe(lambda settings, previous: changes.append(settings))
+    
+    assert config.reload()
+    assert changes == []
+
+
+def test_invalid_reload_keeps_the_current_settings(config_file):
+    config = AIVAConfig(str(config_file))
+    before = config.settings
+    changes = []
+    config.subscribe(lambda settings, previous: changes.append(settings))
+    
+    write(config_file, "[SPEECH_RECOGNITION]\nambient_duration = -1\n")
+    assert not config.reload()
+    assert config.settings is before
+    assert config.errors == ["SPEECH_RECOGNITION/ambient_duration: -1.0 is outside 0.0..inf"]
+    assert changes == []
+    
+    write(config_file, "not an ini file")
+    assert not config.reload()
+    assert config.settings is before
+
+
+def test_subscriber_errors_are_recorded_and_others_still_run(config_file):
+    config = AIVAConfig(str(config_file))
+    seen = []
+    
+    def broken(settings, previous):
+        raise RuntimeError("boom")
+    
+    config.subscribe(broken)
+    config.subscribe(lambda settings, previous: seen.append(settings.VOICE.rate))
+    write(config_file, "[VOICE]\nrate = 180\n")
+    
+    assert config.reload()
+    assert seen == [180]
+    assert any("boom" in error for error in config.errors)
+
+
+def test_overrides_survive_reloads(config_file):
+    config = AIVAConfig(str(config_file))
+    config.set("VOICE", "rate", 200)
+    assert config.settings.VOICE.rate == 200
+    
+    write(config_file, "[VOICE]\nvolume = 0.5\n")
+    assert config.reload()
+    assert (config.settings.VOICE.rate, config.settings.VOICE.volume) == (200, 0.5)
+
+
+def test_watcher_applies_file_edits(config_file):
+    config = AIVAConfig(str(config_file))
+    reloaded = []
+    config.subscribe(lambda settings, previous: reloaded.append(settings.SPEECH_RECOGNITION.timeout))
+    config.watch(interval=0.01)
+    try:
+        write(config_file, "[SPEECH_RECOGNITION]\ntimeout = 9\n")
+        for _ in range(500):
+            if reloaded:
+                break
+            config._stop.wait(0.01)
+    finally:
+        config.stop()
+    
+    assert reloaded == [9.0]
+
+
+def test_assistant_applies_reloaded_routing_and_cache_settings(config_file):
+    config = AIVAConfig(str(config_file))
+    router = concurrent.futures.Future()
+    assistant = types.SimpleNamespace(config=config, commands=CommandRegistry(BUILTIN_COMMANDS), _router=router,
+                                      _classifier=None, utterances=UtteranceCache(size=8))
+    assistant.create_router = lambda: AIVA.create_router(assistant)
+    config.subscribe(lambda settings, previous: AIVA._on_config_change(assistant, settings, previous))
+    assistant.utterances.put("open excel", "excel")
+    
+    write(config_file, "[ROUTING]\npriority = web, excel\n\n[UTTERANCE_CACHE]\nsize = 2\n")
+    assert config.reload()
+    
+    assert assistant._router is not router
+    assert assistant._router.result(timeout=5).priority[:2] == ["web", "excel"]
+    assert assistant._classifier is None
+    assert assistant.utterances.size == 2
+    # Categories cached under the old routing are dropped
+    assert assistant.utterances.get("open excel") is UtteranceCache.MISS
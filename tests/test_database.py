@@ -0,0 +1,342 @@
+"""Database: the write-behind command log, schema migrations, history pages, aggregates and full-text search."""
+
+import sqlite3
+import time
+
+import pytest
+
+from aiva import AIVADatabase
+
+
+class RecordingConnection:
+    """Passes everything through to a connection, noting the size of each executemany batch"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.batches = []
+    
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self.batches.append(len(rows))
+        return self.connection.executemany(sql, rows)
+    
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    databases = []
+    
+    def make(**kwargs):
+        database = AIVADatabase(str(tmp_path / "aiva.db"), **kwargs)
+        databases.append(database)
+        return database
+    
+    yield make
+    for database in databases:
+        database.close()
+
+
+def stored_commands(database):
+    """Rows another connection can see, oldest first"""
+    with sqlite3.connect(database.db_path) as connection:
+        return [row[0] for row in connection.execute("SELECT command FROM command_history ORDER BY id")]
+
+
+def test_flush_makes_queued_commands_visible_without_waiting(make_database):
+    database = make_database(flush_interval=60)
+    for index in range(3):
+        database.log_command(f"command {index}", category="web")
+    
+    start = time.monotonic()
+    database.flush()
+    assert time.monotonic() - start < 5
+    assert stored_commands(database) == ["command 0", "command 1", "command 2"]
+    assert database.get_command_history()[0]["category"] == "web"
+
+
+def test_flush_with_nothing_queued_returns_at_once(make_database):
+    database = make_database(flush_interval=60)
+    start = time.monotonic()
+    database.flush()
+    assert time.monotonic() - start < 1
+    assert stored_commands(database) == []
+
+
+def test_close_drains_the_queue(make_database):
+    database = make_database(flush_interval=60)
+    for index in range(10):
+        database.log_command(f"command {index}")
+    
+    start = time.monotonic()
+    database.close()
+    assert time.monotonic() - start < 5
+    assert stored_commands(database) == [f"command {index}" for index in range(10)]
+    
+    # Commands logged after closing are dropped, not queued forever
+    database.log_command("too late")
+    database.close()
+    assert len(stored_commands(database)) == 10
+
+
+def test_batches_respect_batch_size(make_database):
+    database = make_database(flush_interval=60, batch_size=4)
+    connection = database._conn = RecordingConnection(database._conn)
+    for index in range(10):
+        database.log_command(f"command {index}")
+    database.flush()
+    
+    assert connection.batches == [4, 4, 2]
+    assert stored_commands(database) == [f"command {index}" for index in range(10)]
+
+
+def test_batches_are_cut_by_flush_interval(make_database):
+    database = make_database(flush_interval=0.05, batch_size=100)
+    connection = database._conn = RecordingConnection(database._conn)
+    database.log_command("first")
+    deadline = time.monotonic() + 5
+    while not connection.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    database.log_command("second")
+    database.flush()
+    
+    assert connection.batches == [1, 1]
+    assert stored_commands(database) == ["first", "second"]
+
+
+def baseline_database(path):
+    """A database as the first release left it: no category column, indexes or user_version"""
+    with sqlite3.connect(path) as connection:
+        connection.executescript("""
+            CREATE TABLE command_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                command TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                success BOOLEAN DEFAULT TRUE,
+                response TEXT
+            );
+            CREATE TABLE user_preferences (key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                                           updated DATETIME DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE email_templates (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL,
+                                          subject TEXT, body TEXT, created DATETIME DEFAULT CURRENT_TIMESTAMP);
+        """)
+        connection.executemany("INSERT INTO command_history (command, success, response) VALUES (?, ?, ?)", [
+            ("open excel", True, "Excel command executed"),
+            ("send email to john", False, "Email command executed"),
+            ("what time is it", True, "Utility command executed"),
+            ("hello there", False, "I'm sorry, I don't understand that command.")
+        ])
+        connection.execute("INSERT INTO email_templates (name, subject, body) VALUES ('meeting', 'Meeting', 'Agenda')")
+
+
+def test_baseline_database_is_migrated_to_the_latest_version(tmp_path, make_database):
+    path = tmp_path / "aiva.db"
+    baseline_database(str(path))
+    
+    database = make_database()
+    assert database.schema_version() == AIVADatabase.MIGRATIONS[-1][0] == 5
+    assert [entry["category"] for entry in database.get_command_history()] == [None, "utility", "email", "excel"]
+    with sqlite3.connect(str(path)) as connection:
+        names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    assert {"idx_command_history_timestamp", "idx_command_history_category", "command_history_fts",
+            "email_templates_fts", "metrics", "utterance_cache_stats"} <= names
+    # The full-text indexes are rebuilt from the existing rows
+    assert [entry["command"] for entry in database.search_command_history("excel")] == ["open excel"]
+    assert database.search_email_templates("agenda")[0]["name"] == "meeting"
+
+
+def test_migrating_again_changes_nothing(tmp_path, make_database):
+    baseline_database(str(tmp_path / "aiva.db"))
+    make_database().close()
+    
+    database = make_database()
+    assert database.schema_version() == 5
+    database.migrate()
+    assert len(database.get_command_history()) == 4
+
+
+def test_failed_migration_rolls_back(tmp_path, make_database, monkeypatch):
+    baseline_database(str(tmp_path / "aiva.db"))
+    broken = AIVADatabase.MIGRATIONS[:1] + [(2, "Broken", ["CREATE INDEX idx_broken ON command_history (category)",
+                                                           "SELECT * FROM no_such_table"])]
+    monkeypatch.setattr(AIVADatabase, "MIGRATIONS", broken)
+    
+    with pytest.raises(sqlite3.OperationalError):
+        make_database()
+    with sqlite3.connect(str(tmp_path / "aiva.db")) as connection:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == 1
+        assert connection.execute("SELECT name FROM sqlite_master WHERE name = 'idx_broken'").fetchone() is None
+
+
+def insert_history(database, rows):
+    """Insert (command, timestamp, success, category) rows directly, bypassing the write-behind queue"""
+    with sqlite3.connect(database.db_path) as connection:
+        connection.executemany(
+            "INSERT INTO command_history (command, timestamp, success, response, category) VALUES (?, ?, ?, '', ?)",
+            rows
+        )
+
+
+def test_history_pages_follow_the_keyset_cursor(make_database):
+    database = make_database()
+    # Two commands share each timestamp, so the id breaks ties
+    insert_history(database, [(f"command {index}", f"2026-01-01 10:00:{index // 2:02d}", index % 3 != 0, "web")
+                              for index in range(7)])
+    
+    pages, cursor = [], None
+    while True:
+        page, cursor = database.get_command_history_page(limit=3, cursor=cursor)
+        pages.append([entry["command"] for entry in page])
+        if cursor is None:
+            break
+    assert pages == [["command 6", "command 5", "command 4"], ["command 3", "command 2", "command 1"],
+                     ["command 0"]]
+    
+    page, cursor = database.get_command_history_page(limit=2, success=False)
+    assert [entry["command"] for entry in page] == ["command 6", "command 3"]
+    page, cursor = database.get_command_history_page(limit=2, cursor=cursor, success=False)
+    assert [entry["command"] for entry in page] == ["command 0"] and cursor is None
+
+
+def test_a_full_last_page_is_followed_by_an_empty_one(make_database):
+    database = make_database()
+    insert_history(database, [(f"command {index}", "2026-01-01 10:00:00", True, None) for index in range(4)])
+    
+    page, cursor = database.get_command_history_page(limit=2)
+    page, cursor = database.get_command_history_page(limit=2, cursor=cursor)
+    assert len(page) == 2 and cursor is not None
+    assert database.get_command_history_page(limit=2, cursor=cursor) == ([], None)
+
+
+def test_aggregates_are_computed_in_sql(make_database):
+    database = make_database()
+    insert_history(database, [
+        ("open excel", "2026-01-01 09:15:00", True, "excel"),
+        ("open excel", "2026-01-01 09:45:00", False, "excel"),
+        ("open excel", "2026-01-01 10:05:00", True, "excel"),
+        ("send email", "2026-01-01 10:10:00", True, "email"),
+        ("mumble", "2026-01-01 12:00:00", False, None)
+    ])
+    
+    rates = database.get_success_rate_by_category()
+    # Most used first; email and unknown tie
+    assert rates[0] == {"category": "excel", "total": 3, "succeeded": 2, "success_rate": pytest.approx(2 / 3)}
+    assert sorted(rates[1:], key=lambda rate: rate["category"]) == [
+        {"category": "email", "total": 1, "succeeded": 1, "success_rate": 1.0},
+        {"category": "unknown", "total": 1, "succeeded": 0, "success_rate": 0.0}
+    ]
+    assert database.get_top_commands(limit=2) == [{"command": "open excel", "count": 3},
+                                                  {"command": "mumble", "count": 1}]
+    assert database.get_commands_per_hour() == [{"hour": "2026-01-01 09:00", "count": 2},
+                                                {"hour": "2026-01-01 10:00", "count": 2},
+                                                {"hour": "2026-01-01 12:00", "count": 1}]
+    assert database.get_commands_per_hour(since="2026-01-01 10:00:00") == [{"hour": "2026-01-01 10:00", "count": 2},
+                                                                          {"hour": "2026-01-01 12:00", "count": 1}]
+
+
+@pytest.fixture
+def history(make_database):
+    database = make_database(flush_interval=60)
+    for command in ["open the spreadsheet", "open youtube", "send email to john about the budget",
+                    "what is the weather tomorrow", "open the budget spreadsheet"]:
+        database.log_command(command, response="done")
+    return database
+
+
+def searched(database, text, **kwargs):
+    return [entry["command"] for entry in database.search_command_history(text, **kwargs)]
+
+
+def test_history_search_finds_queued_commands_newest_first(history):
+    assert searched(history, "spreadsheet") == ["open the budget spreadsheet", "open the spreadsheet"]
+    assert searched(history, "budget spreadsheet") == ["open the budget spreadsheet"]
+    assert searched(history, "open", limit=2) == ["open the budget spreadsheet", "open youtube"]
+    assert searched(history, "opened") == []
+
+
+def test_history_search_prefix_matches_the_last_word(history):
+    assert searched(history, "spread") == ["open the budget spreadsheet", "open the spreadsheet"]
+    assert searched(history, "weather tomor") == ["what is the weather tomorrow"]
+    # Cut to six characters, so a longer half-heard word still matches
+    assert searched(history, "spreadshxx") == ["open the budget spreadsheet", "open the spreadsheet"]
+    # Only the last word is a prefix
+    assert searched(history, "spread budget") == []
+    assert searched(history, "spread", prefix=False) == []
+
+
+def test_history_search_by_relevance(history):
+    assert searched(history, "budget", rank="relevance")[0] == "open the budget spreadsheet"
+    assert set(searched(history, "budget", rank="relevance")) == {"open the budget spreadsheet",
+                                                                  "send email to john about the budget"}
+
+
+def test_history_index_follows_updates_and_deletes(history):
+    history.flush()
+    with sqlite3.connect(history.db_path) as connection:
+        connection.execute("UPDATE command_history SET command = 'play some jazz' WHERE command = 'open youtube'")
+        connection.execute("DELETE FROM command_history WHERE command = 'open the spreadsheet'")
+    
+    assert searched(history, "youtube") == []
+    assert searched(history, "jazz") == ["play some jazz"]
+    assert searched(history, "spreadsheet") == ["open the budget spreadsheet"]
+
+
+@pytest.mark.parametrize("text", ['"', "", "   ", "*", "open AND", "open OR", "NEAR(", "name : agenda"])
+def test_malformed_queries_find_nothing(history, text):
+    history.save_email_template("meeting", "Meeting", "agenda")
+    assert history.search_command_history(text) == []
+    assert history.search_email_templates(text) == []
+    assert history.suggest_email_template(text) is None
+
+
+def test_query_syntax_is_searched_as_plain_words(history):
+    assert searched(history, '(youtube") OR') == []
+    assert searched(history, '"open" (youtube') == ["open youtube"]
+
+
+@pytest.fixture
+def templates(make_database):
+    database = make_database()
+    database.save_email_template("meeting", "Team meeting", "The agenda for {subject} is attached")
+    database.save_email_template("weekly numbers for finance", "Numbers", "See you at the meeting")
+    database.save_email_template("thank you", "Thanks", "Thank you for your help")
+    return database
+
+
+def test_template_search_covers_names_subjects_and_bodies(templates):
+    assert [entry["name"] for entry in templates.search_email_templates("agenda")] == ["meeting"]
+    assert [entry["name"] for entry in templates.search_email_templates("numb")] == ["weekly numbers for finance"]
+    assert {entry["name"] for entry in templates.search_email_templates("meeting")} == {
+        "meeting", "weekly numbers for finance"}
+    assert templates.search_email_templates("than", prefix=False) == []
+
+
+def test_template_index_follows_upserts_and_deletes(templates):
+    templates.save_email_template("meeting", "Team meeting", "Minutes from today")
+    assert templates.search_email_templates("agenda") == []
+    assert templates.search_email_templates("minutes")[0]["name"] == "meeting"
+    
+    with sqlite3.connect(templates.db_path) as connection:
+        connection.execute("DELETE FROM email_templates WHERE name = 'thank you'")
+    assert templates.search_email_templates("thank") == []
+
+
+@pytest.mark.parametrize("heard, expected", [
+    ("meeting", "meeting"),
+    ("meet", "meeting"),
+    ("weekly numbers", "weekly numbers for finance"),
+    ("thank", "thank you"),
+    # Not in any name: "did you mean" falls back to close spellings
+    ("meating", "meeting"),
+    ("thank yu", "thank you"),
+    ("invoice", None)
+])
+def test_template_suggestions(templates, heard, expected):
+    assert templates.suggest_email_template(heard) == expected
+
+
+def test_suggestion_needs_every_term_in_the_name(templates):
+    # "weekly" is in a name and "meet" only in that template's body, so the
+    # name filter must cover both terms for this to find nothing
+    assert templates.suggest_email_template("weekly meet") is None
@@ -0,0 +1,107 @@
+"""Email commands: EMAIL_GRAMMAR, spoken addresses and template sends."""
+
+import logging
+import types
+
+import pytest
+
+from aiva import EmailManager, parse_email_intent, spoken_email_address
+
+
+class TemplateStore:
+    """The template lookups EmailManager makes on AIVADatabase"""
+    
+    def __init__(self, **templates):
+        self.templates = templates
+    
+    def render_email_template(self, name, recipient=""):
+        template = self.templates.get(name)
+        return dict(template, recipient=recipient) if template else None
+    
+    def suggest_email_template(self, name):
+        return next((known for known in self.templates if known.startswith(name[:4])), None)
+
+
+@pytest.fixture
+def manager():
+    settings = types.SimpleNamespace(EMAIL=types.SimpleNamespace(default_domain="example.org"))
+    store = TemplateStore(meeting={"subject": "Meeting request", "body": "Can we meet?"})
+    return EmailManager(types.SimpleNamespace(settings=settings), logging.getLogger("test"), store)
+
+
+@pytest.mark.parametrize("spoken, address", [
+    # A domain heard with its dot already in place keeps a single .com
+    ("john dot smith at gmail.com", "john.smith@gmail.com"),
+    ("john at gmail.com", "john@gmail.com"),
+    ("john at gmail", "john@gmail.com"),
+    ("bob at yahoo dot com", "bob@yahoo.com"),
+    ("John Smith at Outlook", "johnsmith@outlook.com"),
+    ("mary dash ann at icloud", "mary-ann@icloud.com"),
+    ("jane underscore doe at company dot org", "jane_doe@company.org"),
+    ("ops at gmail dot co dot uk", "ops@gmail.co.uk"),
+    ("already@example.com", "already@example.com")
+])
+def test_spoken_addresses(spoken, address):
+    assert spoken_email_address(spoken) == address
+
+
+@pytest.mark.parametrize("recipient, address", [
+    ("john", "john@example.org"),
+    ("  john smith ", "johnsmith@example.org"),
+    ("john at gmail", "john@gmail.com"),
+    ("john dot smith at gmail.com", "john.smith@gmail.com")
+])
+def test_bare_names_get_the_default_domain(manager, recipient, address):
+    assert manager.process_email_address(recipient) == address
+
+
+@pytest.mark.parametrize("command, intent", [
+    ("send email using template meeting to john", ("template", "meeting", "john")),
+    ("send an email using template sick", ("template", "sick", None)),
+    ("send mail using template follow_up please to sarah", ("template", "follow_up", "sarah")),
+    ("send email to john at gmail.com about the budget", ("compose", "john at gmail.com", "the budget", None)),
+    ("email to sarah regarding lunch saying see you at noon", ("compose", "sarah", "lunch", "see you at noon")),
+    ("send mail to bob with subject status update body all good", ("compose", "bob", "status update", "all good")),
+    ("send e-mail to john dot smith at gmail dot com about the trip with message pack light",
+     ("compose", "john dot smith at gmail dot com", "the trip", "pack light")),
+    ("open gmail", None),
+    ("send email to john", None),
+    ("what is the weather", None)
+])
+def test_email_grammar(command, intent):
+    assert parse_email_intent(command) == intent
+
+
+def test_compose_keeps_a_spoken_body(manager):
+    assert manager.parse_email_command("Email to Sarah regarding lunch saying see you at noon") == (
+        "sarah", "lunch", "see you at noon")
+
+
+def test_compose_without_a_body_writes_one_for_the_subject(manager):
+    recipient, subject, body = manager.parse_email_command("send email to john about the team meeting")
+    
+    assert (recipient, subject) == ("john", "the team meeting")
+    assert "meet and discuss" in body and "the team meeting" in body
+
+
+def test_an_already_parsed_intent_is_used(manager):
+    intent = ("compose", "anna", "the report", "attached")
+    assert manager.parse_email_command("not parsed again", intent) == ("anna", "the report", "attached")
+
+
+def test_template_send(manager):
+    assert manager.parse_email_command("send email using template meeting to john") == (
+        "john", "Meeting request", "Can we meet?")
+    assert manager.last_template_correction is None
+
+
+def test_misheard_template_uses_the_suggestion(manager):
+    assert manager.parse_email_command("send email using template meet to john") == (
+        "john", "Meeting request", "Can we meet?")
+    assert manager.last_template_correction == ("meet", "meeting")
+
+
+def test_template_send_needs_a_known_template_and_a_recipient(manager):
+    assert manager.parse_email_command("send email using template meeting") is None
+    assert manager.parse_email_command("send email using template invoice to john") is None
+    assert manager.last_template_correction is None
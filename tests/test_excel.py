@@ -0,0 +1,184 @@
+"""Excel backends and range operations."""
+
+import os
+
+import pytest
+
+from aiva import ComExcelBackend, ExcelManager, XlsxExcelBackend, parse_condition, shift_formula
+from tests.fake_excel import FakeExcelApplication
+
+
+class ListLogger:
+    def __init__(self):
+        self.errors = []
+    
+    def info(self, message, *args):
+        pass
+    
+    def debug(self, message, *args):
+        pass
+    
+    def error(self, message, *args):
+        self.errors.append(message % args if args else message)
+
+
+@pytest.fixture
+def excel():
+    return FakeExcelApplication()
+
+
+@pytest.fixture
+def manager(excel):
+    manager = ExcelManager(ListLogger(), ComExcelBackend(lambda: excel))
+    assert manager.initialize()
+    return manager
+
+
+@pytest.mark.parametrize("condition, format_type, expected", [
+    ("> 100", "red", {"type": "cell", "criteria": ">", "value": 100.0}),
+    ("greater than 5", "green", {"type": "cell", "criteria": ">", "value": 5.0}),
+    ("!= 0", "Yellow", {"type": "cell", "criteria": "<>", "value": 0.0}),
+    ("= done", "bold", {"type": "cell", "criteria": "=", "value": '"done"'}),
+    ("between -1 and 5.5", "red", {"type": "between", "minimum": -1.0, "maximum": 5.5}),
+    ("duplicates", "red", {"type": "duplicate"}),
+    ("Unique", "green", {"type": "unique"}),
+    ("below average", "yellow", {"type": "average", "above": False}),
+])
+def test_parse_condition(condition, format_type, expected):
+    rule = parse_condition(condition, format_type)
+    style = rule.pop("style")
+    assert rule == expected
+    assert style and all(key in ("fill_color", "font_color", "bold") for key in style)
+
+
+def test_parse_condition_range_styles_ignore_the_condition():
+    assert parse_condition("anything", "data bar") == {"type": "data_bar"}
+    assert parse_condition("", "color_scale") == {"type": "color_scale"}
+
+
+@pytest.mark.parametrize("condition, format_type", [("> 100", "purple"), ("roughly 3", "red"), ("", "red")])
+def test_parse_condition_rejects(condition, format_type):
+    with pytest.raises(ValueError):
+        parse_condition(condition, format_type)
+
+
+def test_shift_formula_moves_relative_references_only():
+    assert shift_formula("=SUM(A1:B1)", 2, 0) == "=SUM(A3:B3)"
+    assert shift_formula("=A1*$B$1+C$1", 1, 1) == "=B2*$B$1+D$1"
+    assert shift_formula('="A1"&A1', 1, 0) == '="A1"&A2'
+
+
+def test_write_range_is_one_call_and_reads_back(manager, excel):
+    rows = [[row * 10 + column for column in range(5)] for row in range(100)]
+    assert manager.write_range("B2", rows) == "B2:F101"
+    assert excel.calls["Range.Value="] == 1
+    assert manager.read_range("B2:F101") == rows
+    assert manager.read_range("C3") == [[11]]
+
+
+def test_write_range_pads_ragged_rows(manager, excel):
+    assert manager.write_range("A1", [[1, 2, 3], [4]]) == "A1:C2"
+    assert manager.read_range("A1:C2") == [[1, 2, 3], [4, None, None]]
+
+
+def test_write_rows_streams_in_chunks_inside_one_batch(manager, excel):
+    address = manager.write_rows("A1", ([index, index * 2] for index in range(2500)), chunk_rows=1000)
+    assert address == "A1:B2500"
+    assert excel.calls["Range.Value="] == 3
+    assert all(not settings["ScreenUpdating"] for settings in excel.writes)
+    assert excel.settings["ScreenUpdating"] is True
+    assert manager.read_range("A2500:B2500") == [[2499, 4998]]
+
+
+def test_batch_suspends_screen_updating_and_calculation_once(manager, excel):
+    with manager.batch():
+        with manager.batch():
+            manager.write_range("A1", [[1, 2]])
+        manager.write_range("A2", [[3, 4]])
+    assert [(s["ScreenUpdating"], s["EnableEvents"], s["Calculation"]) for s in excel.writes] == \
+        [(False, False, ComExcelBackend.XL_CALCULATION_MANUAL)] * 2
+    assert excel.calls["Application.ScreenUpdating="] == 2
+    assert excel.settings == {"Visible": True, "ScreenUpdating": True, "EnableEvents": True, "Calculation": -4105}
+
+
+def test_batch_restores_settings_after_an_error(manager, excel):
+    with pytest.raises(KeyError):
+        with manager.batch():
+            raise KeyError("boom")
+    assert excel.settings["ScreenUpdating"] is True
+    assert excel.settings["Calculation"] == -4105
+
+
+def test_sum_formula_fills_a_range_in_one_call(manager, excel):
+    manager.write_range("A1", [[1, 2], [3, 4], [5, 6]])
+    assert manager.set_formulas("C1:C3", "=SUM(A1:B1)")
+    assert excel.calls["Range.Formula="] == 1
+    sheet = excel.workbooks[0].ActiveSheet
+    assert {cell: formula for cell, formula in sheet.formulas.items()} == {
+        (1, 3): "=SUM(A1:B1)", (2, 3): "=SUM(A1:B1)", (3, 3): "=SUM(A1:B1)"}
+    
+    assert manager.set_formulas("A4:B4", [["=SUM(A1:A3)", "=SUM(B1:B3)"]])
+    assert sheet.formulas[(4, 1)] == "=SUM(A1:A3)" and sheet.formulas[(4, 2)] == "=SUM(B1:B3)"
+
+
+def test_apply_format_sets_each_property_once_for_the_range(manager, excel):
+    assert manager.apply_format("A1:E1", bold=True, fill_color="#FF0000", number_format="0.00")
+    assert excel.calls["Range.NumberFormat="] == 1
+    assert excel.calls["Font.Bold="] == 1
+    assert excel.calls["Interior.Color="] == 1
+
+
+@pytest.mark.parametrize("condition, format_type, call, args", [
+    ("> 100", "red", "Add", (1, 5, "=100.0")),
+    ("between 1 and 5", "green", "Add", (1, 1, "=1", "=5")),
+    ("duplicates", "yellow", "AddUniqueValues", ()),
+    ("above average", "bold", "AddAboveAverage", ()),
+    ("", "data bar", "AddDatabar", ()),
+])
+def test_conditional_formats_reach_the_object_model(manager, excel, condition, format_type, call, args):
+    assert manager.apply_conditional_formatting("A1:A10", condition, format_type)
+    [(kind, added_args, added)] = excel.conditions
+    assert (kind, added_args) == (call, args)
+    if format_type == "bold":
+        assert added.Font.Bold is True
+    elif format_type != "data bar":
+        assert added.Interior.Color is not None
+
+
+def test_invalid_condition_fails_without_touching_excel(manager, excel):
+    before = excel.call_count
+    assert manager.apply_conditional_formatting("A1:A10", "roughly 3", "red") is False
+    assert excel.call_count == before
+    assert "Unsupported condition" in manager.logger.errors[0]
+
+
+@pytest.fixture
+def xlsx_manager(tmp_path):
+    pytest.importorskip("xlsxwriter")
+    manager = ExcelManager(ListLogger(), XlsxExcelBackend(str(tmp_path)))
+    assert manager.initialize()
+    return manager
+
+
+def test_xlsx_save_twice_copies_the_finished_file(xlsx_manager, tmp_path):
+    backend = xlsx_manager.backend
+    xlsx_manager.write_range("A1", [["region", "units"], ["north", 3]])
+    first = backend.save(str(tmp_path / "first.xlsx"))
+    assert os.path.getsize(first) > 0
+    
+    assert backend.save() == first
+    second = backend.save(str(tmp_path / "second.xlsx"))
+    assert open(second, "rb").read() == open(first, "rb").read()
+
+
+def test_xlsx_backend_without_xlsxwriter_fails_clearly(tmp_path, monkeypatch):
+    import aiva
+    
+    def missing(module_name):
+        raise ImportError(f"No module named {module_name!r}")
+    
+    monkeypatch.setattr(aiva, "lazy_import", missing)
+    logger = ListLogger()
+    manager = ExcelManager(logger, XlsxExcelBackend(str(tmp_path)))
+    assert manager.initialize() is False
+    assert "pip install xlsxwriter" in logger.errors[0]
@@ -0,0 +1,56 @@
+"""Intent classifier scoring."""
+
+import collections
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from aiva import BUILTIN_COMMANDS, CommandRegistry, IntentClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier(CommandRegistry(BUILTIN_COMMANDS).examples())
+
+
+def reference_rank(classifier, text):
+    """Cosine similarity computed directly from features(), without the word cache"""
+    features = classifier.features(text)
+    query = {}
+    for feature, count in features.items():
+        row = classifier.vocabulary.get(feature)
+        idf = classifier.idf[row] if row is not None else classifier.unseen_idf
+        query[feature] = (1 + math.log(count)) * idf
+    norm = math.sqrt(sum(weight * weight for weight in query.values()))
+    best = collections.defaultdict(float)
+    for column in range(classifier.matrix.shape[1]):
+        category = classifier.categories[int(np.searchsorted(classifier.starts, column, side="right")) - 1]
+        score = sum(weight * classifier.matrix[classifier.vocabulary[feature], column]
+                    for feature, weight in query.items() if feature in classifier.vocabulary)
+        best[category] = max(best[category], min(score / norm, 1.0))
+    return best
+
+
+@pytest.mark.parametrize("text", ["reboot the machine", "send the sales table by email", "play jazz jazz jazz",
+                                  "zxqv blorf"])
+def test_rank_matches_the_direct_computation(classifier, text):
+    expected = reference_rank(classifier, text)
+    for _ in range(2):  # uncached, then with the word rows kept
+        ranked = classifier.rank(text)
+        assert [score for _, score in ranked] == sorted((score for _, score in ranked), reverse=True)
+        assert {category: pytest.approx(score, abs=1e-5) for category, score in ranked} == \
+            (expected if ranked else {})
+
+
+def test_examples_route_without_keywords(classifier):
+    assert classifier.rank("reboot the machine")[0][0] == "system"
+
+
+def test_word_cache_is_bounded(classifier, monkeypatch):
+    monkeypatch.setattr(IntentClassifier, "WORD_CACHE_SIZE", 3)
+    classifier._word_rows.clear()
+    classifier.rank("alpha beta gamma delta epsilon")
+    assert len(classifier._word_rows) <= 3
+    classifier._word_rows.clear()
@@ -0,0 +1,133 @@
+"""Process tracker: deltas between refreshes, PID reuse, exit accounting and filtered top-N."""
+
+import time
+
+import pytest
+
+from aiva import ProcessTracker
+
+GIB = 1024 ** 3
+
+
+def record(pid, cpu_seconds, rss=100, io_bytes=0, create_time=1000.0, name="proc", user="alice"):
+    """An update() record whose handle is its (name, username)"""
+    return pid, create_time, cpu_seconds, rss, io_bytes, (name, user)
+
+
+@pytest.fixture
+def tracker():
+    return ProcessTracker(describe=lambda handle: handle)
+
+
+def by_pid(tracker):
+    return {entry["pid"]: entry for entry in tracker.top(limit=len(tracker) or 1, by="cpu")}
+
+
+def test_cpu_and_io_are_deltas_since_the_previous_refresh(tracker):
+    tracker.update([record(1, 10.0, io_bytes=1000), record(2, 5.0, io_bytes=0)], now=100.0, total_memory=GIB)
+    tracker.update([record(1, 11.0, io_bytes=5000), record(2, 5.5, io_bytes=0)], now=102.0)
+    
+    processes = by_pid(tracker)
+    # 1 s of CPU over 2 s is 50%, 4000 bytes over 2 s is 2000 B/s
+    assert processes[1]["cpu_percent"] == pytest.approx(50.0)
+    assert processes[1]["io_rate"] == pytest.approx(2000.0)
+    assert processes[2]["cpu_percent"] == pytest.approx(25.0)
+    assert processes[2]["io_rate"] == 0.0
+    assert tracker.stats == {"updates": 2, "new": 2, "exited": 0}
+
+
+def test_counters_going_backwards_read_as_idle(tracker):
+    tracker.update([record(1, 10.0, io_bytes=5000)], now=0.0)
+    tracker.update([record(1, 9.0, io_bytes=1000)], now=1.0)
+    
+    assert by_pid(tracker)[1]["cpu_percent"] == 0.0
+    assert by_pid(tracker)[1]["io_rate"] == 0.0
+
+
+def test_new_processes_use_their_lifetime_average(tracker):
+    started = time.time() - 10
+    tracker.update([record(7, 2.0, create_time=started)], now=0.0)
+    
+    assert by_pid(tracker)[7]["cpu_percent"] == pytest.approx(20.0, rel=0.05)
+    assert by_pid(tracker)[7]["io_rate"] == 0.0
+
+
+def test_reused_pid_is_a_new_process(tracker):
+    described = []
+    tracker.describe = lambda handle: described.append(handle) or handle
+    tracker.update([record(5, 50.0, name="old")], now=0.0)
+    tracker.update([record(5, 0.1, create_time=time.time() - 1, name="new")], now=1.0)
+    
+    entry = by_pid(tracker)[5]
+    assert entry["name"] == "new"
+    # Its own lifetime average, not a delta against the old process's 50 CPU seconds
+    assert entry["cpu_percent"] == pytest.approx(10.0, rel=0.1)
+    assert described == [("old", "alice"), ("new", "alice")]
+    assert tracker.stats == {"updates": 2, "new": 2, "exited": 1}
+
+
+def test_known_processes_are_described_once(tracker):
+    described = []
+    tracker.describe = lambda handle: described.append(handle) or handle
+    for now in range(3):
+        tracker.update([record(1, now, name="steady")], now=float(now))
+    
+    assert described == [("steady", "alice")]
+
+
+def test_exited_processes_are_dropped_and_counted(tracker):
+    tracker.update([record(pid, 1.0) for pid in range(1, 6)], now=0.0)
+    tracker.update([record(1, 1.0), record(3, 1.0), record(6, 1.0)], now=1.0)
+    
+    assert sorted(by_pid(tracker)) == [1, 3, 6]
+    assert len(tracker) == 3
+    assert tracker.stats == {"updates": 2, "new": 6, "exited": 3}
+    
+    tracker.update([], now=2.0)
+    assert len(tracker) == 0
+    assert tracker.stats["exited"] == 6
+
+
+@pytest.fixture
+def busy(tracker):
+    # pid: (name, user, share of memory, CPU seconds and IO bytes in the second refresh)
+    table = {
+        1: ("chrome", "alice", 0.4, 0.3, 100),
+        2: ("Chrome Helper", "alice", 0.1, 0.9, 0),
+        3: ("postgres", "postgres", 0.3, 0.1, 9000),
+        4: ("python", "alice", 0.2, 0.5, 400)
+    }
+    tracker.update([record(pid, 0.0, rss=int(share * GIB), name=name, user=user)
+                    for pid, (name, user, share, _, _) in table.items()], now=0.0, total_memory=GIB)
+    tracker.update([record(pid, cpu, rss=int(share * GIB), io_bytes=io, name=name, user=user)
+                    for pid, (name, user, share, cpu, io) in table.items()], now=1.0)
+    return tracker
+
+
+@pytest.mark.parametrize("by, expected", [
+    ("cpu", [2, 4, 1, 3]),
+    ("memory", [1, 3, 4, 2]),
+    ("io", [3, 4, 1, 2])
+])
+def test_top_orders_by_the_requested_resource(busy, by, expected):
+    assert [entry["pid"] for entry in busy.top(limit=10, by=by)] == expected
+    assert [entry["pid"] for entry in busy.top(limit=2, by=by)] == expected[:2]
+
+
+def test_top_filters_by_name_and_user(busy):
+    assert [entry["pid"] for entry in busy.top(by="cpu", name="CHROME")] == [2, 1]
+    assert [entry["pid"] for entry in busy.top(by="memory", user="postgres")] == [3]
+    assert [entry["pid"] for entry in busy.top(name="chrome", user="postgres")] == []
+
+
+def test_top_reports_memory_share_and_rates(busy):
+    entry = busy.top(limit=1, by="memory")[0]
+    
+    assert entry == {"pid": 1, "name": "chrome", "username": "alice", "cpu_percent": pytest.approx(30.0),
+                     "memory_percent": pytest.approx(40.0, abs=0.01), "rss": int(0.4 * GIB),
+                     "io_rate": pytest.approx(100.0)}
+
+
+def test_unknown_sort_key_is_rejected(busy):
+    with pytest.raises(KeyError):
+        busy.top(by="threads")
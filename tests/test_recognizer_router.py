@@ -0,0 +1,154 @@
+"""Recognizer routing: fallback order, no-speech answers, timeouts and circuit breakers."""
+
+import logging
+import threading
+import time
+
+import pytest
+import speech_recognition as sr
+
+from aiva import CircuitBreaker, FakeBackend, RecognizerRouter
+
+AUDIO = sr.AudioData(b"\0\0" * 1600, 16000, 2)
+
+
+@pytest.fixture
+def make_router():
+    routers = []
+    
+    def make(*backends, **kwargs):
+        kwargs.setdefault("timeout", 1.0)
+        router = RecognizerRouter(list(backends), logging.getLogger("test"), **kwargs)
+        routers.append(router)
+        return router
+    
+    yield make
+    for router in routers:
+        router._executor.shutdown(wait=True)
+
+
+def test_first_backend_answers_in_configured_order(make_router):
+    first, second = FakeBackend(["Open Excel"], name="first"), FakeBackend(["other"], name="second")
+    router = make_router(first, second)
+    
+    assert router.transcribe(AUDIO) == "open excel"
+    assert (first.calls, second.calls) == (1, 0)
+
+
+def test_failures_fall_back_in_order(make_router):
+    broken = FakeBackend(["x"], fail_every=1, name="broken")
+    slow, fast = FakeBackend(["slow"], name="slow"), FakeBackend(["fast"], name="fast")
+    router = make_router(broken, slow, fast)
+    
+    assert router.transcribe(AUDIO) == "slow"
+    assert (broken.calls, slow.calls, fast.calls) == (1, 1, 0)
+    assert router.breakers["broken"].failures == 1
+
+
+def test_measured_latency_reorders_backends(make_router):
+    slow = FakeBackend(["slow"], latency=0.05, name="slow")
+    fast = FakeBackend(["fast"], name="fast")
+    router = make_router(slow, fast)
+    router.latency["fast"] = 0.001
+    
+    assert [backend.name for backend in router.ranked()] == ["fast", "slow"]
+    assert router.transcribe(AUDIO) == "fast"
+
+
+def test_no_speech_tries_the_fallbacks(make_router):
+    deaf = FakeBackend([""], name="deaf")
+    sharp = FakeBackend(["turn it up"], name="sharp")
+    router = make_router(deaf, sharp)
+    
+    assert router.transcribe(AUDIO) == "turn it up"
+    assert (deaf.calls, sharp.calls) == (1, 1)
+    # Hearing nothing is an answer, not an engine failure
+    assert router.breakers["deaf"].state == "closed" and router.breakers["deaf"].failures == 0
+
+
+def test_no_speech_anywhere_is_an_empty_transcript(make_router):
+    router = make_router(FakeBackend([""], name="a"), FakeBackend(["x"], fail_every=1, name="b"))
+    assert router.transcribe(AUDIO) == ""
+
+
+def test_every_backend_failing_raises(make_router):
+    router = make_router(FakeBackend(["x"], fail_every=1, name="a"), FakeBackend(["x"], fail_every=1, name="b"))
+    with pytest.raises(sr.RequestError, match="a: .*; b: "):
+        router.transcribe(AUDIO)
+
+
+def test_breaker_opens_then_half_opens_for_one_trial(make_router):
+    flaky = FakeBackend(["x"], fail_every=1, name="flaky")
+    steady = FakeBackend(["steady"], name="steady")
+    router = make_router(flaky, steady, failure_threshold=2, reset_timeout=0.1)
+    # Keep flaky ranked first once steady has a measured latency
+    router.latency["flaky"] = 0.0
+    
+    for _ in range(2):
+        assert router.transcribe(AUDIO) == "steady"
+    assert router.breakers["flaky"].state == "open"
+    assert router.transcribe(AUDIO) == "steady"
+    assert flaky.calls == 2
+    
+    time.sleep(0.12)
+    assert router.breakers["flaky"].state == "half_open"
+    flaky.fail_every = 0
+    flaky.transcripts = ["recovered"]
+    assert router.transcribe(AUDIO) == "recovered"
+    assert router.breakers["flaky"].state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_timed_out_call_finishing_later_does_not_close_the_breaker(make_router):
+    release = threading.Event()
+    finished = threading.Event()
+    
+    def hang(audio):
+        release.wait(5)
+        finished.set()
+        return "too late"
+    
+    hung = FakeBackend(hang, name="hung")
+    backup = FakeBackend(["backup"], name="backup")
+    router = make_router(hung, backup, timeout=0.05, failure_threshold=1, reset_timeout=60)
+    
+    assert router.transcribe(AUDIO) == "backup"
+    assert router.breakers["hung"].state == "open"
+    
+    release.set()
+    assert finished.wait(1)
+    time.sleep(0.05)
+    assert router.breakers["hung"].state == "open"
+    assert router.latency["hung"] is None
+
+
+def test_race_width_takes_the_first_answer(make_router):
+    slow = FakeBackend(["slow"], latency=0.3, name="slow")
+    fast = FakeBackend(["fast"], latency=0.01, name="fast")
+    router = make_router(slow, fast, race_width=2)
+    
+    assert router.transcribe(AUDIO) == "fast"
+    assert (slow.calls, fast.calls) == (1, 1)
+
+
+def test_call_counts_are_exact_under_concurrency(make_router):
+    backend = FakeBackend(["ok"], name="only")
+    router = make_router(backend)
+    threads = [threading.Thread(target=lambda: [router.transcribe(AUDIO) for _ in range(50)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert router.report()["only"]["calls"] == backend.calls == 400
@@ -0,0 +1,111 @@
+"""Keyword routing: the category every built-in keyword reaches, and priority settling overlaps."""
+
+import types
+
+import pytest
+
+from aiva import (BUILTIN_COMMANDS, COMMAND_KEYWORDS, DEFAULT_ROUTING_PRIORITY, CommandRegistry, IntentClassifier,
+                  IntentRouter)
+
+KEYWORDS = [(category, keyword) for category, keywords in COMMAND_KEYWORDS.items() for keyword in keywords]
+
+# Keywords that contain, or are, a keyword of a higher priority category
+OUTRANKED = {
+    "browse": "excel",  # "row"
+    "browser": "excel",  # "row"
+    "youtube music": "web",  # "youtube"
+    "lock": "system"  # also a smart_home keyword
+}
+
+
+@pytest.fixture(scope="module")
+def router():
+    return CommandRegistry(BUILTIN_COMMANDS).router(DEFAULT_ROUTING_PRIORITY)
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    pytest.importorskip("numpy")
+    return IntentClassifier(CommandRegistry(BUILTIN_COMMANDS).examples())
+
+
+def classifier_scoring(**scores):
+    return types.SimpleNamespace(rank=lambda command: sorted(scores.items(), key=lambda item: -item[1]))
+
+
+@pytest.mark.parametrize("category, keyword", KEYWORDS)
+def test_every_keyword_routes_to_its_category(router, category, keyword):
+    assert category in router.candidates(keyword)
+    assert router.route(f"please {keyword} now") == OUTRANKED.get(keyword, category)
+
+
+@pytest.mark.parametrize("category, keyword", KEYWORDS)
+def test_classifier_settles_outranked_keywords(router, classifier, category, keyword):
+    # "lock" is equally a system and a smart_home example, so priority keeps it
+    expected = "system" if keyword == "lock" else category
+    assert router.resolve(keyword, classifier) == expected
+
+
+def test_builtin_manifests_route_like_the_keyword_table(router):
+    assert router.priority == DEFAULT_ROUTING_PRIORITY
+    assert router.keyword_table == COMMAND_KEYWORDS
+
+
+def test_nothing_matches_plain_chatter(router):
+    assert router.route("how are you doing") is None
+    assert router.candidates("how are you doing") == []
+    assert router.match("how are you doing") == {}
+
+
+@pytest.mark.parametrize("priority, expected", [
+    (DEFAULT_ROUTING_PRIORITY, "system"),
+    (["smart_home", "system"], "smart_home"),
+    (["media", "smart_home"], "smart_home"),
+    ([], "system")
+])
+def test_overlapping_keywords_go_to_the_highest_priority(priority, expected):
+    # "lock" is a system and a smart_home keyword, "door" only smart_home
+    router = IntentRouter(COMMAND_KEYWORDS, priority)
+    assert router.route("lock the front door") == expected
+
+
+def test_unlisted_categories_follow_in_table_order():
+    router = IntentRouter({"a": ["alpha"], "b": ["beta"], "c": ["gamma"]}, ["c", "unknown"])
+    
+    assert router.priority == ["c", "a", "b"]
+    assert router.route("alpha beta gamma") == "c"
+    assert router.route("alpha beta") == "a"
+    assert list(router.match("beta alpha gamma")) == ["c", "a", "b"]
+
+
+def test_priority_breaks_ties_between_nested_keywords():
+    table = {"short": ["note"], "long": ["notepad"]}
+    
+    assert IntentRouter(table, ["short", "long"]).route("open notepad") == "short"
+    assert IntentRouter(table, ["long", "short"]).route("open notepad") == "long"
+    assert IntentRouter(table, ["long", "short"]).route("take a note") == "short"
+
+
+def test_classifier_needs_the_margin_to_overrule_priority(router):
+    command = "lock the front door"
+    assert router.candidates(command) == ["system", "smart_home"]
+    
+    assert router.resolve(command, classifier_scoring(system=0.5, smart_home=0.9)) == "smart_home"
+    assert router.resolve(command, classifier_scoring(system=0.5, smart_home=0.54), margin=0.05) == "system"
+    # Categories without a keyword in the command are never chosen
+    assert router.resolve(command, classifier_scoring(web=1.0, system=0.5, smart_home=0.5)) == "system"
+
+
+def test_classifier_fills_in_when_no_keyword_matches(router):
+    command = "make it brighter in here"
+    
+    assert router.resolve(command, classifier_scoring(smart_home=0.6, media=0.2)) == "smart_home"
+    assert router.resolve(command, classifier_scoring(smart_home=0.3), min_confidence=0.4) is None
+    assert router.resolve(command) is None
+
+
+def test_single_candidate_skips_the_classifier(router):
+    def rank(command):
+        raise AssertionError("classifier consulted")
+    
+    assert router.resolve("open excel", types.SimpleNamespace(rank=rank)) == "excel"
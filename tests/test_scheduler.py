@@ -0,0 +1,156 @@
+"""Command scheduler: concurrency limits, queueing, cancellation and timeouts."""
+
+import logging
+import threading
+import types
+
+import pytest
+
+from aiva import AIVA, CommandScheduler, command_sleep
+
+
+@pytest.fixture
+def scheduler():
+    queued, done = [], []
+    scheduler = CommandScheduler(logging.getLogger("test"), workers=4, limits={"excel": 1},
+                                 default_limit=2, default_timeout=5.0,
+                                 on_queued=queued.append, on_done=done.append)
+    scheduler.queued, scheduler.done = queued, done
+    yield scheduler
+    scheduler.shutdown(cancel=True)
+
+
+def blocking(release: threading.Event, started: threading.Event = None):
+    def handler(command):
+        if started is not None:
+            started.set()
+        while not release.is_set():
+            command_sleep(0.01)
+        return True
+    return handler
+
+
+def test_job_runs_and_reports_success(scheduler):
+    job = scheduler.submit("web", "open youtube", lambda command: command == "open youtube")
+    assert job.future.result(timeout=2) is True
+    assert job.outcome == "done"
+    assert scheduler.done == [job]
+    assert scheduler.queued == []
+
+
+def test_failed_handler_is_reported(scheduler):
+    def handler(command):
+        raise ValueError("boom")
+    
+    job = scheduler.submit("web", "open youtube", handler)
+    assert job.future.result(timeout=2) is False
+    assert job.outcome == "failed"
+    assert isinstance(job.error, ValueError)
+
+
+def test_jobs_beyond_the_limit_wait_in_order(scheduler):
+    release, started = threading.Event(), threading.Event()
+    first = scheduler.submit("excel", "open excel", blocking(release, started))
+    assert started.wait(2)
+    order = []
+    second = scheduler.submit("excel", "sum column a", lambda command: order.append(command) or True)
+    third = scheduler.submit("excel", "save the workbook", lambda command: order.append(command) or True)
+    
+    assert scheduler.queued == [second, third]
+    assert second.outcome == third.outcome == "pending"
+    assert [job.seq for job in scheduler.jobs()] == [first.seq, second.seq, third.seq]
+    
+    release.set()
+    assert third.future.result(timeout=2) is True
+    assert order == ["sum column a", "save the workbook"]
+
+
+def test_other_categories_are_not_blocked(scheduler):
+    release, started = threading.Event(), threading.Event()
+    scheduler.submit("excel", "open excel", blocking(release, started))
+    assert started.wait(2)
+    job = scheduler.submit("web", "open youtube", lambda command: True)
+    assert job.future.result(timeout=2) is True
+    release.set()
+
+
+def test_cancel_pending_job(scheduler):
+    release, started = threading.Event(), threading.Event()
+    scheduler.submit("excel", "open excel", blocking(release, started))
+    assert started.wait(2)
+    calls = []
+    pending = scheduler.submit("excel", "sum column a", calls.append)
+    
+    assert scheduler.cancel(pending) is True
+    assert pending.future.result(timeout=2) is False
+    assert pending.outcome == "cancelled"
+    assert scheduler.cancel(pending) is False
+    release.set()
+    scheduler.shutdown(cancel=False)
+    assert calls == []
+
+
+def test_cancel_running_job_wakes_command_sleep(scheduler):
+    started = threading.Event()
+    job = scheduler.submit("excel", "open excel", blocking(threading.Event(), started))
+    assert started.wait(2)
+    
+    assert scheduler.cancel_latest() is job
+    assert job.future.result(timeout=2) is False
+    assert job.outcome == "cancelled"
+    assert scheduler.jobs() == []
+
+
+def test_cancel_all(scheduler):
+    release, started = threading.Event(), threading.Event()
+    jobs = [scheduler.submit("excel", "open excel", blocking(release, started))]
+    assert started.wait(2)
+    jobs += [scheduler.submit("excel", f"command {index}", lambda command: True) for index in range(3)]
+    
+    assert scheduler.cancel_all() == 4
+    assert [job.future.result(timeout=2) for job in jobs] == [False] * 4
+    assert scheduler.cancel_latest() is None
+
+
+def test_watchdog_times_out_long_jobs():
+    scheduler = CommandScheduler(logging.getLogger("test"), timeouts={"excel": 0.05})
+    try:
+        job = scheduler.submit("excel", "open excel", blocking(threading.Event()))
+        assert job.future.result(timeout=2) is False
+        assert job.outcome == "timed out"
+    finally:
+        scheduler.shutdown()
+
+
+def test_submit_after_shutdown_raises(scheduler):
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("web", "open youtube", lambda command: True)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.calls = []
+    
+    def cancel_all(self):
+        self.calls.append("all")
+        return 2
+    
+    def cancel_latest(self):
+        self.calls.append("latest")
+        return object()
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("cancel that", "latest"),
+    ("cancel that call", "latest"),
+    ("never mind, small thing", "latest"),
+    ("cancel all commands", "all"),
+    ("cancel everything", "all"),
+    ("Cancel All", "all"),
+])
+def test_control_command_cancels_all_only_on_whole_words(command, expected):
+    assistant = types.SimpleNamespace(scheduler=FakeScheduler(), CANCEL_ALL=AIVA.CANCEL_ALL,
+                                      voice_manager=types.SimpleNamespace(speak=lambda text: None))
+    assert AIVA.handle_control_command(assistant, command) is True
+    assert assistant.scheduler.calls == [expected]
@@ -0,0 +1,123 @@
+"""Utterance cache: normalizing, cached categories and arguments, and repeat suppression."""
+
+import types
+
+import pytest
+
+from aiva import AIVA, CommandManifest, CommandRegistry, UtteranceCache, parse_email_intent
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("utterance, key", [
+    ("What time is it?", "what time is it"),
+    ("  Open   YouTube. ", "open youtube"),
+    ("...hello... world!", "hello world"),
+    ("Don't stop", "don't stop"),
+    ("Email to John.Smith@Gmail.com about Q3, please.", "email to john.smith@gmail.com about q3 please"),
+    ("set volume to 3.5", "set volume to 3.5"),
+])
+def test_normalize(utterance, key):
+    assert UtteranceCache.normalize(utterance) == key
+
+
+def test_get_returns_category_and_arguments_until_they_expire():
+    clock = Clock()
+    cache = UtteranceCache(size=2, ttl=10, clock=clock)
+    assert cache.get("email to bob about lunch") is UtteranceCache.MISS
+    
+    cache.put("email to bob about lunch", "email", ("compose", "bob", "lunch", None))
+    cache.put("what time is it", "info")
+    assert cache.get("email to bob about lunch") == ("email", ("compose", "bob", "lunch", None))
+    assert cache.get("what time is it") == ("info", None)
+    
+    clock.now = 10
+    assert cache.get("what time is it") is UtteranceCache.MISS
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2, "bypassed": 0, "duplicates": 0}
+
+
+def test_least_recently_used_is_evicted_and_uncached_bypassed():
+    cache = UtteranceCache(size=2, uncached=("system",))
+    cache.put("a", "info")
+    cache.put("b", "web")
+    cache.get("a")
+    cache.put("c", "media")
+    cache.put("shut down", "system")
+    
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("shut down") is UtteranceCache.MISS
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_duplicates_within_the_window_are_suppressed_except_repeatable():
+    clock = Clock()
+    cache = UtteranceCache(dedup_window=1.0, repeatable=("media",), clock=clock)
+    assert not cache.duplicate("open youtube", "web")
+    clock.now = 0.5
+    assert cache.duplicate("open youtube", "web")
+    clock.now = 2.0
+    assert not cache.duplicate("open youtube", "web")
+    assert not cache.duplicate("next song", "media") and not cache.duplicate("next song", "media")
+
+
+def assistant_with(manifest, route, enabled=True):
+    settings = types.SimpleNamespace(UTTERANCE_CACHE=types.SimpleNamespace(enabled=enabled))
+    assistant = types.SimpleNamespace(config=types.SimpleNamespace(settings=settings),
+                                      utterances=UtteranceCache(), route=route,
+                                      commands=CommandRegistry([manifest]))
+    assistant.run_handler = lambda *args, **kwargs: AIVA.run_handler(assistant, *args, **kwargs)
+    return assistant
+
+
+def test_parsed_arguments_are_cached_with_the_category():
+    parsed = []
+    
+    def parser(key):
+        parsed.append(key)
+        return parse_email_intent(key)
+    
+    manifest = CommandManifest("email", ["email"], "handle", arguments=parser)
+    routed = []
+    assistant = assistant_with(manifest, lambda command: routed.append(command) or "email")
+    
+    first = AIVA.route_utterance(assistant, "Email to Bob about lunch.")
+    again = AIVA.route_utterance(assistant, "email to bob about lunch")
+    
+    assert first == again == ("email to bob about lunch", "email", ("compose", "bob", "lunch", None))
+    assert len(routed) == len(parsed) == 1
+
+
+def test_arguments_are_parsed_even_when_the_cache_is_off():
+    manifest = CommandManifest("email", ["email"], "handle", arguments=parse_email_intent)
+    assistant = assistant_with(manifest, lambda command: "email", enabled=False)
+    
+    assert AIVA.route_utterance(assistant, "mail to tom for the invoice")[2] == ("compose", "tom", "the invoice", None)
+    assert not assistant.utterances.entries
+
+
+def test_handler_gets_arguments_only_when_the_category_parses_them():
+    calls = []
+    with_parser = CommandManifest("email", ["email"], "handle", arguments=parse_email_intent)
+    assistant = assistant_with(with_parser, None)
+    assistant.handle = lambda *args: calls.append(args) or True
+    assert AIVA.run_handler(assistant, "email", "mail to tom for lunch", ("compose", "tom", "lunch", None))
+    
+    assistant.commands.register(CommandManifest("email", ["email"], "handle"))
+    assert AIVA.run_handler(assistant, "email", "mail to tom for lunch", None)
+    assert calls == [("mail to tom for lunch", ("compose", "tom", "lunch", None)), ("mail to tom for lunch",)]
+
+
+def test_plugin_arguments_must_name_a_module_function():
+    manifest = CommandManifest.from_dict({"name": "weather", "keywords": ["weather"], "handler": "weather:handle",
+                                          "arguments": "string:capwords"})
+    registry = CommandRegistry([manifest])
+    assert registry.parse("weather", "weather in paris") == "Weather In Paris"
+    with pytest.raises(ValueError, match="arguments"):
+        CommandManifest.from_dict({"name": "weather", "keywords": ["weather"], "handler": "weather:handle",
+                                   "arguments": "capwords"})
@@ -0,0 +1,54 @@
+"""Template wake word detector against recorded WAV fixtures."""
+
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import speech_recognition as sr
+
+from aiva import ArrayAudioSource, TemplateWakeWordDetector
+
+FIXTURES = Path(__file__).parent / "fixtures" / "wake_word"
+
+
+def recordings(name):
+    audio = []
+    for path in sorted((FIXTURES / name).glob("*.wav")):
+        source = ArrayAudioSource.from_wav(str(path))
+        audio.append(sr.AudioData(source.data, source.sample_rate, source.sample_width))
+    return audio
+
+
+@pytest.fixture(scope="module")
+def detector():
+    detector = TemplateWakeWordDetector.from_directory(str(FIXTURES / "templates"))
+    assert len(detector.templates) == 3
+    return detector
+
+
+@pytest.mark.parametrize("index", range(6))
+def test_wake_word_is_detected_where_it_ends(detector, index):
+    audio = recordings("positives")[index]
+    end = detector.detect(audio)
+    assert end is not None
+    # 0.4 s of silence, then three syllables of 0.15-0.21 s that fade out at the end
+    assert 0.7 <= end <= 1.1
+
+
+@pytest.mark.parametrize("index", range(6))
+def test_other_speech_is_rejected(detector, index):
+    assert detector.detect(recordings("negatives")[index]) is None
+
+
+def test_default_threshold_separates_the_fixtures(detector):
+    samples = [(audio, True) for audio in recordings("positives")] + \
+        [(audio, False) for audio in recordings("negatives")]
+    result = detector.evaluate(samples)
+    assert result["false_accept_rate"] == 0.0
+    assert result["false_reject_rate"] == 0.0
+
+
+def test_silence_and_short_clicks_are_rejected_cheaply(detector):
+    assert detector.detect(sr.AudioData(b"\0\0" * 16000, 16000, 2)) is None
+    assert detector.detect(sr.AudioData(b"\x00\x40" * 400, 16000, 2)) is None